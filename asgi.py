@@ -0,0 +1,676 @@
+"""
+ASGI-режим API: те же маршруты и ответы, что у Flask-приложения (app.py),
+на Starlette и асинхронном движке SQLAlchemy (asyncpg / aiosqlite).
+Ожидание БД не занимает поток, поэтому один процесс держит тысячи
+одновременных соединений мобильных клиентов:
+
+    uvicorn asgi:app --workers 4
+
+Маршруты: регистрация и вход, пользователь и его статистика, товары,
+покупка, скидки дня, список и выполнение заданий, список и создание
+гильдий. Только в WSGI-режиме остаются:
+  - рейтинги (/api/leaderboard*, /api/guilds/<id>/leaderboard*);
+  - администрирование (/api/admin/*);
+  - друзья (/api/friends*);
+  - пакетные операции (/api/tasks/complete/batch, /api/products/buy/batch,
+    /api/users/<id>/stats/batch);
+  - задания гильдий (/api/guilds/<id>/tasks).
+Ответы здесь всегда JSON без сжатия (сжатие — на прокси), кроме каталога
+товаров: он, как и во Flask, отдает MessagePack по Accept и сжатые копии
+по Accept-Encoding из кеша каталога. Read-your-writes с репликой
+(reads.py) в этом режиме не нужен: чтения идут в основную БД.
+
+Токены выпускает и проверяет flask_jwt_extended с настройками
+Flask-приложения, поэтому токены одинаково работают в обоих режимах,
+а ошибки JWT дают те же ответы. Хеширование паролей уходит в пул
+passwords.py, не блокируя цикл событий. Write-behind (WRITE_BEHIND_ENABLED)
+в этом режиме не используется: выполнения заданий записываются сразу.
+"""
+import asyncio
+import functools
+import json
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+
+from flask_jwt_extended import create_access_token, decode_token, get_jwt_identity, verify_jwt_in_request
+from flask_jwt_extended.config import config as jwt_config
+from sqlalchemy import and_, insert, or_, select, text, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.exceptions import HTTPException
+from starlette.responses import Response, StreamingResponse
+from starlette.routing import Route
+from werkzeug.exceptions import default_exceptions
+from werkzeug.datastructures import MIMEAccept
+from werkzeug.http import parse_accept_header, parse_etags, quote_etag
+
+from app import create_app
+from cache import MISSING
+from catalog import product_catalogue, catalogue_item, CATALOGUE_MAX_AGE
+from database import create_async_db_engine
+from discounts import daily_discounts, DISCOUNT_PERCENT
+from guild_tasks import progress_increment, progress_insert_statement
+from leaderboard import leaderboards
+from models import (
+    User, UserStats, Product, UserInventory, IdempotencyKey,
+    Guild, GuildMembership, Task, TaskHistory, TaskCompletionRollup
+)
+from pagination import (
+    LIST_ARGS, STREAM_BATCH_SIZE, ListArgsError, keyset_after, keyset_order, next_cursor, parse_list_args,
+    parse_sort
+)
+from passwords import password_hasher, HashingBusy
+from profiles import profile_cache, profile_statement, profile_from_row, invalidate_profile
+from purchases import (
+    PurchaseError, charge_error, charge_statement, purchase_result, stats_exists_statement,
+    stored_response_statement
+)
+from ratelimit import RateLimited, limit_enabled, rate_limiter, retry_after_header
+from rollup import completions_upsert
+from search import PRODUCT_SORTS, TASK_SORTS, has_search_args, product_criteria, task_criteria
+from serialization import COMPRESSION_ENABLED, MSGPACK_ENABLED, choose_encoding, wants_msgpack
+from stats_engine import (
+    STATS_FIELDS, STORED_COLUMNS, buffs_statement, effective_stats, equipped_cache, equipped_statement,
+    materialize, product_buffs, store_equipped
+)
+from task_completion import CompletionError, check_completion, reward_statement, task_rules_statement
+
+# Flask-приложение нужно ради JWT, JSON-провайдера и обработчиков ошибок
+flask_app = create_app()
+engine = create_async_db_engine()
+Session = async_sessionmaker(engine, expire_on_commit=False)
+
+# Блокировки (user, task) для СУБД без advisory locks, как в task_completion
+_LOCAL_LOCK_STRIPES = 64
+_local_locks = [asyncio.Lock() for _ in range(_LOCAL_LOCK_STRIPES)]
+
+
+# ====================== Ответы и JWT ======================
+
+def json_response(data, status_code=200):
+    """Тело как у jsonify: JSON-провайдер Flask-приложения, компактно, с переводом строки"""
+    body = flask_app.json.dumps(data, separators=(',', ':')) + '\n'
+    return Response(body, status_code, media_type='application/json')
+
+
+def error_page(status_code):
+    """HTML-страница ошибки werkzeug, как у abort() во Flask"""
+    return Response(default_exceptions[status_code]().get_body(), status_code, media_type='text/html')
+
+
+def access_token(user_id):
+    with flask_app.app_context():
+        return create_access_token(identity=user_id)
+
+
+def _jwt_identity(request):
+    """
+    (user_id, None) для запроса с валидным access-токеном, иначе (None, ответ).
+    Токен разбирается decode_token flask_jwt_extended; если он не прошел
+    проверку, ответ об ошибке формирует сам @jwt_required() Flask-приложения
+    """
+    scheme, _, token = request.headers.get('authorization', '').partition(' ')
+    if scheme == 'Bearer' and token and ' ' not in token:
+        with flask_app.app_context():
+            try:
+                decoded = decode_token(token)
+                if decoded.get('type') == 'access':
+                    return int(decoded[jwt_config.identity_claim_key]), None
+            except Exception:
+                pass
+
+    with flask_app.test_request_context(request.url.path, headers=request.headers.items()):
+        try:
+            verify_jwt_in_request()
+            return int(get_jwt_identity()), None
+        except Exception as error:
+            response = flask_app.make_response(flask_app.handle_user_exception(error))
+    return None, Response(response.get_data(), response.status_code, media_type=response.mimetype)
+
+
+def jwt_required(view):
+    """Аналог @jwt_required(): id пользователя кладется в request.state.user_id"""
+    @functools.wraps(view)
+    async def wrapper(request):
+        user_id, error = _jwt_identity(request)
+        if error is not None:
+            return error
+        request.state.user_id = user_id
+        return await view(request)
+    return wrapper
+
+
+def rate_limit(name, per='user'):
+    """Аналог ratelimit.rate_limit: per='user' ставится под @jwt_required"""
+    def decorator(view):
+        if not limit_enabled(name):
+            return view
+
+        @functools.wraps(view)
+        async def wrapper(request):
+            key = request.state.user_id if per == 'user' else (request.client.host if request.client else None)
+            rate_limiter.check(name, key)
+            return await view(request)
+        return wrapper
+    return decorator
+
+
+async def list_response(request, source, key, spec, *criteria, sorts=None):
+    """
+    Асинхронный аналог pagination.list_response: те же after/limit/fields/stream/sort.
+    source — модель или join, criteria — условия WHERE,
+    spec — {поле ответа: (колонка или кортеж колонок, getter(row))},
+    sorts — {поле: колонка} для sort
+    """
+    order = parse_sort(request.query_params, sorts)
+    after, limit, fields, stream = parse_list_args(request.query_params, spec, order)
+
+    columns = {key: None}
+    if order is not None:
+        columns[order[0]] = None
+    for name in fields:
+        needed = spec[name][0]
+        for column in needed if isinstance(needed, tuple) else (needed,):
+            columns[column] = None
+    getters = [(name, spec[name][1]) for name in fields]
+
+    statement = select(*columns).select_from(source).where(*criteria).order_by(*keyset_order(key, order))
+    if after is not None:
+        statement = statement.where(keyset_after(key, order, after))
+
+    def to_dict(row):
+        return {name: getter(row) for name, getter in getters}
+
+    if stream:
+        if limit is not None:
+            statement = statement.limit(limit)
+        return StreamingResponse(_stream(statement, to_dict), media_type='application/json')
+
+    async with Session() as session:
+        if limit is None:
+            rows = (await session.execute(statement)).all()
+            return json_response([to_dict(row) for row in rows])
+        rows = (await session.execute(statement.limit(limit + 1))).all()
+
+    response = json_response([to_dict(row) for row in rows[:limit]])
+    if len(rows) > limit:
+        last = rows[limit - 1]
+        value = getattr(last, order[0].key) if order is not None else None
+        response.headers['X-Next-Cursor'] = next_cursor(order, value, getattr(last, key.key))
+    return response
+
+
+async def _stream(statement, to_dict):
+    dumps = flask_app.json.dumps
+    async with Session() as session:
+        result = await session.stream(statement.execution_options(yield_per=STREAM_BATCH_SIZE))
+        yield '['
+        separator = ''
+        async for row in result:
+            yield separator + dumps(to_dict(row), separators=(',', ':'))
+            separator = ','
+        yield ']'
+
+
+# ====================== Аутентификация ======================
+
+@rate_limit('register', per='ip')
+async def register(request):
+    data = await request.json()
+    hashed_password = await run_in_threadpool(password_hasher.hash, data['password'])
+
+    try:
+        # Пользователь, статистика и стартовый предмет — одной транзакцией
+        async with Session.begin() as session:
+            user_id = (await session.execute(insert(User).values(
+                name=data['name'],
+                sex=data.get('sex'),
+                password=hashed_password
+            ).returning(User.user_id))).scalar_one()
+            await session.execute(insert(UserStats).values(user_id=user_id))
+            if 'product_id' in data:
+                await session.execute(insert(UserInventory).values(
+                    user_id=user_id,
+                    product_id=data['product_id'],
+                    is_equipped=False
+                ))
+    except Exception as e:
+        return json_response({'error': str(e)}, 400)
+
+    leaderboards.record_stats(user_id, experience=0, money=0)
+    return json_response({
+        'message': 'User created successfully',
+        'access_token': access_token(user_id)
+    }, 201)
+
+
+@rate_limit('login', per='ip')
+async def login(request):
+    data = await request.json()
+    async with Session() as session:
+        user = (await session.execute(
+            select(User.user_id, User.password).where(User.name == data['name'])
+        )).first()
+
+    # Соединение с БД на время проверки хеша не держим
+    if user and await run_in_threadpool(password_hasher.verify, user.password, data['password']):
+        if password_hasher.needs_rehash(user.password):
+            new_hash = await run_in_threadpool(password_hasher.hash, data['password'])
+            async with Session.begin() as session:
+                await session.execute(update(User).where(User.user_id == user.user_id).values(password=new_hash))
+        return json_response({
+            'access_token': access_token(user.user_id),
+            'user_id': user.user_id
+        })
+    return json_response({'error': 'Invalid credentials'}, 401)
+
+
+# ====================== Пользователи ======================
+
+async def load_profile(user_id):
+    """Асинхронный profiles.load_profile с тем же кешем горячих профилей"""
+    profile = profile_cache.get(user_id)
+    if profile is not MISSING:
+        return profile
+    async with Session() as session:
+        row = (await session.execute(profile_statement(user_id))).first()
+    return profile_from_row(row) if row is not None else None
+
+
+async def load_modifiers(session, user_id):
+    """Асинхронный stats_engine.load_modifiers с теми же кешами"""
+    equipped = equipped_cache.get(user_id)
+    if equipped is MISSING:
+        equipped = store_equipped(user_id, (await session.execute(equipped_statement(user_id))).all())
+    product_ids = [product_id for product_id, _ in equipped]
+    missing = product_buffs.missing(product_ids)
+    if missing:
+        product_buffs.store(missing, (await session.execute(buffs_statement(missing))).all())
+    return equipped, product_buffs.get_many(product_ids)
+
+
+@jwt_required
+async def get_user(request):
+    user = await load_profile(request.path_params['user_id'])
+    if user is None:
+        return error_page(404)
+    return json_response({
+        'user_id': user.user_id,
+        'name': user.name,
+        'level': user.level if user.has_stats else 1
+    })
+
+
+@jwt_required
+async def user_stats(request):
+    user_id = request.path_params['user_id']
+
+    if request.method != 'PUT':
+        stats = await load_profile(user_id)
+        if stats is None or not stats.has_stats:
+            return error_page(404)
+        async with Session() as session:
+            modifiers = await load_modifiers(session, user_id)
+        current = effective_stats(stats, *modifiers, datetime.utcnow())
+        return json_response({
+            'health': current.health,
+            'mana': current.mana,
+            'max_health': current.max_health,
+            'max_mana': current.max_mana,
+            'level': stats.level,
+            'money': stats.money
+        })
+
+    if request.state.user_id != user_id:
+        return json_response({'error': 'Unauthorized'}, 403)
+
+    async with Session.begin() as session:
+        stored = (await session.execute(
+            select(*STORED_COLUMNS).where(UserStats.user_id == user_id).with_for_update()
+        )).first()
+        if stored is None:
+            return error_page(404)
+        data = await request.json()
+        values = {column: data[field] for field, column in STATS_FIELDS.items() if field in data}
+        if 'health_points' in values or 'mana' in values:
+            now = datetime.utcnow()
+            materialize(values, effective_stats(stored, *await load_modifiers(session, user_id), now), now)
+        statement = select(UserStats.money).where(UserStats.user_id == user_id)
+        if values:
+            statement = update(UserStats).where(UserStats.user_id == user_id).values(
+                **values).returning(UserStats.money)
+        money = (await session.execute(statement)).scalar()
+
+    invalidate_profile(user_id)
+    leaderboards.record_stats(user_id, money=money)
+    return json_response({'message': 'Stats updated'})
+
+
+# ====================== Магазин ======================
+
+PRODUCT_FIELDS = {
+    'id': (Product.product_id, lambda p: p.product_id),
+    'name': (Product.product_name, lambda p: p.product_name),
+    'price': (Product.price, lambda p: p.price),
+    'category': (Product.category, lambda p: p.category)
+}
+
+
+async def _load_catalogue():
+    async with Session() as session:
+        rows = (await session.execute(select(
+            Product.product_id, Product.product_name, Product.price, Product.category
+        ))).all()
+    return [catalogue_item(row) for row in rows]
+
+
+async def get_products(request):
+    params = request.query_params
+    if any(name in params for name in LIST_ARGS) or has_search_args(params):
+        return await list_response(request, Product, Product.product_id, PRODUCT_FIELDS,
+                                   *product_criteria(params), sorts=PRODUCT_SORTS)
+
+    with flask_app.app_context():
+        body, etag = await product_catalogue.get_async(_load_catalogue)
+        mimetype = None
+        if MSGPACK_ENABLED:
+            mimetype = wants_msgpack(parse_accept_header(request.headers.get('accept'), MIMEAccept))
+        if mimetype is not None:
+            etag = f'{etag}-msgpack'
+        data = product_catalogue.variant(body, mimetype)
+        encoding = choose_encoding(data, parse_accept_header(request.headers.get('accept-encoding')))
+        if encoding is not None:
+            data = product_catalogue.variant(body, mimetype, encoding)
+
+    vary = [name for name, enabled in (('Accept', MSGPACK_ENABLED), ('Accept-Encoding', COMPRESSION_ENABLED))
+            if enabled]
+    headers = {'ETag': quote_etag(etag, weak=encoding is not None),
+               'Cache-Control': f'public, max-age={CATALOGUE_MAX_AGE}'}
+    if vary:
+        headers['Vary'] = ', '.join(vary)
+    if parse_etags(request.headers.get('if-none-match')).contains_weak(etag):
+        return Response(status_code=304, headers=headers)
+    if encoding is not None:
+        headers['Content-Encoding'] = encoding
+    return Response(data, headers=headers, media_type=mimetype or 'application/json')
+
+
+async def _discount_ids(session):
+    ids = daily_discounts.cached_ids()
+    if ids is None:
+        product_ids = (await session.execute(
+            select(Product.product_id).order_by(Product.product_id)
+        )).scalars().all()
+        ids = daily_discounts.choose(list(product_ids))
+    return ids
+
+
+async def purchase(user_id, product_id, idempotency_key=None):
+    """Асинхронный purchases.purchase: те же запросы, ответы и идемпотентность"""
+    async with Session() as session:
+        if idempotency_key:
+            stored = await _stored_response(session, user_id, idempotency_key)
+            if stored is not None:
+                return stored
+
+        base_price = (await session.execute(
+            select(Product.price).where(Product.product_id == product_id)
+        )).scalar()
+        if base_price is None:
+            raise PurchaseError('Product not found', 404)
+
+        price, result = purchase_result(base_price, product_id in await _discount_ids(session))
+
+        try:
+            money_left = (await session.execute(charge_statement(user_id, price))).scalar()
+            if money_left is None:
+                stats_exists = (await session.execute(stats_exists_statement(user_id))).first() is not None
+                await session.rollback()
+                raise charge_error(stats_exists)
+
+            await session.execute(insert(UserInventory).values(
+                user_id=user_id,
+                product_id=product_id,
+                is_equipped=False
+            ))
+            if idempotency_key:
+                await session.execute(insert(IdempotencyKey).values(
+                    user_id=user_id,
+                    key=idempotency_key,
+                    response=json.dumps(result),
+                    status_code=200
+                ))
+            await session.commit()
+        except IntegrityError:
+            await session.rollback()
+            stored = await _stored_response(session, user_id, idempotency_key) if idempotency_key else None
+            if stored is None:
+                raise
+            return stored
+
+    invalidate_profile(user_id)
+    leaderboards.record_stats(user_id, money=money_left)
+    return result, 200
+
+
+async def _stored_response(session, user_id, key):
+    row = (await session.execute(stored_response_statement(user_id, key))).first()
+    if row is None:
+        return None
+    return json.loads(row.response), row.status_code
+
+
+@jwt_required
+@rate_limit('buy_product')
+async def buy_product(request):
+    try:
+        result, status = await purchase(request.state.user_id, request.path_params['product_id'],
+                                        request.headers.get('Idempotency-Key'))
+        return json_response(result, status)
+    except PurchaseError as e:
+        return json_response({'error': str(e)}, e.status_code)
+    except Exception as e:
+        return json_response({'error': str(e)}, 400)
+
+
+async def get_daily_discounts(request):
+    async with Session() as session:
+        ids = await _discount_ids(session)
+        rows = (await session.execute(select(
+            Product.product_id, Product.product_name, Product.price, Product.category, Product.image_url
+        ).where(Product.product_id.in_(ids)))).all() if ids else []
+
+    by_id = {row.product_id: row for row in rows}
+    return json_response([{
+        'id': p.product_id,
+        'name': p.product_name,
+        'original_price': p.price,
+        'discounted_price': int(p.price * (100 - DISCOUNT_PERCENT) / 100),
+        'discount_percent': DISCOUNT_PERCENT,
+        'category': p.category,
+        'image_url': p.image_url
+    } for p in (by_id[product_id] for product_id in ids if product_id in by_id)])
+
+
+# ====================== Задания ======================
+
+@jwt_required
+async def get_tasks(request):
+    user_id = request.state.user_id
+    now = datetime.utcnow()
+    last_completed_at = TaskCompletionRollup.last_completed_at
+
+    def cooldown_remaining(task):
+        if not (task.is_repeatable and task.cooldown_hours and task.last_completed_at):
+            return 0
+        ready_at = task.last_completed_at + timedelta(hours=task.cooldown_hours)
+        return max(0, int((ready_at - now).total_seconds()))
+
+    board = Task.__table__.outerjoin(TaskCompletionRollup.__table__, and_(
+        TaskCompletionRollup.task_id == Task.task_id,
+        TaskCompletionRollup.user_id == user_id
+    ))
+    return await list_response(request, board, Task.task_id, {
+        'id': (Task.task_id, lambda t: t.task_id),
+        'title': (Task.title, lambda t: t.title),
+        'reward': (Task.base_reward, lambda t: t.base_reward),
+        'difficulty': (Task.difficulty, lambda t: t.difficulty),
+        'is_completed': (last_completed_at, lambda t: t.last_completed_at is not None),
+        'can_repeat': ((Task.is_repeatable, last_completed_at),
+                       lambda t: t.is_repeatable and t.last_completed_at is None),
+        'last_completed_at': (last_completed_at, lambda t: t.last_completed_at.isoformat()
+                              if t.last_completed_at else None),
+        'cooldown_remaining': ((Task.is_repeatable, Task.cooldown_hours, last_completed_at),
+                               cooldown_remaining)
+    }, or_(
+        Task.created_by == None,  # Системные задания
+        Task.created_by == user_id  # Созданные текущим пользователем
+    ), *task_criteria(request.query_params), sorts=TASK_SORTS)
+
+
+async def complete_user_task(user_id, task_id):
+    """
+    Асинхронный task_completion.complete_task: та же блокировка (user, task)
+    и те же запросы одной транзакцией. Возвращает (money, experience)
+    """
+    dialect = engine.dialect.name
+    local_lock = None
+    async with Session() as session:
+        if dialect == 'postgresql':
+            await session.execute(text('SELECT pg_advisory_xact_lock(:user_id, :task_id)'),
+                                  {'user_id': user_id, 'task_id': task_id})
+        else:
+            local_lock = _local_locks[hash((user_id, task_id)) % _LOCAL_LOCK_STRIPES]
+            await local_lock.acquire()
+        try:
+            task = (await session.execute(task_rules_statement(user_id, [task_id]))).first()
+            now = datetime.utcnow()
+            check_completion(task, task.last_completed_at if task is not None else None, now)
+
+            await session.execute(insert(TaskHistory).values(
+                task_id=task_id,
+                user_id=user_id,
+                reward_earned=task.base_reward,
+                completed_at=now
+            ))
+            await session.execute(completions_upsert(dialect, [(user_id, task_id, now)]))
+            guild_task_ids = (await session.execute(
+                progress_insert_statement(dialect, [(user_id, task_id, now)])
+            )).scalars().all()
+            if guild_task_ids:
+                await session.execute(*progress_increment(guild_task_ids))
+            stats = (await session.execute(reward_statement(user_id, task.base_reward))).first()
+            if stats is None:
+                raise CompletionError('User not found', 404)
+            await session.commit()
+        finally:
+            if local_lock is not None:
+                local_lock.release()
+
+    invalidate_profile(user_id)
+    leaderboards.record_stats(user_id, money=stats.money, experience=stats.experience)
+    return stats.money, stats.experience
+
+
+@jwt_required
+@rate_limit('complete_task')
+async def complete_task(request):
+    data = await request.json()
+    try:
+        await complete_user_task(request.state.user_id, data['task_id'])
+        return json_response({'message': 'Task completed successfully'})
+    except CompletionError as e:
+        return json_response({'error': str(e)}, e.status_code)
+    except Exception as e:
+        return json_response({'error': str(e)}, 400)
+
+
+# ====================== Гильдии ======================
+
+GUILD_FIELDS = {
+    'id': (Guild.guild_id, lambda g: g.guild_id),
+    'name': (Guild.name, lambda g: g.name),
+    'members_count': (Guild.members_count, lambda g: g.members_count)
+}
+
+
+@jwt_required
+async def guilds(request):
+    if request.method != 'POST':
+        return await list_response(request, Guild, Guild.guild_id, GUILD_FIELDS)
+
+    user_id = request.state.user_id
+    data = await request.json()
+    try:
+        async with Session.begin() as session:
+            guild_id = (await session.execute(insert(Guild).values(
+                name=data['name'],
+                description=data.get('description')
+            ).returning(Guild.guild_id))).scalar_one()
+
+            # Создателя делаем лидером
+            await session.execute(insert(GuildMembership).values(
+                guild_id=guild_id,
+                user_id=user_id,
+                role='leader'
+            ))
+    except Exception as e:
+        return json_response({'error': str(e)}, 400)
+
+    leaderboards.add_member(guild_id, user_id)
+    return json_response({'guild_id': guild_id}, 201)
+
+
+# ====================== Приложение ======================
+
+async def handle_list_args_error(request, error):
+    return json_response({'error': str(error)}, 400)
+
+
+async def handle_hashing_busy(request, error):
+    response = json_response({'error': 'Too many authentication requests, try again later'}, 429)
+    response.headers['Retry-After'] = '1'
+    return response
+
+
+async def handle_rate_limited(request, error):
+    response = json_response({'error': 'Too many requests, try again later'}, 429)
+    response.headers['Retry-After'] = retry_after_header(error.retry_after)
+    return response
+
+
+async def handle_http_error(request, error):
+    if error.status_code in default_exceptions:
+        return error_page(error.status_code)
+    return Response(error.detail, error.status_code)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    yield
+    await engine.dispose()
+
+
+app = Starlette(
+    routes=[
+        Route('/api/register', register, methods=['POST']),
+        Route('/api/login', login, methods=['POST']),
+        Route('/api/users/{user_id:int}', get_user, methods=['GET']),
+        Route('/api/users/{user_id:int}/stats', user_stats, methods=['GET', 'PUT']),
+        Route('/api/products', get_products, methods=['GET']),
+        Route('/api/products/{product_id:int}/buy', buy_product, methods=['POST']),
+        Route('/api/daily-discounts', get_daily_discounts, methods=['GET']),
+        Route('/api/tasks', get_tasks, methods=['GET']),
+        Route('/api/tasks/complete', complete_task, methods=['POST']),
+        Route('/api/guilds', guilds, methods=['GET', 'POST']),
+    ],
+    exception_handlers={
+        ListArgsError: handle_list_args_error,
+        HashingBusy: handle_hashing_busy,
+        RateLimited: handle_rate_limited,
+        HTTPException: handle_http_error,
+    },
+    lifespan=lifespan,
+)
@@ -0,0 +1,237 @@
+"""
+Пакетные эндпоинты: клиент, синхронизирующий офлайн-прогресс, присылает
+массив элементов, которые применяются одной транзакцией set-based
+запросами, а в ответе — результат по каждому элементу (index, status,
+error). Здесь — разбор пакетов, обновление статистики и определения
+товаров/заданий для администраторов; выполнение заданий и покупки —
+в task_completion.py и purchases.py.
+"""
+import os
+from datetime import datetime
+
+from flask import jsonify
+from sqlalchemy import insert, select, update
+
+from database import db
+from models import Product, Task, UserStats
+from catalog import product_catalogue
+from discounts import daily_discounts
+from profiles import invalidate_profile
+from leaderboard import leaderboards
+from stats_engine import STATS_FIELDS, STORED_COLUMNS, effective_stats, load_modifiers, materialize
+
+BATCH_MAX_ITEMS = int(os.getenv('BATCH_MAX_ITEMS', '500'))
+
+TASK_DIFFICULTIES = ('easy', 'medium', 'hard')
+
+
+class BatchError(ValueError):
+    """Пакет нельзя принять целиком; results — ошибки по элементам, если есть"""
+
+    def __init__(self, message, results=None):
+        super().__init__(message)
+        self.results = results
+
+
+def handle_batch_error(error):
+    body = {'error': str(error)}
+    if error.results is not None:
+        body['results'] = error.results
+    return jsonify(body), 400
+
+
+def batch_items(data, key):
+    """Непустой список элементов пакета data[key] не длиннее BATCH_MAX_ITEMS"""
+    items = data.get(key) if isinstance(data, dict) else None
+    if not isinstance(items, list) or not items:
+        raise BatchError(f'{key} must be a non-empty list')
+    if len(items) > BATCH_MAX_ITEMS:
+        raise BatchError(f'{key} must contain at most {BATCH_MAX_ITEMS} items')
+    return items
+
+
+def _is_int(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def batch_ids(data, key):
+    """Список целых id из пакета data[key]"""
+    ids = batch_items(data, key)
+    if not all(_is_int(item) for item in ids):
+        raise BatchError(f'{key} must contain integer ids')
+    return ids
+
+
+def _optional_str(item, name, errors):
+    value = item.get(name)
+    if value is not None and not isinstance(value, str):
+        errors.append(f'{name} must be a string')
+    return value
+
+
+def _required_str(item, name, errors):
+    value = item.get(name)
+    if not isinstance(value, str) or not value.strip():
+        errors.append(f'{name} is required')
+    return value
+
+
+def _non_negative_int(item, name, errors, required=True):
+    value = item.get(name)
+    if value is None and not required:
+        return None
+    if not _is_int(value) or value < 0:
+        errors.append(f'{name} must be a non-negative integer')
+    return value
+
+
+def _validate(items, row_from_item):
+    """
+    Проверяет все элементы до записи: (строки для вставки, результаты);
+    при любой ошибке бросает BatchError с ошибками по элементам
+    """
+    rows, results, failed = [], [], False
+    for index, item in enumerate(items):
+        errors = []
+        row = row_from_item(item, errors) if isinstance(item, dict) else None
+        if row is None and not errors:
+            errors.append('item must be an object')
+        if errors:
+            failed = True
+            results.append({'index': index, 'status': 400, 'error': '; '.join(errors)})
+        else:
+            rows.append(row)
+            results.append({'index': index, 'status': 201})
+    if failed:
+        raise BatchError('Batch rejected, nothing was written', results)
+    return rows, results
+
+
+def _insert_returning_ids(model, key, rows):
+    """Одна вставка пакета (executemany/insertmanyvalues) с id в порядке строк"""
+    statement = insert(model).returning(key, sort_by_parameter_order=True)
+    return db.session.execute(statement, rows).scalars().all()
+
+
+def _product_row(item, errors):
+    return {
+        'product_name': _required_str(item, 'name', errors),
+        'price': _non_negative_int(item, 'price', errors),
+        'category': _optional_str(item, 'category', errors),
+        'image_url': _optional_str(item, 'image_url', errors)
+    }
+
+
+def create_products(items):
+    """
+    Создает товары пакетом (всё или ничего): name, price, category, image_url.
+    Возвращает результаты с id созданных товаров
+    """
+    rows, results = _validate(items, _product_row)
+    try:
+        ids = _insert_returning_ids(Product, Product.product_id, rows)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    # Core-вставка не порождает событий модели — кеши сбрасываем сами
+    product_catalogue.invalidate()
+    daily_discounts.invalidate()
+    for result, product_id in zip(results, ids):
+        result['id'] = product_id
+    return results
+
+
+def _task_row(item, errors):
+    difficulty = item.get('difficulty')
+    if difficulty not in TASK_DIFFICULTIES:
+        errors.append(f'difficulty must be one of: {", ".join(TASK_DIFFICULTIES)}')
+    is_repeatable = item.get('is_repeatable', False)
+    if not isinstance(is_repeatable, bool):
+        errors.append('is_repeatable must be a boolean')
+    return {
+        'title': _required_str(item, 'title', errors),
+        'description': _optional_str(item, 'description', errors),
+        'difficulty': difficulty,
+        'category': _optional_str(item, 'category', errors),
+        'base_reward': _non_negative_int(item, 'reward', errors),
+        'is_repeatable': is_repeatable,
+        'cooldown_hours': _non_negative_int(item, 'cooldown_hours', errors, required=False),
+        'created_by': None  # задания администратора — системные
+    }
+
+
+def create_tasks(items):
+    """
+    Создает системные задания пакетом (всё или ничего): title, description,
+    difficulty, category, reward, is_repeatable, cooldown_hours.
+    Возвращает результаты с id созданных заданий
+    """
+    rows, results = _validate(items, _task_row)
+    try:
+        ids = _insert_returning_ids(Task, Task.task_id, rows)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    for result, task_id in zip(results, ids):
+        result['id'] = task_id
+    return results
+
+
+def update_stats(user_id, updates):
+    """
+    Применяет накопленные офлайн обновления статистики по порядку:
+    поля сливаются (последнее значение побеждает) и записываются одним
+    UPDATE ... RETURNING. Некорректные элементы пропускаются с 400.
+    Итоговые health и mana — действующие, с регенерацией (stats_engine).
+    Возвращает (результаты, итоговые значения) или (результаты, None),
+    если строки статистики нет
+    """
+    results, values = [], {}
+    for index, item in enumerate(updates):
+        errors = []
+        if not isinstance(item, dict):
+            errors.append('item must be an object')
+        else:
+            for name in item:
+                if name not in STATS_FIELDS:
+                    errors.append(f'unknown field {name}')
+                elif not _is_int(item[name]):
+                    errors.append(f'{name} must be an integer')
+        if errors:
+            results.append({'index': index, 'status': 400, 'error': '; '.join(errors)})
+            continue
+        for name, value in item.items():
+            values[STATS_FIELDS[name]] = value
+        results.append({'index': index, 'status': 200})
+
+    now = datetime.utcnow()
+    statement = update(UserStats).where(UserStats.user_id == user_id)
+    try:
+        if 'health_points' in values or 'mana' in values:
+            # Регенерация до этого момента фиксируется в записи
+            stored = db.session.execute(
+                select(*STORED_COLUMNS).where(UserStats.user_id == user_id).with_for_update()
+            ).first()
+            if stored is not None:
+                materialize(values, effective_stats(stored, *load_modifiers(user_id), now), now)
+        if values:
+            statement = statement.values(**values)
+        else:
+            # Нечего менять — тем же запросом проверяем, что строка есть
+            statement = statement.values(money=UserStats.money)
+        stats = db.session.execute(
+            statement.returning(UserStats.money, *STORED_COLUMNS).execution_options(synchronize_session=False)
+        ).first()
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    if stats is None:
+        return results, None
+    if values:
+        invalidate_profile(user_id)
+        leaderboards.record_stats(user_id, money=stats.money)
+    current = effective_stats(stats, *load_modifiers(user_id), now)
+    return results, {'health': current.health, 'mana': current.mana, 'money': stats.money}
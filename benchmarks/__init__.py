@@ -0,0 +1,6 @@
+"""
+Нагрузочные сценарии и бенчмарки API.
+Запускаются из корня проекта: python -m benchmarks.<сценарий> --help
+По умолчанию работают с временной SQLite-базой, --db-uri позволяет
+указать локальный PostgreSQL.
+"""
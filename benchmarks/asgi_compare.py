@@ -0,0 +1,163 @@
+"""
+Сравнение WSGI- и ASGI-режимов под конкурентной нагрузкой.
+Оба сервера поднимаются в отдельных процессах на одной засеянной базе
+(WSGI — многопоточный werkzeug, ASGI — uvicorn с asgi:app), асинхронный
+клиент httpx держит --concurrency одновременных соединений и печатает
+p50/p95/p99 и пропускную способность по каждому сценарию.
+
+    python -m benchmarks.asgi_compare --concurrency 16,256 --requests 2000
+    python -m benchmarks.asgi_compare --db-uri postgresql://bench@localhost/bench --modes asgi
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import subprocess
+import sys
+import time
+
+import httpx
+
+from benchmarks.common import make_app, add_db_uri_argument
+from benchmarks.load import SCENARIOS, build_requests, percentile
+from benchmarks.seed import seed, DEFAULT_SIZES
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODES = ('wsgi', 'asgi')
+DEFAULT_SCENARIOS = ('get_tasks', 'guilds', 'complete_task', 'buy_product', 'login')
+
+
+def serve_wsgi(port):
+    """Многопоточный сервер werkzeug: поток на соединение, как app.run()"""
+    from werkzeug.serving import run_simple
+    from app import create_app
+
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    run_simple('127.0.0.1', port, create_app(), threaded=True)
+
+
+def start_server(mode, port):
+    if mode == 'wsgi':
+        command = [sys.executable, '-m', 'benchmarks.asgi_compare', '--serve-wsgi', str(port)]
+    else:
+        command = [sys.executable, '-m', 'uvicorn', 'asgi:app', '--port', str(port),
+                   '--log-level', 'warning', '--no-access-log']
+    process = subprocess.Popen(command, cwd=ROOT)
+
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'{mode} server exited with code {process.returncode}')
+        try:
+            httpx.get(f'http://127.0.0.1:{port}/api/products', timeout=1)
+            return process
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f'{mode} server did not start on port {port}')
+
+
+async def run_scenario(base_url, name, data, tokens, total, concurrency, rng_seed):
+    requests = build_requests(name, data, tokens, random.Random(rng_seed))
+    latencies = []
+    errors = 0
+    remaining = total
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=120) as client:
+
+        async def worker():
+            nonlocal errors, remaining
+            while remaining > 0:
+                remaining -= 1
+                method, url, kwargs = next(requests)
+                started = time.perf_counter()
+                try:
+                    response = await client.request(method.upper(), url, **kwargs)
+                    failed = response.status_code >= 500
+                except httpx.HTTPError:
+                    failed = True
+                latencies.append((time.perf_counter() - started) * 1000)
+                errors += failed
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        wall = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'requests': total,
+        'errors': errors,
+        'p50_ms': round(percentile(latencies, 0.50), 3),
+        'p95_ms': round(percentile(latencies, 0.95), 3),
+        'p99_ms': round(percentile(latencies, 0.99), 3),
+        'throughput_rps': round(total / wall, 1),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_db_uri_argument(parser)
+    parser.add_argument('--modes', default=','.join(MODES))
+    parser.add_argument('--scenarios', default=','.join(DEFAULT_SCENARIOS))
+    parser.add_argument('--concurrency', default='16,256', help='уровни конкурентности через запятую')
+    parser.add_argument('--requests', type=int, default=1000, help='запросов на сценарий')
+    parser.add_argument('--port', type=int, default=8765)
+    for name, size in DEFAULT_SIZES.items():
+        parser.add_argument(f'--{name}', type=int, default=size, help=f'строк {name} в наборе данных')
+    parser.add_argument('--save', help='сохранить результаты в JSON')
+    parser.add_argument('--serve-wsgi', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.serve_wsgi:
+        serve_wsgi(args.serve_wsgi)
+        return 0
+
+    modes = [mode.strip() for mode in args.modes.split(',') if mode.strip()]
+    scenarios = [name.strip() for name in args.scenarios.split(',') if name.strip()]
+    levels = [int(level) for level in args.concurrency.split(',')]
+    unknown = (set(modes) - set(MODES)) | (set(scenarios) - set(SCENARIOS))
+    if unknown:
+        parser.error(f'unknown modes or scenarios: {", ".join(sorted(unknown))}')
+
+    # make_app выставляет DB_URI в окружение — серверы наследуют ту же базу
+    app = make_app(args.db_uri)
+    data = seed(app, {name: getattr(args, name) for name in DEFAULT_SIZES})
+
+    from flask_jwt_extended import create_access_token
+
+    with app.app_context():
+        tokens = {user_id: create_access_token(identity=user_id) for user_id in data['users']}
+
+    results = {}
+    for mode in modes:
+        process = start_server(mode, args.port)
+        try:
+            for concurrency in levels:
+                for index, name in enumerate(scenarios):
+                    row = asyncio.run(run_scenario(f'http://127.0.0.1:{args.port}', name, data, tokens,
+                                                   args.requests, concurrency, rng_seed=index))
+                    results.setdefault(mode, {}).setdefault(str(concurrency), {})[name] = row
+                    print(f'{mode:<5} c={concurrency:<5} {name:<14} p50 {row["p50_ms"]:>8.2f} ms  '
+                          f'p95 {row["p95_ms"]:>8.2f} ms  p99 {row["p99_ms"]:>8.2f} ms  '
+                          f'{row["throughput_rps"]:>8.1f} rps  errors {row["errors"]}')
+        finally:
+            process.terminate()
+            process.wait()
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as file:
+            json.dump({
+                'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'requests': args.requests,
+                'dataset': {name: getattr(args, name) for name in DEFAULT_SIZES},
+                'results': results,
+            }, file, indent=2, ensure_ascii=False)
+        print(f'results saved to {args.save}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
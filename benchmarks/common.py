@@ -0,0 +1,31 @@
+import os
+import tempfile
+
+
+def make_app(db_uri=None):
+    """
+    Создает приложение с базой для бенчмарка и схему.
+    DB_URI выставляется до импорта app, поэтому .env его не перекрывает.
+    Лимиты частоты запросов выключены, если RATE_LIMIT_ENABLED не задан явно.
+    Рейтинг строится при первом запросе к нему — уже по созданной схеме
+    и заполненным данным.
+    """
+    if db_uri is None:
+        path = os.path.join(tempfile.mkdtemp(prefix='bench-'), 'bench.sqlite')
+        db_uri = f'sqlite:///{path}'
+    os.environ['DB_URI'] = db_uri
+    # Иначе сценарии упираются в лимиты и меряют ответы 429
+    # (лимитер читает настройку при импорте, поэтому до импорта app)
+    os.environ.setdefault('RATE_LIMIT_ENABLED', '0')
+
+    from app import create_app
+    from database import db
+
+    app = create_app({'LEADERBOARD_AUTOSTART': False})
+    with app.app_context():
+        db.create_all()
+    return app
+
+
+def add_db_uri_argument(parser):
+    parser.add_argument('--db-uri', help='URI тестовой БД (по умолчанию временная SQLite)')
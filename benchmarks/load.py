@@ -0,0 +1,208 @@
+"""
+Нагрузочный прогон горячих эндпоинтов API.
+Засевает синтетические данные, гоняет каждый сценарий конкурентным
+клиентом (Flask test client в потоках, без сети) и печатает p50/p95/p99,
+пропускную способность и число SQL-запросов на запрос.
+
+    python -m benchmarks --requests 500 --concurrency 8
+    python -m benchmarks --save benchmarks/baseline.json
+    python -m benchmarks --compare benchmarks/baseline.json --tolerance 0.25
+
+При --compare код возврата 1, если p95 вырос больше допуска или
+увеличилось число запросов к БД на запрос.
+"""
+import argparse
+import itertools
+import json
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import event
+
+from benchmarks.common import make_app, add_db_uri_argument
+from benchmarks.seed import seed, BENCH_PASSWORD, DEFAULT_SIZES
+
+SCENARIOS = ('register', 'login', 'buy_product', 'complete_task', 'get_tasks', 'guilds')
+
+
+class QueryCounter:
+    """Считает SQL-запросы текущего потока через события движка"""
+
+    def __init__(self, engine):
+        self._local = threading.local()
+        event.listen(engine, 'before_cursor_execute', self._on_execute)
+
+    def _on_execute(self, *args):
+        self._local.count = getattr(self._local, 'count', 0) + 1
+
+    def reset(self):
+        self._local.count = 0
+
+    @property
+    def count(self):
+        return getattr(self._local, 'count', 0)
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def build_requests(name, data, tokens, rng):
+    """Бесконечный генератор (method, url, kwargs) для сценария"""
+    counter = itertools.count()
+    user_ids = data['users']
+
+    def auth():
+        return {'Authorization': f'Bearer {tokens[rng.choice(user_ids)]}'}
+
+    while True:
+        if name == 'register':
+            yield 'post', '/api/register', {'json': {
+                'name': f'bench-new-{time.time_ns()}-{next(counter)}', 'password': BENCH_PASSWORD}}
+        elif name == 'login':
+            yield 'post', '/api/login', {'json': {
+                'name': f'bench-user-{rng.randrange(len(user_ids))}', 'password': BENCH_PASSWORD}}
+        elif name == 'buy_product':
+            yield 'post', f'/api/products/{rng.choice(data["products"])}/buy', {'headers': auth()}
+        elif name == 'complete_task':
+            yield 'post', '/api/tasks/complete', {
+                'json': {'task_id': rng.choice(data['repeatable_tasks'])}, 'headers': auth()}
+        elif name == 'get_tasks':
+            yield 'get', '/api/tasks', {'headers': auth()}
+        elif name == 'guilds':
+            yield 'get', '/api/guilds', {'headers': auth()}
+
+
+def run_scenario(app, counter, name, data, tokens, total, concurrency, rng_seed):
+    rng = random.Random(rng_seed)
+    lock = threading.Lock()
+    requests = build_requests(name, data, tokens, rng)
+    latencies, queries = [], []
+    errors = 0
+
+    def next_request():
+        with lock:
+            return next(requests)
+
+    def worker(count):
+        nonlocal errors
+        client = app.test_client()
+        for _ in range(count):
+            method, url, kwargs = next_request()
+            counter.reset()
+            started = time.perf_counter()
+            response = getattr(client, method)(url, **kwargs)
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies.append(elapsed * 1000)
+                queries.append(counter.count)
+                # 4xx (в том числе 429 лимитера) — тоже ошибка: такие
+                # ответы не делают работы сценария и искажают замер
+                if not 200 <= response.status_code < 300:
+                    errors += 1
+
+    per_worker = [total // concurrency + (1 if i < total % concurrency else 0)
+                  for i in range(concurrency)]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(worker, per_worker))
+    wall = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'requests': total,
+        'errors': errors,
+        'p50_ms': round(percentile(latencies, 0.50), 3),
+        'p95_ms': round(percentile(latencies, 0.95), 3),
+        'p99_ms': round(percentile(latencies, 0.99), 3),
+        'throughput_rps': round(total / wall, 1),
+        'queries_per_request': round(sum(queries) / len(queries), 2),
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Список регрессий относительно сохраненного baseline"""
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get('scenarios', {}).get(name)
+        if previous is None:
+            continue
+        if current['p95_ms'] > previous['p95_ms'] * (1 + tolerance):
+            regressions.append(f'{name}: p95 {previous["p95_ms"]} -> {current["p95_ms"]} ms')
+        if current['queries_per_request'] > previous['queries_per_request']:
+            regressions.append(f'{name}: queries/request {previous["queries_per_request"]} '
+                               f'-> {current["queries_per_request"]}')
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_db_uri_argument(parser)
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS))
+    parser.add_argument('--requests', type=int, default=300, help='запросов на сценарий')
+    parser.add_argument('--concurrency', type=int, default=8)
+    for name, size in DEFAULT_SIZES.items():
+        parser.add_argument(f'--{name}', type=int, default=size, help=f'строк {name} в наборе данных')
+    parser.add_argument('--save', help='сохранить результаты как baseline JSON')
+    parser.add_argument('--compare', help='сравнить с baseline JSON')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='допустимый рост p95 (доля)')
+    args = parser.parse_args(argv)
+
+    scenarios = [name.strip() for name in args.scenarios.split(',') if name.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f'unknown scenarios: {", ".join(sorted(unknown))}')
+
+    app = make_app(args.db_uri)
+    data = seed(app, {name: getattr(args, name) for name in DEFAULT_SIZES})
+
+    from flask_jwt_extended import create_access_token
+    from database import db
+
+    with app.app_context():
+        tokens = {user_id: create_access_token(identity=user_id) for user_id in data['users']}
+        counter = QueryCounter(db.engine)
+        dialect = db.engine.dialect.name
+
+    results = {}
+    for index, name in enumerate(scenarios):
+        results[name] = run_scenario(app, counter, name, data, tokens,
+                                     args.requests, args.concurrency, rng_seed=index)
+        row = results[name]
+        print(f'{name:<14} p50 {row["p50_ms"]:>8.2f} ms  p95 {row["p95_ms"]:>8.2f} ms  '
+              f'p99 {row["p99_ms"]:>8.2f} ms  {row["throughput_rps"]:>8.1f} rps  '
+              f'{row["queries_per_request"]:>5.2f} q/req  errors {row["errors"]}')
+
+    report = {
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'dialect': dialect,
+        'requests': args.requests,
+        'concurrency': args.concurrency,
+        'dataset': {name: getattr(args, name) for name in DEFAULT_SIZES},
+        'scenarios': results,
+    }
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as file:
+            json.dump(report, file, indent=2, ensure_ascii=False)
+        print(f'baseline saved to {args.save}')
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as file:
+            baseline = json.load(file)
+        regressions = compare(results, baseline, args.tolerance)
+        for line in regressions:
+            print(f'REGRESSION {line}')
+        if regressions:
+            return 1
+        print('no regressions')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,64 @@
+"""
+Пропускная способность проверки паролей (логинов в секунду).
+Меряет проверку хеша в одном процессе (логинов/с на ядро) и через пул
+процессов PasswordHasher с заданным числом воркеров.
+
+    python -m benchmarks.password_hashing --method pbkdf2:sha256:600000 --workers 4
+"""
+import argparse
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--method', default=None, help='метод werkzeug (по умолчанию — метод werkzeug)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--seconds', type=float, default=3.0)
+    args = parser.parse_args()
+
+    from werkzeug.security import check_password_hash
+    from passwords import PasswordHasher, HashingBusy, _hash
+
+    stored = _hash('bench-password', args.method)
+    print(f'method: {stored.split("$", 1)[0]}')
+
+    count = 0
+    started = time.perf_counter()
+    while time.perf_counter() - started < args.seconds:
+        check_password_hash(stored, 'bench-password')
+        count += 1
+    per_core = count / (time.perf_counter() - started)
+    print(f'inline: {per_core:.1f} logins/s per core, {1000 / per_core:.1f} ms per login')
+
+    hasher = PasswordHasher(method=args.method, workers=args.workers, max_pending=args.workers * 4)
+    hasher.verify(stored, 'bench-password')  # прогрев пула
+    results = {'ok': 0, 'busy': 0}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + args.seconds
+
+    def client():
+        while time.perf_counter() < deadline:
+            try:
+                hasher.verify(stored, 'bench-password')
+                outcome = 'ok'
+            except HashingBusy:
+                outcome = 'busy'
+                time.sleep(0.001)
+            with lock:
+                results[outcome] += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.workers * 8) as pool:
+        for _ in range(args.workers * 8):
+            pool.submit(client)
+    elapsed = time.perf_counter() - started
+    total = results['ok'] / elapsed
+    print(f'pool ({args.workers} workers): {total:.1f} logins/s, '
+          f'{total / args.workers:.1f} per core, rejected with 429: {results["busy"]}')
+
+
+if __name__ == '__main__':
+    main()
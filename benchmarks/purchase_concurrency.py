@@ -0,0 +1,89 @@
+"""
+Конкурентные покупки с одного кошелька.
+Много потоков одновременно покупают товар у одного пользователя;
+проверяется, что баланс не ушел в минус и списано ровно столько,
+сколько куплено предметов.
+
+    python -m benchmarks.purchase_concurrency --threads 16 --attempts 50
+"""
+import argparse
+import threading
+import time
+
+from benchmarks.common import make_app, add_db_uri_argument
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    add_db_uri_argument(parser)
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--attempts', type=int, default=50, help='покупок на поток')
+    parser.add_argument('--money', type=int, default=1000)
+    parser.add_argument('--price', type=int, default=7)
+    args = parser.parse_args()
+
+    app = make_app(args.db_uri)
+
+    from database import db
+    from discounts import daily_discounts, discounted_price
+    from models import User, UserStats, Product, UserInventory
+    from purchases import purchase, PurchaseError
+
+    with app.app_context():
+        user = User(name=f'bench-wallet-{time.time_ns()}', password='-')
+        db.session.add(user)
+        db.session.flush()
+        db.session.add(UserStats(user_id=user.user_id, money=args.money))
+        product = Product(product_name='bench item', price=args.price)
+        db.session.add(product)
+        db.session.commit()
+        user_id, product_id = user.user_id, product.product_id
+        # Скидка дня меняет цену — считаем фактическую
+        price_paid = discounted_price(args.price) \
+            if daily_discounts.is_discounted(product_id) else args.price
+
+    counters = {'ok': 0, 'rejected': 0, 'errors': 0}
+    lock = threading.Lock()
+    start_barrier = threading.Barrier(args.threads)
+
+    def worker():
+        start_barrier.wait()
+        for _ in range(args.attempts):
+            with app.app_context():
+                try:
+                    purchase(user_id, product_id)
+                    outcome = 'ok'
+                except PurchaseError:
+                    outcome = 'rejected'
+                except Exception:
+                    db.session.rollback()
+                    outcome = 'errors'
+            with lock:
+                counters[outcome] += 1
+
+    threads = [threading.Thread(target=worker) for _ in range(args.threads)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    with app.app_context():
+        money = db.session.get(UserStats, user_id).money
+        items = UserInventory.query.filter_by(user_id=user_id).count()
+
+    total = args.threads * args.attempts
+    print(f'attempts: {total}, ok: {counters["ok"]}, rejected: {counters["rejected"]}, '
+          f'errors: {counters["errors"]}')
+    print(f'elapsed: {elapsed:.3f}s, {total / elapsed:.0f} attempts/s')
+    print(f'money left: {money}, items: {items}, price: {price_paid}')
+
+    assert money >= 0, 'баланс ушел в минус'
+    assert items == counters['ok'], 'число предметов не совпадает с успешными покупками'
+    assert args.money - money == items * price_paid, 'списано не столько, сколько куплено'
+    print('OK: overspend not possible')
+
+
+if __name__ == '__main__':
+    main()
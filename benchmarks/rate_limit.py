@@ -0,0 +1,61 @@
+"""
+Накладные расходы лимитера на разрешенном пути: время RateLimiter.check
+для одного ключа и для множества разных ключей, а также view под
+декоратором rate_limit (с получением ключа из запроса) против голого view.
+
+    python -m benchmarks.rate_limit --keys 10000
+"""
+import argparse
+import os
+import time
+
+# Лимит заведомо не исчерпывается — меряем только разрешенный путь
+BENCH_LIMIT = (1e12, 10 ** 9)
+
+
+def _measure(check, keys, iterations):
+    started = time.perf_counter()
+    for i in range(iterations):
+        check('bench', keys[i % len(keys)])
+    return (time.perf_counter() - started) / iterations * 1e9
+
+
+def _measure_view(view, iterations):
+    started = time.perf_counter()
+    for _ in range(iterations):
+        view()
+    return (time.perf_counter() - started) / iterations * 1e9
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--keys', type=int, default=10000, help='разных ключей во втором замере')
+    parser.add_argument('--iterations', type=int, default=1000000)
+    args = parser.parse_args()
+
+    # Декоратор оборачивает view, только если лимит включен на момент импорта
+    os.environ['RATE_LIMIT_ENABLED'] = '1'
+    os.environ['RATE_LIMITS'] = 'bench=1000000000000/1:1000000000'
+
+    from flask import Flask, g
+    from ratelimit import MemoryBackend, RateLimiter, rate_limit
+
+    limiter = RateLimiter({'bench': BENCH_LIMIT}, MemoryBackend(max_keys=args.keys * 2))
+    for keys in ([1], list(range(args.keys))):
+        nanos = _measure(limiter.check, keys, args.iterations)
+        print(f'{len(keys):>8} keys: {nanos:.0f} ns per allowed request')
+
+    def view():
+        return None
+
+    app = Flask(__name__)
+    with app.test_request_context('/', environ_base={'REMOTE_ADDR': '10.0.0.1'}):
+        g.current_user_id = 1  # как после первого current_user_id() в запросе
+        bare = _measure_view(view, args.iterations)
+        for per in ('user', 'ip'):
+            nanos = _measure_view(rate_limit('bench', per=per)(view), args.iterations) - bare
+            print(f'rate_limit per={per}: +{nanos:.0f} ns per allowed request')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+"""
+Синтетический набор данных для бенчмарков.
+Строки вставляются пачками через Core (executemany), пароль у всех
+пользователей одинаковый и хешируется один раз. Сводка
+tasks_history_rollup заполняется из истории тем же INSERT ... SELECT,
+что и в миграции e5a83f1c7b20.
+"""
+import random
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, insert, select
+from werkzeug.security import generate_password_hash
+
+BENCH_PASSWORD = 'bench-password'
+BATCH_SIZE = 5000
+
+DEFAULT_SIZES = {
+    'users': 1000,
+    'products': 200,
+    'tasks': 100,
+    'history': 20000,
+    'guilds': 100,
+    'memberships': 2000,
+}
+
+
+def _insert_batches(table, rows):
+    from database import db
+    for start in range(0, len(rows), BATCH_SIZE):
+        db.session.execute(insert(table), rows[start:start + BATCH_SIZE])
+
+
+def seed(app, sizes=None, rng_seed=42):
+    """
+    Заполняет пустую БД и возвращает словарь с id созданных объектов:
+    {'users': [...], 'products': [...], 'tasks': [...], 'repeatable_tasks': [...], 'guilds': [...]}
+    """
+    from database import db
+    from models import (
+        User, UserStats, Product, Task, TaskHistory, TaskCompletionRollup, Guild, GuildMembership
+    )
+
+    sizes = {**DEFAULT_SIZES, **(sizes or {})}
+    rng = random.Random(rng_seed)
+    now = datetime.utcnow()
+    password = generate_password_hash(BENCH_PASSWORD)
+
+    with app.app_context():
+        _insert_batches(User.__table__, [
+            {'name': f'bench-user-{i}', 'password': password, 'registr_date': now}
+            for i in range(sizes['users'])
+        ])
+        user_ids = [row[0] for row in db.session.query(User.user_id).order_by(User.user_id)]
+        _insert_batches(UserStats.__table__, [
+            {'user_id': user_id, 'money': 10 ** 9, 'experience': rng.randint(0, 10000),
+             'level': 1, 'health_points': 100, 'mana': 50, 'max_health_points': 100,
+             'max_mana': 50, 'last_update': now}
+            for user_id in user_ids
+        ])
+
+        _insert_batches(Product.__table__, [
+            {'product_name': f'bench-product-{i}', 'price': rng.randint(1, 500),
+             'category': rng.choice(['weapon', 'armor', 'potion', 'skin'])}
+            for i in range(sizes['products'])
+        ])
+        product_ids = [row[0] for row in db.session.query(Product.product_id)]
+
+        # Половина заданий повторяемые без cooldown — их можно выполнять в цикле
+        _insert_batches(Task.__table__, [
+            {'title': f'bench-task-{i}', 'difficulty': rng.choice(['easy', 'medium', 'hard']),
+             'category': rng.choice(['study', 'sport', 'health']),
+             'base_reward': rng.randint(1, 50), 'is_repeatable': i % 2 == 0,
+             'cooldown_hours': None}
+            for i in range(sizes['tasks'])
+        ])
+        tasks = db.session.query(Task.task_id, Task.is_repeatable).all()
+        task_ids = [task.task_id for task in tasks]
+        repeatable_task_ids = [task.task_id for task in tasks if task.is_repeatable]
+
+        _insert_batches(TaskHistory.__table__, [
+            {'task_id': rng.choice(repeatable_task_ids), 'user_id': rng.choice(user_ids),
+             'reward_earned': 1, 'completed_at': now - timedelta(minutes=rng.randint(1, 60 * 24 * 90))}
+            for _ in range(sizes['history'])
+        ])
+        db.session.execute(insert(TaskCompletionRollup.__table__).from_select(
+            ['user_id', 'task_id', 'completions', 'last_completed_at'],
+            select(TaskHistory.user_id, TaskHistory.task_id, func.count(), func.max(TaskHistory.completed_at))
+            .group_by(TaskHistory.user_id, TaskHistory.task_id)
+        ))
+
+        _insert_batches(Guild.__table__, [
+            {'name': f'bench-guild-{i}', 'created_at': now}
+            for i in range(sizes['guilds'])
+        ])
+        guild_ids = [row[0] for row in db.session.query(Guild.guild_id)]
+
+        pairs = set()
+        while len(pairs) < min(sizes['memberships'], len(user_ids) * len(guild_ids)):
+            pairs.add((rng.choice(guild_ids), rng.choice(user_ids)))
+        _insert_batches(GuildMembership.__table__, [
+            {'guild_id': guild_id, 'user_id': user_id, 'role': 'member', 'join_date': now}
+            for guild_id, user_id in pairs
+        ])
+
+        db.session.commit()
+
+    return {
+        'users': user_ids,
+        'products': product_ids,
+        'tasks': task_ids,
+        'repeatable_tasks': repeatable_task_ids,
+        'guilds': guild_ids,
+    }
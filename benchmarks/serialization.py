@@ -0,0 +1,69 @@
+"""
+Размер и время сериализации типичных ответов: стандартный JSON-провайдер
+Flask против FastJSONProvider (orjson, если установлен), MessagePack,
+а также размер после gzip и brotli.
+
+    python -m benchmarks.serialization --rows 1000
+"""
+import argparse
+import gzip
+import time
+from datetime import datetime, timedelta
+
+
+def _payloads(rows):
+    now = datetime(2024, 1, 1)
+    return {
+        'products': [{
+            'id': i, 'name': f'Зелье здоровья {i}', 'price': 100 + i % 900, 'category': 'potion'
+        } for i in range(rows)],
+        'tasks': [{
+            'id': i, 'title': f'Пробежка {i} км', 'reward': 10 + i % 50, 'difficulty': 'medium',
+            'is_completed': i % 3 == 0, 'can_repeat': i % 2 == 0,
+            'last_completed_at': (now - timedelta(minutes=i)).isoformat(), 'cooldown_remaining': i % 3600
+        } for i in range(rows)],
+        'stats': {'health': 100, 'mana': 50, 'level': 7, 'money': 1234},
+    }
+
+
+def _measure(encode, payload, seconds):
+    body = encode(payload)
+    count = 0
+    started = time.perf_counter()
+    while time.perf_counter() - started < seconds:
+        encode(payload)
+        count += 1
+    return body, (time.perf_counter() - started) / count * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=1000, help='строк в списочных ответах')
+    parser.add_argument('--seconds', type=float, default=0.5, help='время замера на вариант')
+    args = parser.parse_args()
+
+    from flask import Flask
+    from flask.json.provider import DefaultJSONProvider
+    from serialization import FastJSONProvider, brotli, msgpack, orjson, BROTLI_QUALITY, GZIP_LEVEL
+
+    app = Flask(__name__)
+    stdlib = DefaultJSONProvider(app)
+    fast = FastJSONProvider(app)
+    encoders = {
+        'flask json': lambda obj: stdlib.dumps(obj).encode(),
+        'fast json (orjson)' if orjson else 'fast json (stdlib)': lambda obj: fast.dumps(obj).encode(),
+    }
+    if msgpack is not None:
+        encoders['msgpack'] = lambda obj: msgpack.packb(obj, use_bin_type=True)
+
+    print(f'{"payload":<10} {"encoder":<20} {"bytes":>9} {"us":>10} {"gzip":>9} {"br":>9}')
+    for name, payload in _payloads(args.rows).items():
+        for encoder_name, encode in encoders.items():
+            body, micros = _measure(encode, payload, args.seconds)
+            gzipped = len(gzip.compress(body, compresslevel=GZIP_LEVEL))
+            brotlied = len(brotli.compress(body, quality=BROTLI_QUALITY)) if brotli else '-'
+            print(f'{name:<10} {encoder_name:<20} {len(body):>9} {micros:>10.1f} {gzipped:>9} {brotlied:>9}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""
+Холодный старт воркера: время от запуска интерпретатора до первого ответа.
+Каждый замер — отдельный процесс, который импортирует app, вызывает
+create_app и выполняет первый запрос тестовым клиентом; печатаются медианы
+этапов и загружены ли инструменты миграций. Сравниваются запуски
+без и с PREWARM_MAPPERS.
+
+    python -m benchmarks.startup --runs 10
+    python -m benchmarks.startup --path /api/daily-discounts
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from benchmarks.common import make_app, add_db_uri_argument
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STAGES = ('import', 'create_app', 'first_response')
+
+
+def measure_child(path):
+    """Замер внутри свежего процесса; результат — JSON в stdout"""
+    started = time.perf_counter()
+    import app as app_module
+    imported = time.perf_counter()
+    application = app_module.create_app()
+    created = time.perf_counter()
+    response = application.test_client().get(path)
+    responded = time.perf_counter()
+    print(json.dumps({
+        'import': imported - started,
+        'create_app': created - imported,
+        'first_response': responded - created,
+        'status': response.status_code,
+        'migrate_loaded': 'flask_migrate' in sys.modules or 'alembic' in sys.modules
+    }))
+
+
+def run_once(path, prewarm):
+    env = dict(os.environ, PREWARM_MAPPERS='1' if prewarm else '0')
+    started = time.perf_counter()
+    output = subprocess.run(
+        [sys.executable, '-m', 'benchmarks.startup', '--child', path],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True
+    ).stdout
+    wall = time.perf_counter() - started
+    return {**json.loads(output.strip().splitlines()[-1]), 'process': wall}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--path', default='/api/products', help='первый запрос')
+    parser.add_argument('--child', metavar='PATH', help=argparse.SUPPRESS)
+    add_db_uri_argument(parser)
+    args = parser.parse_args()
+
+    if args.child:
+        measure_child(args.child)
+        return
+
+    # Схема создается один раз; DB_URI наследуют дочерние процессы
+    make_app(args.db_uri)
+
+    for prewarm in (False, True):
+        results = [run_once(args.path, prewarm) for _ in range(args.runs)]
+        medians = {stage: statistics.median(r[stage] for r in results) * 1000 for stage in STAGES + ('process',)}
+        print(f'PREWARM_MAPPERS={int(prewarm)} (median of {args.runs}, status {results[0]["status"]}, '
+              f'migrations loaded: {any(r["migrate_loaded"] for r in results)})')
+        for stage in STAGES:
+            print(f'  {stage:<16} {medians[stage]:8.1f} ms')
+        print(f'  {"import→response":<16} {sum(medians[stage] for stage in STAGES):8.1f} ms')
+        print(f'  {"process total":<16} {medians["process"]:8.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""
+Стресс-тест «двойных нажатий» на выполнение задания.
+Много потоков одновременно завершают одно и то же одноразовое задание
+и задание с cooldown; награда должна быть выдана ровно один раз за каждое.
+Заодно считается число SQL-запросов на одно выполнение.
+
+    python -m benchmarks.task_completion_stress --threads 32
+"""
+import argparse
+import threading
+import time
+
+from sqlalchemy import event
+
+from benchmarks.common import make_app, add_db_uri_argument
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    add_db_uri_argument(parser)
+    parser.add_argument('--threads', type=int, default=32)
+    parser.add_argument('--taps', type=int, default=5, help='нажатий на поток для каждого задания')
+    args = parser.parse_args()
+
+    app = make_app(args.db_uri)
+
+    from database import db
+    from models import User, UserStats, Task, TaskHistory
+    from task_completion import complete_task, CompletionError
+    from write_behind import write_behind
+
+    reward = 10
+    with app.app_context():
+        user = User(name=f'bench-tapper-{time.time_ns()}', password='-')
+        db.session.add(user)
+        db.session.flush()
+        db.session.add(UserStats(user_id=user.user_id))
+        once = Task(title='one-time', difficulty='easy', base_reward=reward, is_repeatable=False)
+        cooldown = Task(title='cooldown', difficulty='easy', base_reward=reward,
+                        is_repeatable=True, cooldown_hours=1)
+        db.session.add_all([once, cooldown])
+        db.session.commit()
+        user_id, task_ids = user.user_id, (once.task_id, cooldown.task_id)
+        engine = db.engine
+
+    queries = {'count': 0}
+    counters = {'ok': 0, 'rejected': 0, 'errors': 0}
+    lock = threading.Lock()
+
+    def count_query(*_):
+        with lock:
+            queries['count'] += 1
+
+    event.listen(engine, 'before_cursor_execute', count_query)
+    start_barrier = threading.Barrier(args.threads)
+
+    def worker():
+        start_barrier.wait()
+        for _ in range(args.taps):
+            for task_id in task_ids:
+                with app.app_context():
+                    try:
+                        complete_task(user_id, task_id)
+                        outcome = 'ok'
+                    except CompletionError:
+                        outcome = 'rejected'
+                    except Exception:
+                        outcome = 'errors'
+                with lock:
+                    counters[outcome] += 1
+
+    threads = [threading.Thread(target=worker) for _ in range(args.threads)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    event.remove(engine, 'before_cursor_execute', count_query)
+
+    with app.app_context():
+        write_behind.drain()  # при WRITE_BEHIND_ACK=enqueue часть событий еще в очереди
+        stats = db.session.get(UserStats, user_id)
+        history = TaskHistory.query.filter_by(user_id=user_id).count()
+
+    total = args.threads * args.taps * len(task_ids)
+    print(f'taps: {total}, ok: {counters["ok"]}, rejected: {counters["rejected"]}, '
+          f'errors: {counters["errors"]}')
+    print(f'elapsed: {elapsed:.3f}s, {queries["count"] / total:.1f} queries/tap')
+    print(f'history rows: {history}, money: {stats.money}, experience: {stats.experience}')
+
+    assert history == len(task_ids), 'награда выдана больше одного раза'
+    assert stats.money == reward * len(task_ids)
+    assert stats.experience == reward * 10 * len(task_ids)
+    print('OK: each task rewarded once')
+
+
+if __name__ == '__main__':
+    main()
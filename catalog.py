@@ -0,0 +1,118 @@
+import hashlib
+import os
+import threading
+import time
+
+from flask import current_app
+from sqlalchemy import select
+
+from database import db, on_model_change
+from models import Product
+from serialization import compress_body, msgpack_body
+
+CATALOGUE_MAX_AGE = int(os.getenv('CATALOGUE_MAX_AGE', '60'))  # секунды
+
+
+class CatalogueCache:
+    """
+    Read-through кеш каталога товаров.
+    Хранит уже закодированный JSON, его хеш (ETag) и варианты тела —
+    MessagePack и сжатые копии по кодировкам, поэтому повторные запросы
+    не ходят в БД, не сериализуют и не сжимают список заново.
+    Версия увеличивается при каждой инвалидации: результат загрузки,
+    начатой до изменения каталога, в кеш не попадает.
+    Инвалидация локальна для воркера, поэтому запись живет не дольше ttl
+    секунд: изменения, сделанные через другие воркеры, видны не позже.
+    """
+
+    def __init__(self, loader, ttl=CATALOGUE_MAX_AGE):
+        self._loader = loader
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._version = 0
+        self._entry = None  # (версия, body, etag, истекает, {(mimetype, кодировка): тело}, товары)
+
+    def _fresh(self):
+        entry = self._entry
+        if entry is not None and entry[0] == self._version and entry[3] > time.monotonic():
+            return entry
+        return None
+
+    def get(self):
+        """Возвращает (body, etag) актуального каталога"""
+        entry = self._fresh()
+        if entry is not None:
+            return entry[1], entry[2]
+
+        version = self._version
+        return self._store(version, self._loader())
+
+    async def get_async(self, loader):
+        """То же для ASGI-режима: loader — корутина, возвращающая список товаров"""
+        entry = self._fresh()
+        if entry is not None:
+            return entry[1], entry[2]
+
+        version = self._version
+        return self._store(version, await loader())
+
+    def _store(self, version, products):
+        body = current_app.json.dumps(products, separators=(',', ':')).encode('utf-8')
+        etag = hashlib.sha1(body).hexdigest()
+        with self._lock:
+            if version == self._version:
+                self._entry = (version, body, etag, time.monotonic() + self.ttl, {}, products)
+        return body, etag
+
+    def variant(self, body, mimetype=None, encoding=None):
+        """
+        body, полученное из get, в MessagePack (mimetype — его MIME-тип,
+        None — JSON) и сжатое кодировкой encoding (None — без сжатия).
+        Для актуального каталога каждый вариант считается один раз;
+        устаревшее body — без кеширования
+        """
+        entry = self._entry
+        cached = entry is not None and entry[1] is body
+        key = (mimetype, encoding)
+        if cached:
+            data = entry[4].get(key)
+            if data is not None:
+                return data
+
+        if encoding is not None:
+            data = compress_body(self.variant(body, mimetype), encoding)
+        elif mimetype is not None:
+            data = msgpack_body(entry[5] if cached else current_app.json.loads(body))
+        else:
+            data = body
+        if cached:
+            entry[4][key] = data
+        return data
+
+    def invalidate(self, *args):
+        with self._lock:
+            self._version += 1
+            self._entry = None
+
+
+def catalogue_item(product):
+    return {
+        'id': product.product_id,
+        'name': product.product_name,
+        'price': product.price,
+        'category': product.category
+    }
+
+
+def _load_products():
+    # После инвалидации читаем основную БД: отстающая реплика вернула бы
+    # старый каталог под новой версией
+    rows = db.session.execute(select(
+        Product.product_id, Product.product_name, Product.price, Product.category
+    )).all()
+    return [catalogue_item(row) for row in rows]
+
+
+product_catalogue = CatalogueCache(_load_products)
+
+on_model_change(Product, product_catalogue.invalidate)
@@ -1,4 +1,8 @@
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import NullPool
 from dotenv import load_dotenv
 import os
 
@@ -6,7 +10,135 @@ load_dotenv()
 
 db = SQLAlchemy()
 
+# Колбэки, вызываемые после коммита изменений в модели: {model: [callback, ...]}
+_change_listeners = {}
+
+
+def env_flag(name, default=False):
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+def engine_options(uri):
+    """
+    Параметры движка SQLAlchemy из переменных окружения:
+      DB_POOL_SIZE, DB_MAX_OVERFLOW   — размер пула и допустимое превышение
+      DB_POOL_TIMEOUT                 — ожидание свободного соединения, сек
+      DB_POOL_RECYCLE                 — пересоздание соединений старше N сек
+      DB_POOL_PRE_PING                — проверка соединения перед выдачей (по умолчанию вкл.)
+      DB_STATEMENT_TIMEOUT_MS         — statement_timeout на стороне PostgreSQL
+      DB_EXTERNAL_POOLER              — пул держит PgBouncer (transaction pooling):
+                                        соединения не кешируются (NullPool)
+    """
+    options = {'pool_pre_ping': env_flag('DB_POOL_PRE_PING', True)}
+
+    if env_flag('DB_EXTERNAL_POOLER'):
+        options['poolclass'] = NullPool
+    else:
+        for env_name, option, cast in (
+            ('DB_POOL_SIZE', 'pool_size', int),
+            ('DB_MAX_OVERFLOW', 'max_overflow', int),
+            ('DB_POOL_TIMEOUT', 'pool_timeout', float),
+            ('DB_POOL_RECYCLE', 'pool_recycle', int),
+        ):
+            if os.getenv(env_name):
+                options[option] = cast(os.getenv(env_name))
+
+    statement_timeout = os.getenv('DB_STATEMENT_TIMEOUT_MS')
+    if statement_timeout and uri and uri.startswith('postgresql'):
+        # psycopg2 передает options при подключении; значение из URI
+        # (например search_path) сохраняем. За PgBouncer параметр options
+        # должен быть разрешен в ignore_startup_parameters.
+        existing = make_url(uri).query.get('options', '')
+        options['connect_args'] = {
+            'options': f'{existing} -c statement_timeout={int(statement_timeout)}'.strip()
+        }
+    return options
+
+
+# Асинхронные драйверы для ASGI-режима (asgi.py)
+ASYNC_DRIVERS = {'postgresql': 'postgresql+asyncpg', 'sqlite': 'sqlite+aiosqlite'}
+
+
+def create_async_db_engine(uri=None):
+    """
+    Движок SQLAlchemy asyncio для того же DB_URI: postgresql:// работает
+    через asyncpg, sqlite:// — через aiosqlite. Пул настраивается теми же
+    переменными, что и синхронный; statement_timeout передается asyncpg
+    как server_settings.
+    """
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    url = make_url(uri or os.getenv('DB_URI'))
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f'No async driver configured for {backend}')
+
+    options = engine_options(None)
+    statement_timeout = os.getenv('DB_STATEMENT_TIMEOUT_MS')
+    if statement_timeout and backend == 'postgresql':
+        options['connect_args'] = {'server_settings': {'statement_timeout': str(int(statement_timeout))}}
+    return create_async_engine(url.set(drivername=ASYNC_DRIVERS[backend]), **options)
+
+
 def init_db(app):
-    app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DB_URI')
-    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-    db.init_app(app)
\ No newline at end of file
+    # DB_URI из окружения, если create_app не передал свой
+    uri = app.config.setdefault('SQLALCHEMY_DATABASE_URI', os.getenv('DB_URI'))
+    app.config.setdefault('SQLALCHEMY_TRACK_MODIFICATIONS', False)
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', engine_options(uri))
+    read_uri = os.getenv('DB_READ_URI')
+    if read_uri:
+        # Реплика для быстрого пути чтения (reads.py); моделей к ней не привязано
+        app.config.setdefault('SQLALCHEMY_BINDS', {'replica': {'url': read_uri, **engine_options(read_uri)}})
+    db.init_app(app)
+
+
+def pool_status():
+    """Текущее состояние пула соединений основного движка"""
+    pool = db.engine.pool
+    status = {'pool': type(pool).__name__, 'status': pool.status()}
+    for name in ('size', 'checkedin', 'checkedout', 'overflow'):
+        method = getattr(pool, name, None)
+        if callable(method):
+            status[name] = method()
+    return status
+
+
+def on_model_change(model, callback):
+    """
+    Регистрирует callback(instances), который вызывается после успешного
+    коммита, если в транзакции были вставлены, изменены или удалены строки
+    модели. При откате транзакции колбэки не вызываются.
+    Массовые query.update()/delete() и Core-запросы событий не порождают —
+    кеши для них нужно сбрасывать вручную.
+    """
+    if model not in _change_listeners:
+        _change_listeners[model] = []
+        for name in ('after_insert', 'after_update', 'after_delete'):
+            event.listen(model, name, _remember_change)
+    _change_listeners[model].append(callback)
+
+
+def _remember_change(mapper, connection, target):
+    session = Session.object_session(target)
+    if session is None:
+        return
+    pending = session.info.setdefault('changed_models', {})
+    pending.setdefault(mapper.class_, []).append(target)
+
+
+@event.listens_for(Session, 'after_commit')
+def _fire_change_listeners(session):
+    pending = session.info.pop('changed_models', None)
+    if not pending:
+        return
+    for model, instances in pending.items():
+        for callback in _change_listeners.get(model, ()):
+            callback(instances)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_changes(session):
+    session.info.pop('changed_models', None)
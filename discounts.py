@@ -0,0 +1,102 @@
+import math
+import random
+import threading
+from datetime import date
+
+from sqlalchemy import select
+
+from database import db, on_model_change
+from models import Product
+from reads import read_all
+
+DISCOUNT_PERCENT = 25  # 25% скидка
+DAILY_DISCOUNTS_COUNT = 3
+
+
+def discounted_price(price):
+    """Цена товара с учетом дневной скидки"""
+    return int(math.ceil(price * (100 - DISCOUNT_PERCENT) / 100))
+
+
+class DailyDiscountEngine:
+    """
+    Выбор товаров дня со скидкой.
+    Набор вычисляется один раз за календарный день собственным генератором
+    с seed от даты (глобальный random не трогаем), в памяти процесса хранятся
+    только id выбранных товаров. Кеш сбрасывается в полночь и при изменении
+    таблицы товаров.
+    """
+
+    def __init__(self, count=DAILY_DISCOUNTS_COUNT):
+        self.count = count
+        self._lock = threading.Lock()
+        # (день, id в порядке выбора, множество id) — заменяется целиком
+        self._state = None
+
+    def _pick(self, today):
+        # Сортируем id, чтобы выбор не зависел от порядка строк в БД
+        # и совпадал во всех воркерах
+        rows = db.session.query(Product.product_id).order_by(Product.product_id).all()
+        return self._sample(today, [row.product_id for row in rows])
+
+    def _sample(self, today, product_ids):
+        rng = random.Random(f"{today.year}-{today.month}-{today.day}")
+        return tuple(rng.sample(product_ids, min(self.count, len(product_ids))))
+
+    def _current(self):
+        today = date.today()
+        state = self._state
+        if state is not None and state[0] == today:
+            return state
+        with self._lock:
+            state = self._state
+            if state is None or state[0] != today:
+                ids = self._pick(today)
+                state = self._state = (today, ids, frozenset(ids))
+            return state
+
+    def cached_ids(self):
+        """id товаров со скидкой, если набор на сегодня уже выбран, иначе None"""
+        state = self._state
+        if state is not None and state[0] == date.today():
+            return state[1]
+        return None
+
+    def choose(self, product_ids):
+        """
+        Выбирает и запоминает набор дня из отсортированных id всех товаров —
+        для вызывающих, которые сами читают id из БД (ASGI-режим)
+        """
+        today = date.today()
+        ids = self._sample(today, product_ids)
+        with self._lock:
+            self._state = (today, ids, frozenset(ids))
+        return ids
+
+    def product_ids(self):
+        """Возвращает id товаров со скидкой на сегодня"""
+        return self._current()[1]
+
+    def is_discounted(self, product_id):
+        return product_id in self._current()[2]
+
+    def products(self):
+        """Товары со скидкой на сегодня в порядке выбора (строки колонок товара)"""
+        ids = self.product_ids()
+        if not ids:
+            return []
+        rows = read_all(select(
+            Product.product_id, Product.product_name, Product.price,
+            Product.category, Product.image_url
+        ).where(Product.product_id.in_(ids)))
+        by_id = {row.product_id: row for row in rows}
+        return [by_id[product_id] for product_id in ids if product_id in by_id]
+
+    def invalidate(self, *args):
+        with self._lock:
+            self._state = None
+
+
+daily_discounts = DailyDiscountEngine()
+
+on_model_change(Product, daily_discounts.invalidate)
@@ -0,0 +1,185 @@
+"""
+Граф друзей: списки смежности в памяти процесса.
+
+Дружба хранится в friends_guilds одной направленной строкой
+user_id -> friend_id со status='friend'. Для каждого пользователя
+в LRU-кеше лежит отсортированный массив id друзей с обеих сторон связи,
+собранный одним запросом по индексам (user_id, status) и (friend_id, status).
+Общие друзья — пересечение двух отсортированных массивов, друзья друзей —
+подсчет по массивам друзей, загруженных одним запросом. Запись в
+friends_guilds сбрасывает массивы обоих пользователей; изменения из
+других воркеров подтягиваются по истечении FRIEND_GRAPH_TTL.
+"""
+import os
+from array import array
+from bisect import bisect_left
+from collections import Counter
+
+from sqlalchemy import delete, insert, or_, select, union
+from sqlalchemy.exc import IntegrityError
+
+from cache import TTLCache, MISSING
+from database import db, on_model_change
+from models import FriendsGuild, GuildMembership, User
+
+FRIEND_STATUS = 'friend'
+FRIEND_GRAPH_SIZE = int(os.getenv('FRIEND_GRAPH_SIZE', '50000'))
+FRIEND_GRAPH_TTL = float(os.getenv('FRIEND_GRAPH_TTL', '60'))  # секунды
+# Сколько друзей учитывается при поиске друзей друзей
+SUGGESTION_MAX_FRIENDS = int(os.getenv('SUGGESTION_MAX_FRIENDS', '200'))
+
+
+class FriendError(Exception):
+    """Операция с друзьями отклонена; status_code — HTTP-код ответа"""
+
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def intersect_sorted(left, right):
+    """Пересечение отсортированных массивов без повторов"""
+    if len(left) > len(right):
+        left, right = right, left
+    if not left:
+        return []
+    if len(right) > 8 * len(left):
+        # Маленький массив против большого — двоичным поиском
+        result, low = [], 0
+        for value in left:
+            low = bisect_left(right, value, low)
+            if low == len(right):
+                break
+            if right[low] == value:
+                result.append(value)
+        return result
+    result, i, j = [], 0, 0
+    while i < len(left) and j < len(right):
+        a, b = left[i], right[j]
+        if a == b:
+            result.append(a)
+            i += 1
+            j += 1
+        elif a < b:
+            i += 1
+        else:
+            j += 1
+    return result
+
+
+def _adjacency_statement(user_ids):
+    """Пары (владелец, друг) для user_ids с обеих сторон связи"""
+    return union(
+        select(FriendsGuild.user_id.label('owner_id'), FriendsGuild.friend_id.label('other_id')).where(
+            FriendsGuild.user_id.in_(user_ids), FriendsGuild.status == FRIEND_STATUS),
+        select(FriendsGuild.friend_id.label('owner_id'), FriendsGuild.user_id.label('other_id')).where(
+            FriendsGuild.friend_id.in_(user_ids), FriendsGuild.status == FRIEND_STATUS)
+    )
+
+
+class FriendGraph:
+    """LRU-кеш списков смежности: user_id -> array('l') отсортированных id друзей"""
+
+    def __init__(self, maxsize=FRIEND_GRAPH_SIZE, ttl=FRIEND_GRAPH_TTL):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    def friends(self, user_id):
+        return self.friends_many([user_id])[user_id]
+
+    def friends_many(self, user_ids):
+        """{user_id: массив друзей}; недостающие грузятся одним запросом"""
+        result, missing = {}, []
+        for user_id in user_ids:
+            friends = self._cache.get(user_id)
+            if friends is MISSING:
+                missing.append(user_id)
+            else:
+                result[user_id] = friends
+        if missing:
+            loaded = {user_id: [] for user_id in missing}
+            for row in db.session.execute(_adjacency_statement(missing)):
+                loaded[row.owner_id].append(row.other_id)
+            for user_id, friends in loaded.items():
+                friends = array('l', sorted(set(friends)))
+                self._cache.set(user_id, friends)
+                result[user_id] = friends
+        return result
+
+    def mutual(self, user_id, other_id):
+        friends = self.friends_many([user_id, other_id])
+        return intersect_sorted(friends[user_id], friends[other_id])
+
+    def suggestions(self, user_id, limit=20):
+        """
+        Друзья друзей, которые еще не друзья: [(user_id, общих друзей), ...]
+        по убыванию числа общих друзей
+        """
+        friends = self.friends(user_id)
+        considered = list(friends[:SUGGESTION_MAX_FRIENDS])
+        counts = Counter()
+        for friends_of_friend in self.friends_many(considered).values():
+            counts.update(friends_of_friend)
+        counts.pop(user_id, None)
+        for friend_id in friends:
+            counts.pop(friend_id, None)
+        return sorted(counts.items(), key=lambda item: (-item[1], item[0]))[:limit]
+
+    def invalidate(self, *user_ids):
+        for user_id in user_ids:
+            self._cache.invalidate(user_id)
+
+
+friend_graph = FriendGraph()
+
+
+def guild_member_ids(guild_id):
+    """Отсортированные id участников гильдии одним запросом по индексу guild_id"""
+    return db.session.execute(select(GuildMembership.user_id).where(
+        GuildMembership.guild_id == guild_id).order_by(GuildMembership.user_id)).scalars().all()
+
+
+def _friendship_filter(user_id, friend_id):
+    return FriendsGuild.status == FRIEND_STATUS, or_(
+        (FriendsGuild.user_id == user_id) & (FriendsGuild.friend_id == friend_id),
+        (FriendsGuild.user_id == friend_id) & (FriendsGuild.friend_id == user_id)
+    )
+
+
+def add_friend(user_id, friend_id):
+    """Добавляет дружбу; уже существующая в любую сторону — FriendError 409"""
+    if user_id == friend_id:
+        raise FriendError('Cannot befriend yourself')
+    if db.session.execute(select(User.user_id).where(User.user_id == friend_id)).first() is None:
+        raise FriendError('User not found', 404)
+    exists = db.session.execute(
+        select(FriendsGuild.id).where(*_friendship_filter(user_id, friend_id)).limit(1)).first()
+    if exists is not None:
+        raise FriendError('Already friends', 409)
+    try:
+        db.session.execute(insert(FriendsGuild).values(
+            user_id=user_id, friend_id=friend_id, status=FRIEND_STATUS))
+        db.session.commit()
+    except IntegrityError:
+        # Параллельный запрос успел добавить ту же дружбу первым
+        db.session.rollback()
+        raise FriendError('Already friends', 409)
+    finally:
+        # Core-запросы событий модели не порождают — сбрасываем сами
+        friend_graph.invalidate(user_id, friend_id)
+
+
+def remove_friend(user_id, friend_id):
+    """Удаляет дружбу в обе стороны; возвращает, была ли она"""
+    deleted = db.session.execute(delete(FriendsGuild).where(
+        *_friendship_filter(user_id, friend_id)).execution_options(synchronize_session=False)).rowcount
+    db.session.commit()
+    friend_graph.invalidate(user_id, friend_id)
+    return deleted > 0
+
+
+def _invalidate_changed(instances):
+    for instance in instances:
+        friend_graph.invalidate(instance.user_id, instance.friend_id)
+
+
+on_model_change(FriendsGuild, _invalidate_changed)
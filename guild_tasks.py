@@ -0,0 +1,211 @@
+"""
+Гильдейские задания: назначение задания всей гильдии, прогресс и истечение.
+
+Прогресс — число участников, выполнивших задание после назначения, —
+хранится счетчиком guilds_tasks.completed_count. При выполнении задания
+одним INSERT ... SELECT по активным назначениям в гильдиях пользователя
+добавляются строки guilds_tasks_completions (повтор пары игнорируется),
+и счетчики новых пар увеличиваются одним UPDATE. Поэтому стоимость
+выполнения и чтения прогресса не зависит от размера гильдии.
+Просроченные назначения выключаются одним UPDATE по индексу
+(is_active, due_date) — лениво при чтении списка и по команде администратора.
+"""
+import json
+import os
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+
+from sqlalchemy import DateTime, Integer, and_, bindparam, column, func, or_, select, update, values
+from sqlalchemy.dialects import postgresql, sqlite
+
+from database import db
+from models import Guild, GuildMembership, GuildTask, GuildTaskCompletion, Task
+
+GUILD_TASK_EXPIRE_INTERVAL = float(os.getenv('GUILD_TASK_EXPIRE_INTERVAL', '60'))  # секунды
+
+SQLITE_DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S.%f'
+
+# Роли, которым разрешено назначать задания гильдии
+ASSIGNER_ROLES = ('leader', 'officer')
+
+
+class GuildTaskError(Exception):
+    """Операция с гильдейским заданием отклонена; status_code — HTTP-код ответа"""
+
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def _completions_source(dialect, completions):
+    """Выполнения как таблица (user_id, task_id, completed_at) для JOIN"""
+    if dialect == 'postgresql':
+        return values(
+            column('user_id', Integer), column('task_id', Integer), column('completed_at', DateTime),
+            name='completions'
+        ).data(completions)
+    # SQLite не принимает имена колонок у VALUES в FROM — строки из JSON-массива;
+    # время в формате, в котором SQLAlchemy хранит DateTime в SQLite
+    rows = func.json_each(json.dumps([
+        [user_id, task_id, completed_at.strftime(SQLITE_DATETIME_FORMAT)]
+        for user_id, task_id, completed_at in completions
+    ])).table_valued('value')
+    return select(
+        func.json_extract(rows.c.value, '$[0]').label('user_id'),
+        func.json_extract(rows.c.value, '$[1]').label('task_id'),
+        func.json_extract(rows.c.value, '$[2]').label('completed_at')
+    ).subquery('completions')
+
+
+def progress_insert_statement(dialect, completions):
+    """
+    INSERT ... SELECT новых выполнений активных гильдейских заданий
+    (None, если выполнений нет). completions — итерируемое из
+    (user_id, task_id, completed_at); назначение и срок проверяются по
+    времени каждого выполнения, в строку идет самое раннее подходящее.
+    Возвращает guild_task_id вставленных строк
+    """
+    completions = list(completions)
+    if not completions:
+        return None
+
+    tasks = GuildTask.__table__
+    members = GuildMembership.__table__
+    source_rows = _completions_source(dialect, completions)
+    completed_at = source_rows.c.completed_at
+    source = select(
+        tasks.c.guild_task_id, members.c.user_id, func.min(completed_at)
+    ).select_from(source_rows).join(
+        members, members.c.user_id == source_rows.c.user_id
+    ).join(
+        tasks, and_(tasks.c.guild_id == members.c.guild_id, tasks.c.task_id == source_rows.c.task_id)
+    ).where(
+        tasks.c.is_active.is_(True),
+        tasks.c.assigned_at <= completed_at,
+        or_(tasks.c.due_date.is_(None), tasks.c.due_date > completed_at)
+    ).group_by(tasks.c.guild_task_id, members.c.user_id)
+
+    insert = postgresql.insert if dialect == 'postgresql' else sqlite.insert
+    table = GuildTaskCompletion.__table__
+    return insert(table).from_select(
+        ['guild_task_id', 'user_id', 'completed_at'], source
+    ).on_conflict_do_nothing().returning(table.c.guild_task_id)
+
+
+def progress_increment(guild_task_ids):
+    """(UPDATE счетчиков, параметры executemany) для вставленных выполнений"""
+    tasks = GuildTask.__table__
+    statement = update(tasks).where(tasks.c.guild_task_id == bindparam('progress_guild_task_id')).values(
+        completed_count=tasks.c.completed_count + bindparam('progress_delta'))
+    return statement, [{'progress_guild_task_id': guild_task_id, 'progress_delta': delta}
+                       for guild_task_id, delta in Counter(guild_task_ids).items()]
+
+
+def record_guild_progress(completions):
+    """
+    Учитывает выполнения в прогрессе гильдейских заданий;
+    вызывается в той же транзакции, что и вставка в историю
+    """
+    statement = progress_insert_statement(db.session.get_bind().dialect.name, completions)
+    if statement is None:
+        return
+    guild_task_ids = db.session.execute(statement).scalars().all()
+    if guild_task_ids:
+        db.session.execute(*progress_increment(guild_task_ids))
+
+
+def expire_statement(now):
+    """Выключает все просроченные назначения одним UPDATE"""
+    return update(GuildTask).where(
+        GuildTask.is_active.is_(True), GuildTask.due_date <= now
+    ).values(is_active=False).execution_options(synchronize_session=False)
+
+
+def expire_due_tasks(now=None):
+    """Выключает просроченные назначения; возвращает их число"""
+    count = db.session.execute(expire_statement(now or datetime.utcnow())).rowcount
+    db.session.commit()
+    return count
+
+
+class _ExpiryThrottle:
+    """Ленивое истечение не чаще раза в GUILD_TASK_EXPIRE_INTERVAL на воркер"""
+
+    def __init__(self, interval):
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._next_run = 0.0
+
+    def due(self):
+        now = time.monotonic()
+        with self._lock:
+            if now < self._next_run:
+                return False
+            self._next_run = now + self.interval
+            return True
+
+
+expiry_throttle = _ExpiryThrottle(GUILD_TASK_EXPIRE_INTERVAL)
+
+
+def guild_tasks_statement(guild_id, include_inactive=False):
+    """Назначения гильдии с заданием, счетчиком выполнений и числом участников"""
+    members_count = select(func.count(GuildMembership.membership_id)).where(
+        GuildMembership.guild_id == guild_id).scalar_subquery()
+    statement = select(
+        GuildTask.guild_task_id, GuildTask.task_id, Task.title, Task.base_reward,
+        GuildTask.assigned_at, GuildTask.due_date, GuildTask.is_active,
+        GuildTask.completed_count, members_count.label('members_count')
+    ).join(Task, Task.task_id == GuildTask.task_id).where(
+        GuildTask.guild_id == guild_id
+    ).order_by(GuildTask.guild_task_id)
+    if not include_inactive:
+        statement = statement.where(GuildTask.is_active.is_(True))
+    return statement
+
+
+def assign_task(guild_id, user_id, task_id, due_date=None):
+    """
+    Назначает задание гильдии от имени лидера или офицера. due_date —
+    наивная (UTC) или со смещением. Возвращает guild_task_id, при отказе бросает GuildTaskError
+    """
+    role = db.session.execute(select(GuildMembership.role).where(
+        GuildMembership.guild_id == guild_id, GuildMembership.user_id == user_id)).scalar()
+    if role is None:
+        if db.session.get(Guild, guild_id) is None:
+            raise GuildTaskError('Guild not found', 404)
+        raise GuildTaskError('Not a guild member', 403)
+    if role not in ASSIGNER_ROLES:
+        raise GuildTaskError('Only leaders and officers can assign tasks', 403)
+    if db.session.execute(select(Task.task_id).where(Task.task_id == task_id)).first() is None:
+        raise GuildTaskError('Task not found', 404)
+
+    # Даты в БД — наивные UTC; due_date со смещением приводим к ним
+    if due_date is not None and due_date.tzinfo is not None:
+        due_date = due_date.astimezone(timezone.utc).replace(tzinfo=None)
+    now = datetime.utcnow()
+    if due_date is not None and due_date <= now:
+        raise GuildTaskError('due_date must be in the future')
+
+    guild_task = GuildTask(guild_id=guild_id, task_id=task_id, assigned_by=user_id,
+                           assigned_at=now, due_date=due_date)
+    db.session.add(guild_task)
+    db.session.commit()
+    return guild_task.guild_task_id
+
+
+def recount_statement(guild_id=None):
+    """
+    Пересчитывает счетчики одним UPDATE с подсчетом строк
+    guilds_tasks_completions — для сверки после ручных правок данных
+    """
+    completions = GuildTaskCompletion.__table__
+    counts = select(func.count()).where(
+        completions.c.guild_task_id == GuildTask.guild_task_id
+    ).correlate(GuildTask).scalar_subquery()
+    statement = update(GuildTask).values(completed_count=counts).execution_options(synchronize_session=False)
+    if guild_id is not None:
+        statement = statement.where(GuildTask.guild_id == guild_id)
+    return statement
@@ -0,0 +1,157 @@
+"""
+Месячные секции tasks_history (только PostgreSQL).
+
+Таблица секционирована по диапазонам completed_at: секция
+tasks_history_YYYY_MM хранит один календарный месяц, строки вне созданных
+секций попадают в tasks_history_default. Секции создаются заранее,
+старые отсоединяются и переносятся в схему archive (или удаляются):
+
+    flask history ensure-partitions --months-ahead 3
+    flask history archive --older-than 12 [--drop]
+
+Если секция месяца создается с опозданием и его строки уже лежат
+в tasks_history_default, они переносятся в новую секцию в той же
+транзакции (PostgreSQL не создает секцию, пока такие строки в default).
+
+Сводка tasks_history_rollup при архивации не меняется — проверки
+cooldown и повтора от истории не зависят.
+"""
+from datetime import date
+
+import click
+from sqlalchemy import text
+
+from database import db
+
+HISTORY_TABLE = 'tasks_history'
+DEFAULT_PARTITION = 'tasks_history_default'
+HISTORY_COLUMNS = 'history_id, task_id, user_id, completed_at, reward_earned'
+ARCHIVE_SCHEMA = 'archive'
+
+
+def _add_months(day, months):
+    index = day.year * 12 + day.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month):
+    return f'{HISTORY_TABLE}_{month.year:04d}_{month.month:02d}'
+
+
+def _is_partitioned():
+    if db.engine.dialect.name != 'postgresql':
+        return False
+    return db.session.execute(text(
+        "SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(:table)"
+    ), {'table': HISTORY_TABLE}).first() is not None
+
+
+def ensure_partitions(months_ahead=3, today=None):
+    """Создает секции с текущего месяца на months_ahead вперед; возвращает имена новых"""
+    if not _is_partitioned():
+        return []
+    current = (today or date.today()).replace(day=1)
+    existing = _partition_months()
+    created = []
+    for offset in range(months_ahead + 1):
+        month = _add_months(current, offset)
+        if month in existing:
+            continue
+        _create_partition(month)
+        created.append(partition_name(month))
+    db.session.commit()
+    return created
+
+
+def _create_partition(month):
+    """
+    Секция месяца. Строки этого месяца из default переносятся: default
+    отсоединяется на время создания секции и переноса, блокировка таблицы
+    держится до конца транзакции
+    """
+    name = partition_name(month)
+    start, end = month.isoformat(), _add_months(month, 1).isoformat()
+    bounds = {'start': start, 'end': end}
+    create = text(f'CREATE TABLE IF NOT EXISTS {name} PARTITION OF {HISTORY_TABLE} '
+                  f"FOR VALUES FROM ('{start}') TO ('{end}')")
+    stranded = db.session.execute(text(
+        f'SELECT 1 FROM {DEFAULT_PARTITION} WHERE completed_at >= :start AND completed_at < :end LIMIT 1'
+    ), bounds).first()
+    if stranded is None:
+        db.session.execute(create)
+        return
+
+    db.session.execute(text(f'ALTER TABLE {HISTORY_TABLE} DETACH PARTITION {DEFAULT_PARTITION}'))
+    db.session.execute(create)
+    db.session.execute(text(
+        f'WITH moved AS (DELETE FROM {DEFAULT_PARTITION} '
+        f'WHERE completed_at >= :start AND completed_at < :end RETURNING {HISTORY_COLUMNS}) '
+        f'INSERT INTO {name} ({HISTORY_COLUMNS}) SELECT {HISTORY_COLUMNS} FROM moved'
+    ), bounds)
+    db.session.execute(text(f'ALTER TABLE {HISTORY_TABLE} ATTACH PARTITION {DEFAULT_PARTITION} DEFAULT'))
+
+
+def _partition_months():
+    """Месяцы, для которых есть секции"""
+    rows = db.session.execute(text(
+        "SELECT child.relname FROM pg_inherits "
+        "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+        "WHERE pg_inherits.inhparent = to_regclass(:table)"
+    ), {'table': HISTORY_TABLE}).scalars()
+    prefix = HISTORY_TABLE + '_'
+    months = set()
+    for name in rows:
+        suffix = name[len(prefix):]
+        if name.startswith(prefix) and len(suffix) == 7 and suffix[4] == '_':
+            months.add(date(int(suffix[:4]), int(suffix[5:]), 1))
+    return months
+
+
+def archive_partitions(older_than_months=12, drop=False, today=None):
+    """
+    Отсоединяет секции месяцев старше older_than_months и переносит их
+    в схему archive (drop=True — удаляет). Возвращает имена обработанных секций.
+    """
+    if not _is_partitioned():
+        return []
+    cutoff = _add_months((today or date.today()).replace(day=1), -older_than_months)
+    archived = []
+    for month in sorted(_partition_months()):
+        if month >= cutoff:
+            break
+        name = partition_name(month)
+        db.session.execute(text(f'ALTER TABLE {HISTORY_TABLE} DETACH PARTITION {name}'))
+        if drop:
+            db.session.execute(text(f'DROP TABLE {name}'))
+        else:
+            db.session.execute(text(f'CREATE SCHEMA IF NOT EXISTS {ARCHIVE_SCHEMA}'))
+            db.session.execute(text(f'ALTER TABLE {name} SET SCHEMA {ARCHIVE_SCHEMA}'))
+        archived.append(name)
+    db.session.commit()
+    return archived
+
+
+@click.group('history', help='Секции tasks_history')
+def history_cli():
+    pass
+
+
+@history_cli.command('ensure-partitions')
+@click.option('--months-ahead', default=3, show_default=True)
+def ensure_partitions_command(months_ahead):
+    """Создать секции на ближайшие месяцы"""
+    created = ensure_partitions(months_ahead)
+    click.echo('\n'.join(created) if created else 'nothing to create')
+
+
+@history_cli.command('archive')
+@click.option('--older-than', 'older_than_months', default=12, show_default=True, help='месяцев')
+@click.option('--drop', is_flag=True, help='удалить секции вместо переноса в схему archive')
+def archive_command(older_than_months, drop):
+    """Отсоединить старые секции"""
+    archived = archive_partitions(older_than_months, drop)
+    click.echo('\n'.join(archived) if archived else 'nothing to archive')
+
+
+def init_history_partitions(app):
+    app.cli.add_command(history_cli)
@@ -0,0 +1,219 @@
+"""
+Инструментирование запросов (включается METRICS_ENABLED=1).
+
+Для каждого запроса считаются число SQL-запросов, суммарное время в БД,
+время сериализации JSON и полное время обработки. Значения отдаются
+клиенту в заголовке Server-Timing и копятся в гистограммах по эндпоинтам,
+доступных в формате Prometheus на /metrics.
+
+SLOW_REQUEST_MS включает сэмплирующий профилировщик: пока запрос
+выполняется, фоновый поток снимает стек его потока каждые
+PROFILE_SAMPLE_INTERVAL_MS; если запрос оказался медленнее порога,
+самые частые стеки пишутся в лог.
+"""
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import Counter
+
+from flask import Response, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from database import env_flag
+
+METRICS_ENABLED = env_flag('METRICS_ENABLED')
+SLOW_REQUEST_MS = float(os.getenv('SLOW_REQUEST_MS', '0'))  # 0 — профилировщик выключен
+PROFILE_SAMPLE_INTERVAL_MS = float(os.getenv('PROFILE_SAMPLE_INTERVAL_MS', '5'))
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+logger = logging.getLogger(__name__)
+
+
+class Histogram:
+    """Кумулятивная гистограмма в стиле Prometheus"""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+        self.sum += value
+        self.count += 1
+
+
+class MetricsRegistry:
+    """Метрики запросов по эндпоинтам"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints = {}
+
+    def observe(self, endpoint, wall, queries, db_time, serialize_time):
+        with self._lock:
+            metrics = self._endpoints.get(endpoint)
+            if metrics is None:
+                metrics = self._endpoints[endpoint] = {
+                    'duration': Histogram(DURATION_BUCKETS),
+                    'queries': Histogram(QUERY_BUCKETS),
+                    'db_time': 0.0,
+                    'serialize_time': 0.0,
+                }
+            metrics['duration'].observe(wall)
+            metrics['queries'].observe(queries)
+            metrics['db_time'] += db_time
+            metrics['serialize_time'] += serialize_time
+
+    def render(self):
+        lines = []
+        with self._lock:
+            items = sorted(self._endpoints.items())
+            self._render_histograms(lines, items, 'duration', 'http_request_duration_seconds',
+                                    'Request wall time')
+            self._render_histograms(lines, items, 'queries', 'http_request_db_queries',
+                                    'SQL queries per request')
+            for key, name, help_text in (
+                ('db_time', 'http_request_db_seconds_total', 'Time spent in the database'),
+                ('serialize_time', 'http_request_serialize_seconds_total', 'Time spent encoding JSON'),
+            ):
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} counter')
+                for endpoint, metrics in items:
+                    lines.append(f'{name}{{endpoint="{endpoint}"}} {metrics[key]:.6f}')
+        return '\n'.join(lines) + '\n'
+
+    @staticmethod
+    def _render_histograms(lines, items, key, name, help_text):
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} histogram')
+        for endpoint, metrics in items:
+            histogram = metrics[key]
+            for bound, count in zip(histogram.buckets, histogram.counts):
+                lines.append(f'{name}_bucket{{endpoint="{endpoint}",le="{bound}"}} {count}')
+            lines.append(f'{name}_bucket{{endpoint="{endpoint}",le="+Inf"}} {histogram.count}')
+            lines.append(f'{name}_sum{{endpoint="{endpoint}"}} {histogram.sum:.6f}')
+            lines.append(f'{name}_count{{endpoint="{endpoint}"}} {histogram.count}')
+
+
+class StackSampler:
+    """Фоновый поток, периодически снимающий стеки потоков активных запросов"""
+
+    def __init__(self, interval):
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._samples = {}  # thread id -> Counter стеков
+        self._thread = None
+
+    def start(self, thread_id):
+        with self._lock:
+            self._samples[thread_id] = Counter()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='slow-request-sampler', daemon=True)
+                self._thread.start()
+
+    def stop(self, thread_id):
+        with self._lock:
+            return self._samples.pop(thread_id, None)
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            frames = sys._current_frames()
+            with self._lock:
+                for thread_id, samples in self._samples.items():
+                    frame = frames.get(thread_id)
+                    if frame is not None:
+                        stack = ';'.join(f'{entry.name} ({os.path.basename(entry.filename)}:{entry.lineno})'
+                                         for entry in traceback.extract_stack(frame))
+                        samples[stack] += 1
+
+
+registry = MetricsRegistry()
+sampler = StackSampler(PROFILE_SAMPLE_INTERVAL_MS / 1000)
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if METRICS_ENABLED:
+        conn.info['query_started'] = time.perf_counter()
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if not METRICS_ENABLED:
+        return
+    if has_request_context() and 'metrics' in g:
+        g.metrics['queries'] += 1
+        g.metrics['db_time'] += time.perf_counter() - conn.info['query_started']
+
+
+def _timed_dumps(dumps):
+    def wrapper(obj, **kwargs):
+        started = time.perf_counter()
+        try:
+            return dumps(obj, **kwargs)
+        finally:
+            if has_request_context() and 'metrics' in g:
+                g.metrics['serialize_time'] += time.perf_counter() - started
+    return wrapper
+
+
+def _before_request():
+    g.metrics = {'started': time.perf_counter(), 'queries': 0, 'db_time': 0.0, 'serialize_time': 0.0}
+    if SLOW_REQUEST_MS:
+        sampler.start(threading.get_ident())
+
+
+def _after_request(response):
+    metrics = g.get('metrics')
+    if metrics is None:
+        return response
+    wall = time.perf_counter() - metrics['started']
+    endpoint = request.endpoint or 'unmatched'
+
+    response.headers['Server-Timing'] = (
+        f'db;dur={metrics["db_time"] * 1000:.2f};desc="{metrics["queries"]} queries", '
+        f'serialize;dur={metrics["serialize_time"] * 1000:.2f}, '
+        f'total;dur={wall * 1000:.2f}'
+    )
+    registry.observe(endpoint, wall, metrics['queries'], metrics['db_time'], metrics['serialize_time'])
+
+    if SLOW_REQUEST_MS:
+        samples = sampler.stop(threading.get_ident())
+        if samples and wall * 1000 >= SLOW_REQUEST_MS:
+            top = '\n'.join(f'{count:>5} {stack}' for stack, count in samples.most_common(10))
+            logger.warning('Slow request %s %s: %.1f ms, %d queries, db %.1f ms\n%s',
+                           request.method, request.path, wall * 1000, metrics['queries'],
+                           metrics['db_time'] * 1000, top)
+    return response
+
+
+def _teardown_request(exc):
+    # Запрос завершился исключением до after_request — не держим его в сэмплере
+    if SLOW_REQUEST_MS:
+        sampler.stop(threading.get_ident())
+
+
+def metrics_view():
+    return Response(registry.render(), mimetype='text/plain; version=0.0.4')
+
+
+def init_instrumentation(app):
+    """Подключает сбор метрик к приложению, если METRICS_ENABLED"""
+    if not METRICS_ENABLED:
+        return
+    app.json.dumps = _timed_dumps(app.json.dumps)
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
+    app.add_url_rule('/metrics', 'metrics', metrics_view)
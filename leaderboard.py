@@ -0,0 +1,231 @@
+"""
+Рейтинги пользователей: глобальные и внутри гильдий.
+
+Рейтинг хранится в памяти процесса в SortedList пар (-score, user_id),
+поэтому топ-N и «мое место» считаются за O(log n) без сортировки
+users_stats на каждый запрос. Структуры строятся из БД фоновым потоком
+при старте воркера (create_app), обновляются точечно при изменении
+статистики (выполнение задания, покупка, правка статистики, вступление
+в гильдию) и перестраиваются тем же потоком каждые
+LEADERBOARD_REBUILD_SECONDS, чтобы подтянуть изменения других воркеров.
+Запросы к рейтингу перестройку не запускают и не ждут — кроме самых
+первых, пришедших до окончания начального построения.
+"""
+import logging
+import os
+import threading
+import time
+
+from sortedcontainers import SortedList
+
+from database import db
+from models import UserStats, GuildMembership
+
+LEADERBOARD_METRICS = ('experience', 'money')
+LEADERBOARD_REBUILD_SECONDS = float(os.getenv('LEADERBOARD_REBUILD_SECONDS', '300'))
+# Сколько первый запрос ждет фоновое построение, прежде чем строить сам
+LEADERBOARD_BUILD_WAIT_SECONDS = float(os.getenv('LEADERBOARD_BUILD_WAIT_SECONDS', '10'))
+LEADERBOARD_RETRY_SECONDS = 5
+
+logger = logging.getLogger(__name__)
+
+
+class Leaderboard:
+    """Рейтинг по одному показателю"""
+
+    def __init__(self, scores=None):
+        self._scores = dict(scores or {})  # user_id -> score
+        self._ranked = SortedList((-score, user_id) for user_id, score in self._scores.items())
+
+    def update(self, user_id, score):
+        old = self._scores.get(user_id)
+        if old == score:
+            return
+        if old is not None:
+            self._ranked.remove((-old, user_id))
+        self._scores[user_id] = score
+        self._ranked.add((-score, user_id))
+
+    def remove(self, user_id):
+        old = self._scores.pop(user_id, None)
+        if old is not None:
+            self._ranked.remove((-old, user_id))
+
+    def score(self, user_id):
+        return self._scores.get(user_id)
+
+    def top(self, limit, offset=0):
+        """[(место, user_id, score), ...]"""
+        return [(offset + index + 1, user_id, -negative)
+                for index, (negative, user_id) in enumerate(self._ranked.islice(offset, offset + limit))]
+
+    def rank(self, user_id):
+        """Место пользователя (с 1) или None, если его нет в рейтинге"""
+        score = self._scores.get(user_id)
+        if score is None:
+            return None
+        return self._ranked.index((-score, user_id)) + 1
+
+    def __len__(self):
+        return len(self._scores)
+
+
+class LeaderboardService:
+    """Глобальные рейтинги и рейтинги гильдий по всем показателям"""
+
+    def __init__(self, rebuild_seconds=LEADERBOARD_REBUILD_SECONDS):
+        self.rebuild_seconds = rebuild_seconds
+        self._lock = threading.RLock()
+        self._rebuild_lock = threading.Lock()
+        self._ready = threading.Event()
+        self._app = None
+        self._thread = None
+        self._built_at = None
+        self._pending = None  # изменения, пришедшие во время перестройки
+        self._global = {}
+        self._guilds = {}  # guild_id -> {metric: Leaderboard}
+        self._user_guilds = {}  # user_id -> set(guild_id)
+
+    def init_app(self, app, start=True):
+        """Запоминает приложение; start — построить рейтинг в фоне сразу"""
+        self._app = app
+        if start:
+            self._start()
+
+    def _start(self):
+        # После fork (gunicorn --preload) потока в воркере нет — запускаем заново
+        thread = self._thread
+        if self._app is None or (thread is not None and thread.is_alive()):
+            return
+        self._thread = threading.Thread(target=self._run, name='leaderboard-rebuild', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                with self._app.app_context():
+                    self.rebuild()
+            except Exception:
+                logger.exception('Leaderboard rebuild failed')
+            # До первого построения повторяем чаще
+            time.sleep(self.rebuild_seconds if self._built_at is not None
+                       else min(self.rebuild_seconds, LEADERBOARD_RETRY_SECONDS))
+
+    def rebuild(self):
+        """
+        Полная перестройка из users_stats и guilds_membership. Запросы и
+        сортировка идут без блокировки — record_stats не ждет; изменения,
+        пришедшие за это время, применяются к новым структурам после замены
+        """
+        with self._rebuild_lock:
+            with self._lock:
+                self._pending = []
+            try:
+                stats = db.session.query(UserStats.user_id, UserStats.experience, UserStats.money).all()
+                memberships = db.session.query(GuildMembership.guild_id, GuildMembership.user_id).all()
+                built = self._build(stats, memberships)
+            except Exception:
+                with self._lock:
+                    self._pending = None
+                raise
+            with self._lock:
+                pending, self._pending = self._pending, None
+                self._global, self._guilds, self._user_guilds = built
+                self._built_at = time.monotonic()
+                for apply, args in pending:
+                    apply(*args)
+        self._ready.set()
+
+    @staticmethod
+    def _build(stats, memberships):
+        scores = {metric: {row.user_id: getattr(row, metric) or 0 for row in stats}
+                  for metric in LEADERBOARD_METRICS}
+        global_boards = {metric: Leaderboard(scores[metric]) for metric in LEADERBOARD_METRICS}
+
+        members, user_guilds = {}, {}
+        for guild_id, user_id in memberships:
+            members.setdefault(guild_id, []).append(user_id)
+            user_guilds.setdefault(user_id, set()).add(guild_id)
+        guilds = {
+            guild_id: {metric: Leaderboard({user_id: scores[metric][user_id]
+                                            for user_id in user_ids if user_id in scores[metric]})
+                       for metric in LEADERBOARD_METRICS}
+            for guild_id, user_ids in members.items()
+        }
+        return global_boards, guilds, user_guilds
+
+    def _ensure_built(self):
+        """Первое построение: ждем фоновый поток, без него строим сами — вне self._lock"""
+        self._start()
+        if self._built_at is not None:
+            return
+        if self._thread is not None:
+            self._ready.wait(LEADERBOARD_BUILD_WAIT_SECONDS)
+        if self._built_at is None:
+            with self._rebuild_lock:
+                built = self._built_at is not None
+            if not built:
+                self.rebuild()
+
+    def _record(self, apply, *args):
+        # Вызывается под self._lock
+        if self._pending is not None:
+            self._pending.append((apply, args))
+        if self._built_at is not None:
+            apply(*args)
+
+    def record_stats(self, user_id, **scores):
+        """Точечное обновление после изменения статистики: record_stats(id, experience=..., money=...)"""
+        with self._lock:
+            self._record(self._apply_stats, user_id, scores)
+
+    def _apply_stats(self, user_id, scores):
+        for metric, score in scores.items():
+            if metric not in LEADERBOARD_METRICS or score is None:
+                continue
+            self._global[metric].update(user_id, score)
+            for guild_id in self._user_guilds.get(user_id, ()):
+                self._guilds[guild_id][metric].update(user_id, score)
+
+    def add_member(self, guild_id, user_id):
+        with self._lock:
+            self._record(self._apply_add_member, guild_id, user_id)
+
+    def _apply_add_member(self, guild_id, user_id):
+        self._user_guilds.setdefault(user_id, set()).add(guild_id)
+        boards = self._guilds.setdefault(
+            guild_id, {metric: Leaderboard() for metric in LEADERBOARD_METRICS})
+        for metric, board in boards.items():
+            score = self._global[metric].score(user_id)
+            if score is not None:
+                board.update(user_id, score)
+
+    def remove_member(self, guild_id, user_id):
+        with self._lock:
+            self._record(self._apply_remove_member, guild_id, user_id)
+
+    def _apply_remove_member(self, guild_id, user_id):
+        self._user_guilds.get(user_id, set()).discard(guild_id)
+        for board in self._guilds.get(guild_id, {}).values():
+            board.remove(user_id)
+
+    def _board(self, metric, guild_id):
+        if guild_id is None:
+            return self._global[metric]
+        boards = self._guilds.get(guild_id)
+        return boards[metric] if boards is not None else Leaderboard()
+
+    def top(self, metric, limit, offset=0, guild_id=None):
+        self._ensure_built()
+        with self._lock:
+            return self._board(metric, guild_id).top(limit, offset)
+
+    def rank(self, user_id, metric, guild_id=None):
+        """(место, score, всего в рейтинге); место None, если пользователя нет"""
+        self._ensure_built()
+        with self._lock:
+            board = self._board(metric, guild_id)
+            return board.rank(user_id), board.score(user_id), len(board)
+
+
+leaderboards = LeaderboardService()
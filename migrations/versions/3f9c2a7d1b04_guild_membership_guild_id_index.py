@@ -0,0 +1,26 @@
+"""index guilds_membership.guild_id
+
+Revision ID: 3f9c2a7d1b04
+Revises: 
+Create Date: 2026-10-17 16:40:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f9c2a7d1b04'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('guilds_membership', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_guilds_membership_guild_id'), ['guild_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('guilds_membership', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_guilds_membership_guild_id'))
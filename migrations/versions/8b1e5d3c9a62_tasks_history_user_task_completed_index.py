@@ -0,0 +1,26 @@
+"""composite index on tasks_history (user_id, task_id, completed_at)
+
+Revision ID: 8b1e5d3c9a62
+Revises: 3f9c2a7d1b04
+Create Date: 2026-10-17 17:05:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8b1e5d3c9a62'
+down_revision = '3f9c2a7d1b04'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('tasks_history', schema=None) as batch_op:
+        batch_op.create_index('ix_tasks_history_user_task_completed', ['user_id', 'task_id', 'completed_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('tasks_history', schema=None) as batch_op:
+        batch_op.drop_index('ix_tasks_history_user_task_completed')
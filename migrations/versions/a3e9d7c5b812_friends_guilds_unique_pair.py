@@ -0,0 +1,48 @@
+"""unique friendship pair in friends_guilds
+
+Revision ID: a3e9d7c5b812
+Revises: f2c8d4a9b731
+Create Date: 2026-10-17 23:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a3e9d7c5b812'
+down_revision = 'f2c8d4a9b731'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Дубликаты (в том числе дружба в обратную сторону) и дружба с собой:
+    # из повторов остается строка с наименьшим id
+    op.execute(
+        'DELETE FROM friends_guilds WHERE user_id = friend_id OR EXISTS ('
+        'SELECT 1 FROM friends_guilds AS other WHERE other.id < friends_guilds.id AND ('
+        '(other.user_id = friends_guilds.user_id AND other.friend_id = friends_guilds.friend_id) '
+        "OR (other.status = 'friend' AND friends_guilds.status = 'friend' "
+        'AND other.user_id = friends_guilds.friend_id AND other.friend_id = friends_guilds.user_id)))'
+    )
+
+    with op.batch_alter_table('friends_guilds', schema=None) as batch_op:
+        batch_op.create_unique_constraint('uq_friends_guilds_user_friend', ['user_id', 'friend_id'])
+        batch_op.create_check_constraint('ck_friends_guilds_not_self', 'user_id <> friend_id')
+
+    if op.get_bind().dialect.name != 'postgresql':
+        # SQLite: обратное направление проверяет только add_friend
+        return
+
+    op.execute('CREATE UNIQUE INDEX uq_friends_guilds_friend_pair ON friends_guilds '
+               "(least(user_id, friend_id), greatest(user_id, friend_id)) WHERE status = 'friend'")
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute('DROP INDEX IF EXISTS uq_friends_guilds_friend_pair')
+
+    with op.batch_alter_table('friends_guilds', schema=None) as batch_op:
+        batch_op.drop_constraint('ck_friends_guilds_not_self', type_='check')
+        batch_op.drop_constraint('uq_friends_guilds_user_friend', type_='unique')
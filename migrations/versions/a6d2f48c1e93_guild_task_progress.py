@@ -0,0 +1,63 @@
+"""guild task progress counters and completions
+
+Revision ID: a6d2f48c1e93
+Revises: e5a83f1c7b20
+Create Date: 2026-10-17 19:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a6d2f48c1e93'
+down_revision = 'e5a83f1c7b20'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('guilds_tasks', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('completed_count', sa.Integer(), nullable=False, server_default='0'))
+        batch_op.create_index(batch_op.f('ix_guilds_tasks_guild_id'), ['guild_id'], unique=False)
+        batch_op.create_index('ix_guilds_tasks_task_active', ['task_id', 'is_active'], unique=False)
+        batch_op.create_index('ix_guilds_tasks_active_due', ['is_active', 'due_date'], unique=False)
+
+    with op.batch_alter_table('guilds_membership', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_guilds_membership_user_id'), ['user_id'], unique=False)
+
+    op.create_table('guilds_tasks_completions',
+    sa.Column('guild_task_id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('completed_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['guild_task_id'], ['guilds_tasks.guild_task_id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['user_id'], ['users.user_id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('guild_task_id', 'user_id')
+    )
+
+    # Выполнения, сделанные участниками после назначения, — из истории
+    op.execute(
+        'INSERT INTO guilds_tasks_completions (guild_task_id, user_id, completed_at) '
+        'SELECT gt.guild_task_id, h.user_id, min(h.completed_at) FROM guilds_tasks gt '
+        'JOIN guilds_membership m ON m.guild_id = gt.guild_id '
+        'JOIN tasks_history h ON h.task_id = gt.task_id AND h.user_id = m.user_id '
+        'AND h.completed_at >= gt.assigned_at '
+        'GROUP BY gt.guild_task_id, h.user_id'
+    )
+    op.execute(
+        'UPDATE guilds_tasks SET completed_count = (SELECT count(*) FROM guilds_tasks_completions c '
+        'WHERE c.guild_task_id = guilds_tasks.guild_task_id)'
+    )
+
+
+def downgrade():
+    op.drop_table('guilds_tasks_completions')
+
+    with op.batch_alter_table('guilds_membership', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_guilds_membership_user_id'))
+
+    with op.batch_alter_table('guilds_tasks', schema=None) as batch_op:
+        batch_op.drop_index('ix_guilds_tasks_active_due')
+        batch_op.drop_index('ix_guilds_tasks_task_active')
+        batch_op.drop_index(batch_op.f('ix_guilds_tasks_guild_id'))
+        batch_op.drop_column('completed_count')
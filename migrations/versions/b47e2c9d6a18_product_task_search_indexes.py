@@ -0,0 +1,55 @@
+"""search and filter indexes on products and tasks
+
+Revision ID: b47e2c9d6a18
+Revises: d81c3b7e5f26
+Create Date: 2026-10-17 20:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b47e2c9d6a18'
+down_revision = 'd81c3b7e5f26'
+branch_labels = None
+depends_on = None
+
+# (таблица, колонка) текстового поиска search.py
+TEXT_COLUMNS = (('products', 'product_name'), ('tasks', 'title'))
+
+
+def upgrade():
+    with op.batch_alter_table('products', schema=None) as batch_op:
+        batch_op.create_index('ix_products_category_price', ['category', 'price'], unique=False)
+        batch_op.create_index('ix_products_price', ['price'], unique=False)
+
+    with op.batch_alter_table('tasks', schema=None) as batch_op:
+        batch_op.create_index('ix_tasks_category_difficulty', ['category', 'difficulty'], unique=False)
+        batch_op.create_index('ix_tasks_difficulty', ['difficulty'], unique=False)
+
+    if op.get_bind().dialect.name != 'postgresql':
+        # SQLite: поиск по названию работает полным просмотром
+        return
+
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for table, column in TEXT_COLUMNS:
+        # LIKE 'q%' по lower() при любой локали базы
+        op.execute(f'CREATE INDEX ix_{table}_{column}_prefix ON {table} (lower({column}) text_pattern_ops)')
+        # LIKE '%q%' по lower() для q от трех символов
+        op.execute(f'CREATE INDEX ix_{table}_{column}_trgm ON {table} USING gin (lower({column}) gin_trgm_ops)')
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        for table, column in TEXT_COLUMNS:
+            op.execute(f'DROP INDEX IF EXISTS ix_{table}_{column}_trgm')
+            op.execute(f'DROP INDEX IF EXISTS ix_{table}_{column}_prefix')
+
+    with op.batch_alter_table('tasks', schema=None) as batch_op:
+        batch_op.drop_index('ix_tasks_difficulty')
+        batch_op.drop_index('ix_tasks_category_difficulty')
+
+    with op.batch_alter_table('products', schema=None) as batch_op:
+        batch_op.drop_index('ix_products_price')
+        batch_op.drop_index('ix_products_category_price')
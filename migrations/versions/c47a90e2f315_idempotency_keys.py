@@ -0,0 +1,34 @@
+"""idempotency_keys table
+
+Revision ID: c47a90e2f315
+Revises: 8b1e5d3c9a62
+Create Date: 2026-10-17 17:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c47a90e2f315'
+down_revision = '8b1e5d3c9a62'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('idempotency_keys',
+    sa.Column('key_id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('key', sa.String(length=255), nullable=False),
+    sa.Column('response', sa.Text(), nullable=False),
+    sa.Column('status_code', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.user_id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('key_id'),
+    sa.UniqueConstraint('user_id', 'key', name='uq_idempotency_keys_user_key')
+    )
+
+
+def downgrade():
+    op.drop_table('idempotency_keys')
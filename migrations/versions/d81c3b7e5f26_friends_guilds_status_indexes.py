@@ -0,0 +1,28 @@
+"""indexes friends_guilds (user_id, status) and (friend_id, status)
+
+Revision ID: d81c3b7e5f26
+Revises: a6d2f48c1e93
+Create Date: 2026-10-17 19:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd81c3b7e5f26'
+down_revision = 'a6d2f48c1e93'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('friends_guilds', schema=None) as batch_op:
+        batch_op.create_index('ix_friends_guilds_user_status', ['user_id', 'status'], unique=False)
+        batch_op.create_index('ix_friends_guilds_friend_status', ['friend_id', 'status'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('friends_guilds', schema=None) as batch_op:
+        batch_op.drop_index('ix_friends_guilds_friend_status')
+        batch_op.drop_index('ix_friends_guilds_user_status')
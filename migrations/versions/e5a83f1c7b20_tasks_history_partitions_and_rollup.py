@@ -0,0 +1,109 @@
+"""monthly partitions of tasks_history and tasks_history_rollup
+
+Revision ID: e5a83f1c7b20
+Revises: c47a90e2f315
+Create Date: 2026-10-17 18:00:00.000000
+
+"""
+from datetime import date
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5a83f1c7b20'
+down_revision = 'c47a90e2f315'
+branch_labels = None
+depends_on = None
+
+# Секции на текущий месяц и на столько месяцев вперед;
+# дальше их создает `flask history ensure-partitions`
+MONTHS_AHEAD = 3
+
+
+def _add_months(day, months):
+    index = day.year * 12 + day.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def upgrade():
+    op.create_table('tasks_history_rollup',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('task_id', sa.Integer(), nullable=False),
+    sa.Column('completions', sa.Integer(), nullable=False),
+    sa.Column('last_completed_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['task_id'], ['tasks.task_id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['user_id'], ['users.user_id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('user_id', 'task_id')
+    )
+    op.execute(
+        'INSERT INTO tasks_history_rollup (user_id, task_id, completions, last_completed_at) '
+        'SELECT user_id, task_id, count(*), max(completed_at) FROM tasks_history '
+        'GROUP BY user_id, task_id'
+    )
+
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    # Пересоздаем tasks_history секционированной по completed_at.
+    # Ключ секционирования обязан входить в первичный ключ.
+    op.execute('ALTER TABLE tasks_history RENAME TO tasks_history_unpartitioned')
+    op.execute('DROP INDEX IF EXISTS ix_tasks_history_user_task_completed')
+    op.execute('ALTER TABLE tasks_history_unpartitioned RENAME CONSTRAINT tasks_history_pkey '
+               'TO tasks_history_unpartitioned_pkey')
+    op.execute("""
+        CREATE TABLE tasks_history (
+            history_id integer NOT NULL DEFAULT nextval('tasks_history_history_id_seq'),
+            task_id integer NOT NULL REFERENCES tasks (task_id) ON DELETE CASCADE,
+            user_id integer NOT NULL REFERENCES users (user_id) ON DELETE CASCADE,
+            completed_at timestamp without time zone NOT NULL,
+            reward_earned integer NOT NULL,
+            PRIMARY KEY (history_id, completed_at)
+        ) PARTITION BY RANGE (completed_at)
+    """)
+    op.execute('ALTER SEQUENCE tasks_history_history_id_seq OWNED BY tasks_history.history_id')
+
+    bind = op.get_bind()
+    oldest = bind.execute(sa.text('SELECT min(completed_at) FROM tasks_history_unpartitioned')).scalar()
+    current = date.today().replace(day=1)
+    month = oldest.date().replace(day=1) if oldest is not None else current
+    last = _add_months(current, MONTHS_AHEAD)
+    while month <= last:
+        op.execute(
+            f'CREATE TABLE tasks_history_{month.year:04d}_{month.month:02d} PARTITION OF tasks_history '
+            f"FOR VALUES FROM ('{month.isoformat()}') TO ('{_add_months(month, 1).isoformat()}')"
+        )
+        month = _add_months(month, 1)
+    op.execute('CREATE TABLE tasks_history_default PARTITION OF tasks_history DEFAULT')
+
+    op.execute('INSERT INTO tasks_history SELECT history_id, task_id, user_id, completed_at, reward_earned '
+               'FROM tasks_history_unpartitioned')
+    op.execute('DROP TABLE tasks_history_unpartitioned')
+    op.create_index('ix_tasks_history_user_task_completed', 'tasks_history',
+                    ['user_id', 'task_id', 'completed_at'], unique=False)
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute('ALTER TABLE tasks_history RENAME TO tasks_history_partitioned')
+        op.execute('DROP INDEX IF EXISTS ix_tasks_history_user_task_completed')
+        op.execute('ALTER SEQUENCE tasks_history_history_id_seq OWNED BY NONE')
+        op.execute("""
+            CREATE TABLE tasks_history (
+                history_id integer NOT NULL DEFAULT nextval('tasks_history_history_id_seq'),
+                task_id integer NOT NULL REFERENCES tasks (task_id) ON DELETE CASCADE,
+                user_id integer NOT NULL REFERENCES users (user_id) ON DELETE CASCADE,
+                completed_at timestamp without time zone NOT NULL,
+                reward_earned integer NOT NULL,
+                CONSTRAINT tasks_history_pkey PRIMARY KEY (history_id)
+            )
+        """)
+        op.execute('INSERT INTO tasks_history SELECT history_id, task_id, user_id, completed_at, reward_earned '
+                   'FROM tasks_history_partitioned')
+        op.execute('DROP TABLE tasks_history_partitioned')
+        op.execute('ALTER SEQUENCE tasks_history_history_id_seq OWNED BY tasks_history.history_id')
+        op.create_index('ix_tasks_history_user_task_completed', 'tasks_history',
+                        ['user_id', 'task_id', 'completed_at'], unique=False)
+
+    op.drop_table('tasks_history_rollup')
@@ -1,4 +1,5 @@
 from datetime import datetime
+from sqlalchemy import select, func
 from database import db
 
 class User(db.Model):
@@ -37,8 +38,16 @@ class UserStats(db.Model):
     user = db.relationship('User', back_populates='stats')
 
 class Product(db.Model):
-    """Товары магазина"""
+    """
+    Товары магазина. Индексы поиска по lower(product_name) (pg_trgm и
+    префиксный) есть только в PostgreSQL и создаются миграцией (search.py)
+    """
     __tablename__ = 'products'
+    __table_args__ = (
+        # Фильтр по категории с диапазоном цены и диапазон цены без категории
+        db.Index('ix_products_category_price', 'category', 'price'),
+        db.Index('ix_products_price', 'price'),
+    )
     
     product_id = db.Column(db.Integer, primary_key=True)
     product_name = db.Column(db.String(255), nullable=False)
@@ -52,16 +61,8 @@ class Product(db.Model):
     @classmethod
     def get_daily_discounts(cls):
         """Возвращает 3 случайных товара со скидкой на текущий день"""
-        import random
-        from datetime import date
-        
-        # Используем текущую дату как seed для детерминированного рандома
-        today = date.today()
-        random.seed(f"{today.year}-{today.month}-{today.day}")
-        
-        # Получаем все товары и выбираем 3 случайных
-        all_products = cls.query.all()
-        return random.sample(all_products, min(3, len(all_products)))
+        from discounts import daily_discounts
+        return daily_discounts.products()
 
 class ProductBuff(db.Model):
     """Бафы товаров"""
@@ -88,6 +89,22 @@ class UserInventory(db.Model):
     user = db.relationship('User', back_populates='inventory_items')
     product = db.relationship('Product', back_populates='inventory_items')
 
+class IdempotencyKey(db.Model):
+    """Ключи идемпотентности: сохраненные ответы на повторяемые запросы"""
+    __tablename__ = 'idempotency_keys'
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'key', name='uq_idempotency_keys_user_key'),
+        # Очистка просроченных ключей (purchases.purge_statement)
+        db.Index('ix_idempotency_keys_created_at', 'created_at'),
+    )
+    
+    key_id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.user_id', ondelete='CASCADE'), nullable=False)
+    key = db.Column(db.String(255), nullable=False)
+    response = db.Column(db.Text, nullable=False)  # JSON тела ответа
+    status_code = db.Column(db.Integer, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
 class Guild(db.Model):
     """Гильдии"""
     __tablename__ = 'guilds'
@@ -106,17 +123,38 @@ class GuildMembership(db.Model):
     __tablename__ = 'guilds_membership'
     
     membership_id = db.Column(db.Integer, primary_key=True)
-    guild_id = db.Column(db.Integer, db.ForeignKey('guilds.guild_id', ondelete='CASCADE'), nullable=False)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.user_id', ondelete='CASCADE'), nullable=False)
+    guild_id = db.Column(db.Integer, db.ForeignKey('guilds.guild_id', ondelete='CASCADE'), nullable=False, index=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.user_id', ondelete='CASCADE'), nullable=False, index=True)
     role = db.Column(db.String(50), default='member', nullable=False)  # 'leader', 'officer', 'member'
     join_date = db.Column(db.DateTime, default=datetime.utcnow)
     
     guild = db.relationship('Guild', back_populates='members')
     user = db.relationship('User', back_populates='guild_memberships')
 
+# Количество участников считается в том же SELECT коррелированным COUNT
+# по индексу guild_id, без загрузки коллекции members
+Guild.members_count = db.column_property(
+    select(func.count(GuildMembership.membership_id))
+    .where(GuildMembership.guild_id == Guild.guild_id)
+    .correlate_except(GuildMembership)
+    .scalar_subquery(),
+    deferred=True
+)
+
 class FriendsGuild(db.Model):
-    """Друзья и гильдии пользователя"""
+    """
+    Друзья и гильдии пользователя. Дружба хранится одной направленной
+    строкой user_id -> friend_id, искать ее нужно с обеих сторон.
+    Уникальность пары без учета направления (least, greatest) для
+    status='friend' — только в PostgreSQL из миграции
+    """
     __tablename__ = 'friends_guilds'
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'friend_id', name='uq_friends_guilds_user_friend'),
+        db.CheckConstraint('user_id <> friend_id', name='ck_friends_guilds_not_self'),
+        db.Index('ix_friends_guilds_user_status', 'user_id', 'status'),
+        db.Index('ix_friends_guilds_friend_status', 'friend_id', 'status'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.user_id', ondelete='CASCADE'), nullable=False)
@@ -129,8 +167,15 @@ class FriendsGuild(db.Model):
     guild = db.relationship('Guild')
 
 class Task(db.Model):
-    """Задания"""
+    """
+    Задания. Индексы поиска по lower(title) — как у товаров, только
+    в PostgreSQL из миграции
+    """
     __tablename__ = 'tasks'
+    __table_args__ = (
+        db.Index('ix_tasks_category_difficulty', 'category', 'difficulty'),
+        db.Index('ix_tasks_difficulty', 'difficulty'),
+    )
     
     task_id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(255), nullable=False)
@@ -142,13 +187,25 @@ class Task(db.Model):
     cooldown_hours = db.Column(db.Integer)  # None для одноразовых
     created_by = db.Column(db.Integer, db.ForeignKey('users.user_id', ondelete='SET NULL'))
     
+    # Время последнего выполнения текущим пользователем — заполняется
+    # запросом доски заданий через with_expression
+    last_completed_at = db.query_expression()
+    
     creator = db.relationship('User', back_populates='created_tasks', foreign_keys=[created_by])
     completions = db.relationship('TaskHistory', back_populates='task', cascade='all, delete-orphan')
     guild_tasks = db.relationship('GuildTask', back_populates='task', cascade='all, delete-orphan')
 
 class TaskHistory(db.Model):
-    """История выполнения заданий"""
+    """
+    История выполнения заданий.
+    В PostgreSQL таблица секционирована по месяцам completed_at
+    (см. history_partitions.py), первичный ключ — (history_id, completed_at)
+    """
     __tablename__ = 'tasks_history'
+    __table_args__ = (
+        # Последнее выполнение задания пользователем — без обращения к таблице
+        db.Index('ix_tasks_history_user_task_completed', 'user_id', 'task_id', 'completed_at'),
+    )
     
     history_id = db.Column(db.Integer, primary_key=True)
     task_id = db.Column(db.Integer, db.ForeignKey('tasks.task_id', ondelete='CASCADE'), nullable=False)
@@ -159,17 +216,48 @@ class TaskHistory(db.Model):
     task = db.relationship('Task', back_populates='completions')
     user = db.relationship('User', back_populates='completed_tasks')
 
+class TaskCompletionRollup(db.Model):
+    """
+    Сводка выполнений заданий: число выполнений и время последнего по паре
+    (пользователь, задание). Обновляется при каждой вставке в tasks_history,
+    проверки cooldown/повтора читают ее вместо истории.
+    """
+    __tablename__ = 'tasks_history_rollup'
+    
+    user_id = db.Column(db.Integer, db.ForeignKey('users.user_id', ondelete='CASCADE'), primary_key=True)
+    task_id = db.Column(db.Integer, db.ForeignKey('tasks.task_id', ondelete='CASCADE'), primary_key=True)
+    completions = db.Column(db.Integer, nullable=False, default=0)
+    last_completed_at = db.Column(db.DateTime, nullable=False)
+
 class GuildTask(db.Model):
-    """Гильдейские задания"""
+    """
+    Гильдейские задания. completed_count — сколько участников выполнили
+    задание после назначения; увеличивается при выполнении (guild_tasks.py)
+    """
     __tablename__ = 'guilds_tasks'
+    __table_args__ = (
+        # Активные назначения задания — при каждом выполнении
+        db.Index('ix_guilds_tasks_task_active', 'task_id', 'is_active'),
+        # Просроченные активные назначения — массовое истечение
+        db.Index('ix_guilds_tasks_active_due', 'is_active', 'due_date'),
+    )
     
     guild_task_id = db.Column(db.Integer, primary_key=True)
-    guild_id = db.Column(db.Integer, db.ForeignKey('guilds.guild_id', ondelete='CASCADE'), nullable=False)
+    guild_id = db.Column(db.Integer, db.ForeignKey('guilds.guild_id', ondelete='CASCADE'), nullable=False, index=True)
     task_id = db.Column(db.Integer, db.ForeignKey('tasks.task_id', ondelete='CASCADE'), nullable=False)
     assigned_by = db.Column(db.Integer, db.ForeignKey('users.user_id', ondelete='SET NULL'))
     assigned_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
     due_date = db.Column(db.DateTime)
     is_active = db.Column(db.Boolean, default=True, nullable=False)
+    completed_count = db.Column(db.Integer, default=0, nullable=False)
     
     guild = db.relationship('Guild', back_populates='tasks')
-    task = db.relationship('Task', back_populates='guild_tasks')
\ No newline at end of file
+    task = db.relationship('Task', back_populates='guild_tasks')
+
+class GuildTaskCompletion(db.Model):
+    """Участники, выполнившие гильдейское задание: по строке на пару, для счетчика"""
+    __tablename__ = 'guilds_tasks_completions'
+    
+    guild_task_id = db.Column(db.Integer, db.ForeignKey('guilds_tasks.guild_task_id', ondelete='CASCADE'), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.user_id', ondelete='CASCADE'), primary_key=True)
+    completed_at = db.Column(db.DateTime, nullable=False)
\ No newline at end of file
@@ -0,0 +1,228 @@
+import json
+
+from flask import Response, current_app, jsonify, request, stream_with_context
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import load_only
+
+from reads import read_all, read_stream
+from serialization import row_projection
+
+DEFAULT_PAGE_LIMIT = 100
+MAX_PAGE_LIMIT = 1000
+STREAM_BATCH_SIZE = 500
+
+LIST_ARGS = ('after', 'limit', 'fields', 'stream', 'sort')
+
+
+class ListArgsError(ValueError):
+    """Некорректные параметры пагинации/проекции"""
+
+
+def has_list_args():
+    """Переданы ли параметры пагинации, проекции или потоковой выдачи"""
+    return any(name in request.args for name in LIST_ARGS)
+
+
+def _parse_int(args, name):
+    value = args.get(name)
+    if value is None:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise ListArgsError(f'{name} must be an integer')
+
+
+def _parse_fields(args, spec):
+    raw = args.get('fields')
+    if not raw:
+        return list(spec)
+    fields = [name.strip() for name in raw.split(',') if name.strip()]
+    unknown = [name for name in fields if name not in spec]
+    if unknown:
+        raise ListArgsError(f'Unknown fields: {", ".join(unknown)}')
+    return fields
+
+
+def _parse_cursor(args):
+    raw = args.get('after')
+    if raw is None:
+        return None
+    try:
+        value, key = json.loads(raw)
+    except (ValueError, TypeError):
+        raise ListArgsError('after must be a cursor from X-Next-Cursor')
+    if not isinstance(key, int):
+        raise ListArgsError('after must be a cursor from X-Next-Cursor')
+    return value, key
+
+
+def parse_sort(args, sorts):
+    """
+    sort=<поле> или sort=-<поле> (по убыванию) из sorts — {поле: колонка}.
+    Возвращает (колонка, по убыванию) или None — порядок по ключу
+    """
+    raw = args.get('sort')
+    if not raw or raw == 'id':
+        return None
+    descending = raw.startswith('-')
+    name = raw[1:] if descending else raw
+    if name not in (sorts or {}):
+        raise ListArgsError(f'sort must be one of: {", ".join(sorts or ("id",))} (optionally with -)')
+    return sorts[name], descending
+
+
+def parse_list_args(args, spec, order=None):
+    """
+    Разбирает after/limit/fields/stream из параметров запроса (любой
+    mapping с .get) и возвращает (after, limit, fields, stream).
+    При сортировке order (см. parse_sort) after — курсор [значение, ключ]
+    """
+    after = _parse_cursor(args) if order is not None else _parse_int(args, 'after')
+    limit = _parse_int(args, 'limit')
+    fields = _parse_fields(args, spec)
+    stream = args.get('stream', '').lower() in ('1', 'true', 'yes')
+
+    if limit is not None and not 0 < limit <= MAX_PAGE_LIMIT:
+        raise ListArgsError(f'limit must be between 1 and {MAX_PAGE_LIMIT}')
+    if limit is None and after is not None and not stream:
+        limit = DEFAULT_PAGE_LIMIT
+    return after, limit, fields, stream
+
+
+def keyset_order(key, order):
+    """ORDER BY списка: колонка сортировки, если есть, и ключ для однозначности"""
+    if order is None:
+        return (key,)
+    column, descending = order
+    return (column.desc() if descending else column.asc(), key)
+
+
+def keyset_after(key, order, after):
+    """Условие «строки после курсора» для порядка keyset_order"""
+    if order is None:
+        return key > after
+    column, descending = order
+    value, last_key = after
+    beyond = column < value if descending else column > value
+    return or_(beyond, and_(column == value, key > last_key))
+
+
+def next_cursor(order, value, key_value):
+    """X-Next-Cursor: ключ последней строки или [значение сортировки, ключ]"""
+    if order is None:
+        return str(key_value)
+    return json.dumps([value, key_value], separators=(',', ':'))
+
+
+def list_response(query, key, spec, sorts=None):
+    """
+    Ответ списочного эндпоинта с keyset-пагинацией, проекцией и стримингом.
+
+    query — ORM-запрос по одной модели, key — колонка первичного ключа,
+    spec — {поле ответа: (колонка, кортеж колонок или None, getter(obj))};
+    колонки невыбранных полей из БД не загружаются. getter None означает
+    «значение самой колонки»: если таких все выбранные поля, читаются
+    строки-кортежи без построения ORM-объектов.
+
+    Параметры запроса:
+      after=<id>   — вернуть строки с ключом больше id (курсор)
+      limit=<n>    — размер страницы (по умолчанию 100, максимум 1000)
+      fields=a,b   — вернуть только перечисленные поля
+      stream=1     — отдавать JSON-массив по мере чтения серверного курсора
+      sort=name    — порядок по полю из sorts ({поле: колонка}), -name — по
+                     убыванию; курсор тогда — [значение, ключ] из X-Next-Cursor
+
+    Без параметров возвращается весь список, как раньше. Тело всегда
+    JSON-массив; курсор следующей страницы передается в X-Next-Cursor.
+    """
+    order = parse_sort(request.args, sorts)
+    after, limit, fields, stream = parse_list_args(request.args, spec, order)
+
+    if all(spec[name][1] is None for name in fields):
+        return _rows_response(query, key, spec, fields, order, after, limit, stream)
+
+    columns = [key] if order is None else [key, order[0]]
+    for name in fields:
+        needed = spec[name][0]
+        if needed is None:
+            continue
+        columns.extend(needed if isinstance(needed, tuple) else (needed,))
+    getters = [(name, spec[name][1]) for name in fields]
+
+    query = query.options(load_only(*columns))
+    if after is not None:
+        query = query.filter(keyset_after(key, order, after))
+    query = query.order_by(*keyset_order(key, order))
+
+    def to_dict(obj):
+        return {name: getter(obj) for name, getter in getters}
+
+    if stream:
+        if limit is not None:
+            query = query.limit(limit)
+        return _stream(query.yield_per(STREAM_BATCH_SIZE), to_dict)
+
+    if limit is None:
+        return jsonify([to_dict(obj) for obj in query])
+
+    rows = query.limit(limit + 1).all()
+    response = jsonify([to_dict(obj) for obj in rows[:limit]])
+    if len(rows) > limit:
+        last = rows[limit - 1]
+        value = getattr(last, order[0].key) if order is not None else None
+        response.headers['X-Next-Cursor'] = next_cursor(order, value, getattr(last, key.key))
+    return response
+
+
+def _rows_response(query, key, spec, fields, order, after, limit, stream):
+    """
+    list_response по кортежам колонок: Core-запрос без identity map
+    и доступа к атрибутам, через быстрый путь чтения (reads.py)
+    """
+    positions = {key: 0}
+    for name in fields:
+        positions.setdefault(spec[name][0], len(positions))
+    if order is not None:
+        positions.setdefault(order[0], len(positions))
+    columns = list(positions)
+    to_dict = row_projection(fields, [positions[spec[name][0]] for name in fields])
+
+    query = query.with_entities(*columns)
+    if after is not None:
+        query = query.filter(keyset_after(key, order, after))
+    query = query.order_by(*keyset_order(key, order))
+
+    if stream:
+        if limit is not None:
+            query = query.limit(limit)
+        return _stream(read_stream(query.statement, STREAM_BATCH_SIZE), to_dict)
+
+    if limit is None:
+        return jsonify([to_dict(row) for row in read_all(query.statement)])
+
+    rows = read_all(query.limit(limit + 1).statement)
+    response = jsonify([to_dict(row) for row in rows[:limit]])
+    if len(rows) > limit:
+        last = rows[limit - 1]
+        value = last[positions[order[0]]] if order is not None else None
+        response.headers['X-Next-Cursor'] = next_cursor(order, value, last[0])
+    return response
+
+
+def _stream(query, to_dict):
+    dumps = current_app.json.dumps
+
+    def generate():
+        yield '['
+        separator = ''
+        for obj in query:
+            yield separator + dumps(to_dict(obj), separators=(',', ':'))
+            separator = ','
+        yield ']'
+
+    return Response(stream_with_context(generate()), mimetype='application/json')
+
+
+def handle_list_args_error(error):
+    return jsonify({'error': str(error)}), 400
@@ -0,0 +1,175 @@
+"""
+Хеширование паролей вне потока запроса.
+
+generate_password_hash/check_password_hash выполняются в ограниченном
+пуле процессов, поэтому поток запроса не держит GIL на время хеширования.
+Число одновременно принятых операций ограничено: при переполнении
+сразу бросается HashingBusy (ответ 429), а не растет очередь. Тот же
+ответ — при истечении PASSWORD_HASH_TIMEOUT (операция при этом держит
+место в очереди, пока не закончится) и при сломанном пуле (процесс убит,
+например OOM killer): пул пересоздается, операция повторяется один раз.
+
+Настройки:
+  PASSWORD_HASH_METHOD   — метод werkzeug, например 'scrypt:32768:8:1'
+                           или 'pbkdf2:sha256:600000' (по умолчанию — метод werkzeug)
+  PASSWORD_HASH_WORKERS  — процессов в пуле; 0 — хешировать в потоке запроса
+  PASSWORD_HASH_QUEUE    — максимум операций в работе и в очереди
+  PASSWORD_HASH_TIMEOUT  — ожидание результата, секунды
+  PASSWORD_HASH_START_METHOD — как запускать процессы пула: forkserver
+                           (по умолчанию, где доступен) или spawn. fork не
+                           годится: в многопоточном воркере (флашер
+                           write-behind, рейтинг, потоки запросов) дочерний
+                           процесс может унаследовать чужую захваченную
+                           блокировку и зависнуть
+"""
+import inspect
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+from flask import jsonify
+from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS, generate_password_hash, check_password_hash
+
+PASSWORD_HASH_METHOD = os.getenv('PASSWORD_HASH_METHOD') or None
+PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', str(os.cpu_count() or 1)))
+PASSWORD_HASH_QUEUE = int(os.getenv('PASSWORD_HASH_QUEUE', str(max(1, PASSWORD_HASH_WORKERS) * 4)))
+PASSWORD_HASH_TIMEOUT = float(os.getenv('PASSWORD_HASH_TIMEOUT', '10'))
+PASSWORD_HASH_START_METHOD = os.getenv('PASSWORD_HASH_START_METHOD') or (
+    'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn')
+
+
+# Метод по умолчанию — тот, что выбирает werkzeug
+DEFAULT_HASH_METHOD = inspect.signature(generate_password_hash).parameters['method'].default
+
+
+class HashingBusy(Exception):
+    """Очередь хеширования переполнена или результат не получен вовремя"""
+
+
+def method_prefix(method):
+    """
+    Префикс хеша werkzeug для метода — без вычисления хеша:
+    'scrypt' -> 'scrypt:32768:8:1', 'pbkdf2' -> 'pbkdf2:sha256:<итераций>'.
+    None, если метод не разобран
+    """
+    name, *args = (method or DEFAULT_HASH_METHOD).split(':')
+    if name == 'scrypt' and len(args) in (0, 3):
+        n, r, p = args or (2 ** 15, 8, 1)
+        return f'scrypt:{n}:{r}:{p}'
+    if name == 'pbkdf2' and len(args) <= 2:
+        hash_name = args[0] if args else 'sha256'
+        iterations = args[1] if len(args) == 2 else DEFAULT_PBKDF2_ITERATIONS
+        return f'pbkdf2:{hash_name}:{iterations}'
+    return None
+
+
+def _hash(password, method):
+    if method is None:
+        return generate_password_hash(password)
+    return generate_password_hash(password, method=method)
+
+
+def _mp_context():
+    context = multiprocessing.get_context(PASSWORD_HASH_START_METHOD)
+    if PASSWORD_HASH_START_METHOD == 'forkserver':
+        # Сервер один раз импортирует модуль, процессы пула форкаются от него
+        context.set_forkserver_preload([__name__])
+    return context
+
+
+class PasswordHasher:
+
+    def __init__(self, method=PASSWORD_HASH_METHOD, workers=PASSWORD_HASH_WORKERS,
+                 max_pending=PASSWORD_HASH_QUEUE, timeout=PASSWORD_HASH_TIMEOUT):
+        self.method = method
+        self.workers = workers
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self._executor = None
+        self._executor_pid = None
+        self._method_prefix = method_prefix(method)
+
+    def _get_executor(self, broken=None):
+        """
+        Пул создается лениво и заново после fork (воркеры gunicorn);
+        broken — сломанный пул, который нужно заменить
+        """
+        pid = os.getpid()
+        executor = self._executor
+        replace = broken is not None and executor is broken
+        if executor is None or replace or self._executor_pid != pid:
+            with self._lock:
+                replace = broken is not None and self._executor is broken
+                if self._executor is None or replace or self._executor_pid != pid:
+                    if replace:
+                        broken.shutdown(wait=False, cancel_futures=True)
+                    self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=_mp_context())
+                    self._executor_pid = pid
+                executor = self._executor
+        return executor
+
+    def _attempt(self, executor, fn, args):
+        if not self._slots.acquire(blocking=False):
+            raise HashingBusy()
+        try:
+            future = executor.submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        # Место в очереди освобождается, когда операция закончилась,
+        # а не когда запрос перестал ее ждать
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            future.cancel()  # еще не начатая операция уходит из очереди
+            raise HashingBusy()
+
+    def _run(self, fn, *args):
+        if self.workers <= 0:
+            if not self._slots.acquire(blocking=False):
+                raise HashingBusy()
+            try:
+                return fn(*args)
+            finally:
+                self._slots.release()
+
+        executor = self._get_executor()
+        try:
+            return self._attempt(executor, fn, args)
+        except BrokenProcessPool:
+            # Процесс пула погиб — пул непригоден: пересоздаем и повторяем один раз
+            executor = self._get_executor(broken=executor)
+        try:
+            return self._attempt(executor, fn, args)
+        except BrokenProcessPool:
+            self._get_executor(broken=executor)
+            raise HashingBusy()
+
+    def hash(self, password):
+        return self._run(_hash, password, self.method)
+
+    def verify(self, stored_hash, password):
+        return self._run(check_password_hash, stored_hash, password)
+
+    def needs_rehash(self, stored_hash):
+        """
+        Хеш посчитан другим методом или с другой стоимостью — сравнение
+        префикса с методом из настроек, без хеширования
+        """
+        if self._method_prefix is None:
+            # Нестандартная запись метода — префикс из хеша пустой строки в пуле
+            self._method_prefix = self._run(_hash, '', self.method).split('$', 1)[0]
+        return stored_hash.split('$', 1)[0] != self._method_prefix
+
+
+password_hasher = PasswordHasher()
+
+
+def handle_hashing_busy(error):
+    response = jsonify({'error': 'Too many authentication requests, try again later'})
+    response.headers['Retry-After'] = '1'
+    return response, 429
@@ -0,0 +1,23 @@
+import os
+from functools import wraps
+
+from flask import jsonify
+from flask_jwt_extended import jwt_required
+
+from profiles import current_user_id
+
+# Администраторы задаются списком id через запятую: ADMIN_USER_IDS=1,42
+ADMIN_USER_IDS = frozenset(
+    int(user_id) for user_id in os.getenv('ADMIN_USER_IDS', '').split(',') if user_id.strip()
+)
+
+
+def admin_required(view):
+    """Доступ только для пользователей из ADMIN_USER_IDS"""
+    @wraps(view)
+    @jwt_required()
+    def wrapper(*args, **kwargs):
+        if current_user_id() not in ADMIN_USER_IDS:
+            return jsonify({'error': 'Forbidden'}), 403
+        return view(*args, **kwargs)
+    return wrapper
@@ -0,0 +1,94 @@
+import os
+from collections import namedtuple
+
+from flask import g
+from flask_jwt_extended import get_jwt_identity
+from sqlalchemy import select
+
+from cache import TTLCache, MISSING
+from database import on_model_change
+from models import User, UserStats
+from reads import caller_wrote_recently, read_first
+
+PROFILE_CACHE_SIZE = int(os.getenv('PROFILE_CACHE_SIZE', '10000'))
+PROFILE_CACHE_TTL = float(os.getenv('PROFILE_CACHE_TTL', '5'))  # секунды
+
+# Снимок пользователя вместе со статистикой; поля статистики равны None,
+# если строки в users_stats нет
+UserProfile = namedtuple('UserProfile', [
+    'user_id', 'name', 'has_stats', 'health_points', 'mana', 'max_health_points',
+    'max_mana', 'level', 'experience', 'money', 'last_update'
+])
+
+profile_cache = TTLCache(maxsize=PROFILE_CACHE_SIZE, ttl=PROFILE_CACHE_TTL)
+
+
+def profile_statement(user_id):
+    """Один запрос User LEFT JOIN UserStats за профилем пользователя"""
+    return select(
+        User.user_id, User.name, UserStats.user_id.label('stats_user_id'),
+        UserStats.health_points, UserStats.mana, UserStats.max_health_points,
+        UserStats.max_mana, UserStats.level, UserStats.experience,
+        UserStats.money, UserStats.last_update
+    ).outerjoin(UserStats, UserStats.user_id == User.user_id).where(
+        User.user_id == user_id
+    )
+
+
+def profile_from_row(row):
+    """Профиль из строки profile_statement; кладется в кеш"""
+    profile = UserProfile(
+        user_id=row.user_id,
+        name=row.name,
+        has_stats=row.stats_user_id is not None,
+        health_points=row.health_points,
+        mana=row.mana,
+        max_health_points=row.max_health_points,
+        max_mana=row.max_mana,
+        level=row.level,
+        experience=row.experience,
+        money=row.money,
+        last_update=row.last_update
+    )
+    profile_cache.set(row.user_id, profile)
+    return profile
+
+
+def load_profile(user_id):
+    """
+    Профиль пользователя со статистикой: из кеша горячих профилей или
+    одним запросом User LEFT JOIN UserStats (с реплики, если она есть).
+    Возвращает None, если пользователя нет (отсутствие не кешируется).
+    Свой профиль после собственной записи читается мимо кеша с основной
+    БД: кеш мог успеть заполниться отстающей репликой.
+    """
+    own_write = caller_wrote_recently() and user_id == current_user_id()
+    if not own_write:
+        profile = profile_cache.get(user_id)
+        if profile is not MISSING:
+            return profile
+
+    row = read_first(profile_statement(user_id))
+    if row is None:
+        return None
+    return profile_from_row(row)
+
+
+def invalidate_profile(user_id):
+    profile_cache.invalidate(user_id)
+
+
+def current_user_id():
+    """id пользователя из JWT, разобранный один раз за запрос"""
+    if 'current_user_id' not in g:
+        g.current_user_id = int(get_jwt_identity())
+    return g.current_user_id
+
+
+def _invalidate_changed(instances):
+    for instance in instances:
+        invalidate_profile(instance.user_id)
+
+
+on_model_change(User, _invalidate_changed)
+on_model_change(UserStats, _invalidate_changed)
@@ -0,0 +1,234 @@
+"""
+Покупки товаров и ключи идемпотентности.
+
+Сохраненный ответ по ключу идемпотентности живет IDEMPOTENCY_KEY_TTL_HOURS:
+повтор запроса в этом окне вернет его без новой покупки. Старые ключи
+удаляются одним DELETE по индексу created_at — по cron или администратором:
+
+    flask idempotency-keys purge
+"""
+import json
+import os
+from datetime import datetime, timedelta
+
+import click
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.exc import IntegrityError
+
+from database import db
+from discounts import daily_discounts, discounted_price
+from models import Product, UserStats, UserInventory, IdempotencyKey
+from profiles import invalidate_profile
+from leaderboard import leaderboards
+
+
+IDEMPOTENCY_KEY_TTL_HOURS = float(os.getenv('IDEMPOTENCY_KEY_TTL_HOURS', '24'))
+
+
+class PurchaseError(Exception):
+    """Покупка отклонена; status_code — HTTP-код ответа"""
+
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def stored_response_statement(user_id, key):
+    return select(IdempotencyKey.response, IdempotencyKey.status_code).where(
+        IdempotencyKey.user_id == user_id, IdempotencyKey.key == key)
+
+
+def _stored_response(user_id, key):
+    row = db.session.execute(stored_response_statement(user_id, key)).first()
+    if row is None:
+        return None
+    return json.loads(row.response), row.status_code
+
+
+def charge_statement(user_id, price):
+    """Условное списание: строка вернется, только если денег хватило"""
+    return (
+        update(UserStats)
+        .where(UserStats.user_id == user_id, UserStats.money >= price)
+        .values(money=UserStats.money - price)
+        .returning(UserStats.money)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def stats_exists_statement(user_id):
+    return select(UserStats.user_id).where(UserStats.user_id == user_id)
+
+
+def charge_error(stats_exists):
+    """Причина несработавшего списания: нет денег или нет самого пользователя"""
+    if not stats_exists:
+        return PurchaseError('User not found', 404)
+    return PurchaseError('Not enough money')
+
+
+def purchase_result(base_price, is_discounted):
+    """(цена к оплате, ответ на успешную покупку)"""
+    price = discounted_price(base_price) if is_discounted else base_price
+    return price, {
+        'message': 'Product purchased',
+        'discounted': is_discounted,
+        'price_paid': price,
+        'saved': (base_price - price) if is_discounted else 0
+    }
+
+
+def purchase(user_id, product_id, idempotency_key=None):
+    """
+    Покупка товара одной транзакцией.
+    Деньги списываются условным UPDATE ... WHERE money >= price RETURNING,
+    поэтому параллельные покупки не могут увести баланс в минус, а предмет
+    добавляется в инвентарь в той же транзакции.
+    При переданном ключе идемпотентности успешный ответ сохраняется,
+    и повторный запрос с тем же ключом возвращает его без новой покупки.
+    Возвращает (ответ, HTTP-код), при отказе бросает PurchaseError.
+    """
+    if idempotency_key:
+        stored = _stored_response(user_id, idempotency_key)
+        if stored is not None:
+            return stored
+
+    base_price = db.session.query(Product.price).filter_by(product_id=product_id).scalar()
+    if base_price is None:
+        raise PurchaseError('Product not found', 404)
+
+    price, result = purchase_result(base_price, daily_discounts.is_discounted(product_id))
+
+    try:
+        money_left = db.session.execute(charge_statement(user_id, price)).scalar()
+        if money_left is None:
+            stats_exists = db.session.execute(stats_exists_statement(user_id)).first() is not None
+            db.session.rollback()
+            raise charge_error(stats_exists)
+
+        db.session.execute(insert(UserInventory).values(
+            user_id=user_id,
+            product_id=product_id,
+            is_equipped=False
+        ))
+        if idempotency_key:
+            db.session.add(IdempotencyKey(
+                user_id=user_id,
+                key=idempotency_key,
+                response=json.dumps(result),
+                status_code=200
+            ))
+        db.session.commit()
+        invalidate_profile(user_id)
+        leaderboards.record_stats(user_id, money=money_left)
+        return result, 200
+    except IntegrityError:
+        # Параллельный запрос с тем же ключом успел закоммититься первым —
+        # наша покупка откатывается, отдаем его ответ
+        db.session.rollback()
+        stored = _stored_response(user_id, idempotency_key) if idempotency_key else None
+        if stored is None:
+            raise
+        return stored
+
+
+def purchase_many(user_id, product_ids, idempotency_key=None):
+    """
+    Пакетная покупка одной транзакцией: цены всех товаров одним запросом,
+    баланс читается с блокировкой строки, товары проверяются по порядку
+    пакета, затем одно списание суммы и executemany в инвентарь.
+    Товары, на которые не хватило денег, в результатах получают 400.
+    Возвращает (ответ, HTTP-код); ключ идемпотентности относится ко всему пакету.
+    """
+    if idempotency_key:
+        stored = _stored_response(user_id, idempotency_key)
+        if stored is not None:
+            return stored
+
+    prices = dict(db.session.execute(
+        select(Product.product_id, Product.price).where(Product.product_id.in_(set(product_ids)))
+    ).all())
+    money = db.session.execute(
+        select(UserStats.money).where(UserStats.user_id == user_id).with_for_update()
+    ).scalar()
+    if money is None:
+        db.session.rollback()
+        raise PurchaseError('User not found', 404)
+
+    results, bought, total = [], [], 0
+    for index, product_id in enumerate(product_ids):
+        base_price = prices.get(product_id)
+        if base_price is None:
+            results.append({'index': index, 'product_id': product_id, 'status': 404,
+                            'error': 'Product not found'})
+            continue
+        price, result = purchase_result(base_price, daily_discounts.is_discounted(product_id))
+        if money - total < price:
+            results.append({'index': index, 'product_id': product_id, 'status': 400,
+                            'error': 'Not enough money'})
+            continue
+        total += price
+        bought.append(product_id)
+        results.append({'index': index, 'product_id': product_id, 'status': 200, **result})
+
+    try:
+        money_left = money
+        if bought:
+            money_left = db.session.execute(charge_statement(user_id, total)).scalar()
+            if money_left is None:
+                # Баланс изменился в обход блокировки (SQLite без FOR UPDATE)
+                db.session.rollback()
+                raise PurchaseError('Balance changed, retry the batch', 409)
+            db.session.execute(insert(UserInventory), [
+                {'user_id': user_id, 'product_id': product_id, 'is_equipped': False}
+                for product_id in bought
+            ])
+
+        response = {'results': results, 'money': money_left}
+        if idempotency_key:
+            db.session.add(IdempotencyKey(
+                user_id=user_id,
+                key=idempotency_key,
+                response=json.dumps(response),
+                status_code=200
+            ))
+        db.session.commit()
+        if bought:
+            invalidate_profile(user_id)
+            leaderboards.record_stats(user_id, money=money_left)
+        return response, 200
+    except IntegrityError:
+        db.session.rollback()
+        stored = _stored_response(user_id, idempotency_key) if idempotency_key else None
+        if stored is None:
+            raise
+        return stored
+
+
+def purge_statement(now=None):
+    """Удаляет ключи идемпотентности старше IDEMPOTENCY_KEY_TTL_HOURS"""
+    cutoff = (now or datetime.utcnow()) - timedelta(hours=IDEMPOTENCY_KEY_TTL_HOURS)
+    return delete(IdempotencyKey).where(IdempotencyKey.created_at < cutoff).execution_options(
+        synchronize_session=False)
+
+
+def purge_idempotency_keys(now=None):
+    """Удаляет просроченные ключи; возвращает их число"""
+    count = db.session.execute(purge_statement(now)).rowcount
+    db.session.commit()
+    return count
+
+
+@click.group('idempotency-keys', help='Ключи идемпотентности покупок')
+def idempotency_cli():
+    pass
+
+
+@idempotency_cli.command('purge')
+def purge_command():
+    """Удалить ключи старше IDEMPOTENCY_KEY_TTL_HOURS"""
+    click.echo(f'purged {purge_idempotency_keys()}')
+
+
+def init_purchases(app):
+    app.cli.add_command(idempotency_cli)
@@ -0,0 +1,228 @@
+"""
+Ограничение частоты запросов к дорогим эндпоинтам (token bucket).
+
+У каждого лимита — ведро на ключ (id пользователя из JWT или IP):
+ведро вмещает burst запросов и пополняется со скоростью count/period.
+Пустое ведро — ответ 429 с Retry-After. По умолчанию ведра живут
+в памяти воркера; общий для воркеров backend подключается через
+RATE_LIMIT_BACKEND и реализует RateLimitBackend.take атомарно
+(например, скриптом в Redis или его локальной заменой).
+
+Настройки:
+  RATE_LIMIT_ENABLED  — включить ограничение (по умолчанию вкл.)
+  RATE_LIMITS         — переопределение лимитов: "login=10/60,buy_product=30/60:10"
+                        (имя=запросов/секунд[:burst]; 0 отключает лимит)
+  RATE_LIMIT_BACKEND  — класс backend'а "модуль:Класс" (по умолчанию в памяти)
+  RATE_LIMIT_MAX_KEYS — ключей в памяти воркера до очистки полных ведер
+
+Ключ per='ip' — request.remote_addr. За обратным прокси задайте
+TRUSTED_PROXY_COUNT (app.py: адрес берется из X-Forwarded-For через
+ProxyFix), в ASGI-режиме — uvicorn --proxy-headers --forwarded-allow-ips,
+иначе все клиенты делят ведро прокси.
+"""
+import importlib
+import math
+import os
+import threading
+from functools import wraps
+from time import monotonic
+
+from flask import jsonify
+from flask.globals import _cv_app, _cv_request
+
+from database import env_flag
+from profiles import current_user_id
+
+RATE_LIMIT_ENABLED = env_flag('RATE_LIMIT_ENABLED', True)
+RATE_LIMIT_MAX_KEYS = int(os.getenv('RATE_LIMIT_MAX_KEYS', '100000'))
+
+# Лимиты по умолчанию: имя -> "запросов/секунд[:burst]"
+DEFAULT_RATE_LIMITS = {
+    'register': '5/60',
+    'login': '10/60',
+    'complete_task': '60/60',
+    'complete_tasks_batch': '10/60',
+    'buy_product': '30/60',
+    'buy_products_batch': '10/60',
+}
+
+
+class RateLimited(Exception):
+    """Лимит исчерпан; retry_after — секунды до появления токена"""
+
+    def __init__(self, retry_after):
+        super().__init__('Too many requests')
+        self.retry_after = retry_after
+
+
+def parse_limit(value):
+    """'count/period[:burst]' -> (токенов в секунду, burst) или None, если лимит выключен"""
+    rate, _, burst = value.partition(':')
+    count, _, period = rate.partition('/')
+    count, period = int(count), float(period or 1)
+    if count <= 0:
+        return None
+    return count / period, int(burst) if burst else count
+
+
+def parse_limits(value):
+    limits = dict(DEFAULT_RATE_LIMITS)
+    for item in (value or '').split(','):
+        name, _, limit = item.partition('=')
+        if name.strip():
+            limits[name.strip()] = limit.strip()
+    return {name: parse_limit(limit) for name, limit in limits.items()}
+
+
+class RateLimitBackend:
+    """
+    Хранилище ведер. take списывает токен из ведра key с параметрами
+    (rate, burst) на момент now (time.monotonic() воркера — общим
+    backend'ам лучше использовать собственные часы) и возвращает 0,
+    если запрос разрешен, иначе секунды до появления токена.
+    bucket возвращает take(key, now) одного лимита; по умолчанию —
+    через take с ключом (name, key), свой backend может ускорить его.
+    """
+
+    def take(self, key, rate, burst, now):
+        raise NotImplementedError
+
+    def bucket(self, name, rate, burst):
+        take = self.take
+
+        def take_limited(key, now):
+            return take((name, key), rate, burst, now)
+        return take_limited
+
+
+class MemoryBackend(RateLimitBackend):
+    """
+    Ведра в памяти воркера. Ведро — одно число: момент, когда оно снова
+    будет полным (GCRA, то же, что token bucket). У каждого лимита свой
+    словарь по исходному ключу, так что на запрос не создаются ни кортеж
+    ключа, ни список состояния.
+
+    Блокировки нет: чтение и запись ведра — по одной атомарной операции
+    со словарем. Два потока с одним ключом, переключившиеся ровно между
+    ними, могут разово пропустить лишний запрос; для защиты от перебора
+    это допустимо, а в ASGI-режиме (один поток цикла событий) не бывает.
+    """
+
+    def __init__(self, max_keys=RATE_LIMIT_MAX_KEYS):
+        self.max_keys = max_keys
+        self._evict_lock = threading.Lock()
+        self._buckets = {}  # (name, rate, burst) -> {key: момент заполнения}
+
+    def take(self, key, rate, burst, now):
+        return self.bucket(None, rate, burst)(key, now)
+
+    def bucket(self, name, rate, burst):
+        buckets = self._buckets.setdefault((name, rate, burst), {})
+        get, max_keys, evict = buckets.get, self.max_keys, self._evict
+        interval = 1 / rate
+        # Токен есть, пока full_at - now <= burst * interval; полное ведро — full_at <= now
+        tolerance = burst * interval
+
+        def take(key, now):
+            full_at = get(key)
+            if full_at is None:
+                if len(buckets) >= max_keys:
+                    evict(buckets, now)
+                full_at = now + interval
+            elif full_at < now:
+                full_at = now + interval
+            else:
+                full_at += interval
+                if full_at - now > tolerance:
+                    return full_at - now - tolerance
+            buckets[key] = full_at
+            return 0
+        return take
+
+    def _evict(self, buckets, now):
+        # Полное ведро ничем не отличается от отсутствующего
+        if not self._evict_lock.acquire(blocking=False):
+            return
+        try:
+            for key, full_at in list(buckets.items()):
+                if full_at <= now:
+                    buckets.pop(key, None)
+        finally:
+            self._evict_lock.release()
+
+
+def load_backend(path):
+    """Backend по пути "модуль:Класс"; пустой путь — в памяти воркера"""
+    if not path:
+        return MemoryBackend()
+    module, _, name = path.partition(':')
+    return getattr(importlib.import_module(module), name)()
+
+
+class RateLimiter:
+
+    def __init__(self, limits, backend):
+        self.limits = limits
+        self.backend = backend
+        self._takes = {name: backend.bucket(name, *limit) for name, limit in limits.items() if limit is not None}
+
+    def taker(self, name):
+        """take(key, now) лимита name — для горячего пути декоратора"""
+        return self._takes[name]
+
+    def check(self, name, key):
+        """Бросает RateLimited, если запрос с ключом key сверх лимита name"""
+        retry_after = self._takes[name](key, monotonic())
+        if retry_after:
+            raise RateLimited(retry_after)
+
+
+rate_limiter = RateLimiter(parse_limits(os.getenv('RATE_LIMITS')), load_backend(os.getenv('RATE_LIMIT_BACKEND')))
+
+
+# Ключ ведра — контекст читается напрямую: каждое обращение к request
+# или g через LocalProxy стоит дороже всей проверки лимита
+def _user_key():
+    user_id = getattr(_cv_app.get().g, 'current_user_id', None)
+    return user_id if user_id is not None else current_user_id()
+
+
+def _ip_key():
+    return _cv_request.get().request.remote_addr
+
+
+def limit_enabled(name):
+    return RATE_LIMIT_ENABLED and rate_limiter.limits.get(name) is not None
+
+
+def rate_limit(name, per='user'):
+    """
+    Декоратор view с лимитом name. per='user' — ведро на пользователя
+    из JWT (ставится под @jwt_required()), per='ip' — на адрес клиента.
+    Выключенный лимит не оборачивает view вовсе.
+    """
+    def decorator(view):
+        if not limit_enabled(name):
+            return view
+
+        take = rate_limiter.taker(name)
+        key = _user_key if per == 'user' else _ip_key
+
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            retry_after = take(key(), monotonic())
+            if retry_after:
+                raise RateLimited(retry_after)
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def retry_after_header(retry_after):
+    return str(max(1, math.ceil(retry_after)))
+
+
+def handle_rate_limited(error):
+    response = jsonify({'error': 'Too many requests, try again later'})
+    response.headers['Retry-After'] = retry_after_header(error.retry_after)
+    return response, 429
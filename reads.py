@@ -0,0 +1,121 @@
+"""
+Быстрый путь чтения для горячих GET: Core select() по нужным колонкам,
+строки-кортежи без ORM-объектов, identity map и отслеживания изменений.
+
+Если задан DB_READ_URI, такие чтения уходят на реплику. Клиент, который
+сам недавно что-то записал (коммит с INSERT/UPDATE/DELETE в его запросе),
+следующие READ_YOUR_WRITES_SECONDS читает с основной БД, чтобы видеть
+свои изменения несмотря на отставание реплики. Момент записи (unix time)
+уходит клиенту в cookie и заголовке X-Last-Write и возвращается им же
+в cookie или в заголовке X-Last-Write, поэтому окно действует в любом
+воркере и на любом хосте. Окно должно покрывать типичное отставание
+реплики с запасом на расхождение часов хостов.
+"""
+import os
+import time
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from database import db
+
+READ_REPLICA_URI = os.getenv('DB_READ_URI')
+REPLICA_BIND = 'replica'
+READ_YOUR_WRITES_SECONDS = float(os.getenv('READ_YOUR_WRITES_SECONDS', '5'))
+LAST_WRITE_COOKIE = 'last_write'
+LAST_WRITE_HEADER = 'X-Last-Write'
+
+
+def _last_write():
+    """Момент последней записи клиента из cookie или заголовка, иначе None"""
+    value = request.headers.get(LAST_WRITE_HEADER) or request.cookies.get(LAST_WRITE_COOKIE)
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+def caller_wrote_recently():
+    """Писал ли текущий клиент в пределах окна read-your-writes"""
+    if not has_request_context():
+        return False
+    if g.get('last_write') is not None:
+        return True
+    last_write = _last_write()
+    return last_write is not None and time.time() - last_write < READ_YOUR_WRITES_SECONDS
+
+
+def _read_engine():
+    """Движок реплики, если чтение можно отдать ей, иначе None"""
+    if not READ_REPLICA_URI or caller_wrote_recently():
+        return None
+    return db.engines[REPLICA_BIND]
+
+
+def read_all(statement):
+    """Все строки Core-запроса с реплики или основной БД"""
+    engine = _read_engine()
+    if engine is None:
+        return db.session.execute(statement).all()
+    with engine.connect() as connection:
+        return connection.execute(statement).all()
+
+
+def read_first(statement):
+    """Первая строка Core-запроса или None"""
+    engine = _read_engine()
+    if engine is None:
+        return db.session.execute(statement).first()
+    with engine.connect() as connection:
+        return connection.execute(statement).first()
+
+
+def read_stream(statement, batch_size):
+    """Генератор строк Core-запроса, читаемых серверным курсором пачками"""
+    engine = _read_engine()
+    if engine is None:
+        yield from db.session.execute(statement.execution_options(yield_per=batch_size))
+        return
+    with engine.connect() as connection:
+        yield from connection.execute(statement.execution_options(yield_per=batch_size))
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _remember_write_statement(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info['wrote'] = True
+
+
+@event.listens_for(Session, 'after_flush')
+def _remember_flush(session, flush_context):
+    session.info['wrote'] = True
+
+
+@event.listens_for(Session, 'after_commit')
+def _mark_writer(session):
+    if session.info.pop('wrote', False) and READ_REPLICA_URI and has_request_context():
+        g.last_write = time.time()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_write(session):
+    session.info.pop('wrote', None)
+
+
+def _send_last_write(response):
+    last_write = g.get('last_write')
+    if last_write is not None:
+        value = f'{last_write:.3f}'
+        response.headers[LAST_WRITE_HEADER] = value
+        response.set_cookie(LAST_WRITE_COOKIE, value, max_age=int(READ_YOUR_WRITES_SECONDS) + 1,
+                            httponly=True, samesite='Lax')
+    return response
+
+
+def init_reads(app):
+    """Передает клиенту отметку о записи для read-your-writes, если задана реплика"""
+    if READ_REPLICA_URI:
+        app.after_request(_send_last_write)
@@ -0,0 +1,53 @@
+"""
+Сводка tasks_history_rollup: по паре (пользователь, задание) хранит число
+выполнений и время последнего. Горячие проверки cooldown и повтора читают
+одну строку сводки, история остается для аналитики.
+"""
+from sqlalchemy import case
+from sqlalchemy.dialects import postgresql, sqlite
+
+from database import db
+from models import TaskCompletionRollup
+
+
+def completions_upsert(dialect, completions):
+    """
+    Upsert сводки для новых строк tasks_history (None, если строк нет).
+    completions — итерируемое из (user_id, task_id, completed_at)
+    """
+    aggregated = {}
+    for user_id, task_id, completed_at in completions:
+        key = (user_id, task_id)
+        count, last = aggregated.get(key, (0, completed_at))
+        aggregated[key] = (count + 1, max(last, completed_at))
+    if not aggregated:
+        return None
+
+    insert = postgresql.insert if dialect == 'postgresql' else sqlite.insert
+    table = TaskCompletionRollup.__table__
+
+    statement = insert(table).values([
+        {'user_id': user_id, 'task_id': task_id, 'completions': count, 'last_completed_at': last}
+        for (user_id, task_id), (count, last) in aggregated.items()
+    ])
+    return statement.on_conflict_do_update(
+        index_elements=[table.c.user_id, table.c.task_id],
+        set_={
+            'completions': table.c.completions + statement.excluded.completions,
+            'last_completed_at': case(
+                (statement.excluded.last_completed_at > table.c.last_completed_at,
+                 statement.excluded.last_completed_at),
+                else_=table.c.last_completed_at
+            )
+        }
+    )
+
+
+def record_completions(completions):
+    """
+    Учитывает новые строки tasks_history в сводке одним upsert;
+    вызывается в той же транзакции, что и вставка в историю
+    """
+    statement = completions_upsert(db.session.get_bind().dialect.name, completions)
+    if statement is not None:
+        db.session.execute(statement)
@@ -0,0 +1,109 @@
+"""
+Фильтры и текстовый поиск списков товаров и заданий.
+
+Параметры запроса (вместе с after/limit/fields/stream/sort из pagination.py):
+  q=<текст>          — поиск по названию без учета регистра
+  match=prefix       — только по началу названия (по умолчанию — подстрока)
+  category=a,b       — категория из списка
+  difficulty=a,b     — сложность задания из списка
+  min_price, max_price — диапазон цены товара
+
+Подстрока ищется LIKE '%q%' по lower(названия): в PostgreSQL его
+обслуживает GIN-индекс pg_trgm, префикс — B-tree по lower(названия)
+с text_pattern_ops (миграция b47e2c9d6a18). Для подстроки короче трех
+символов триграммный индекс не помогает — такой поиск читает таблицу
+целиком, но смысл q от длины не меняется.
+В SQLite те же запросы работают без текстовых индексов (lower()
+там меняет регистр только латиницы) — для локальной разработки.
+Категория, сложность и цена идут по обычным B-tree индексам в обеих СУБД.
+"""
+from sqlalchemy import func
+
+from models import Product, Task
+from pagination import ListArgsError
+
+SEARCH_MAX_LENGTH = 100
+MAX_FILTER_VALUES = 20
+
+SEARCH_ARGS = ('q', 'match', 'category', 'difficulty', 'min_price', 'max_price')
+MATCH_MODES = ('contains', 'prefix')
+
+PRODUCT_SORTS = {
+    'name': Product.product_name,
+    'price': Product.price
+}
+TASK_SORTS = {
+    'title': Task.title,
+    'reward': Task.base_reward,
+    'difficulty': Task.difficulty
+}
+
+
+def has_search_args(args):
+    """Переданы ли параметры фильтрации или поиска"""
+    return any(name in args for name in SEARCH_ARGS)
+
+
+def _int_arg(args, name):
+    value = args.get(name)
+    if value is None or value == '':
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise ListArgsError(f'{name} must be an integer')
+
+
+def _values_arg(args, name):
+    raw = args.get(name)
+    if not raw:
+        return None
+    values = sorted({value.strip() for value in raw.split(',') if value.strip()})
+    if len(values) > MAX_FILTER_VALUES:
+        raise ListArgsError(f'{name} accepts at most {MAX_FILTER_VALUES} values')
+    return values or None
+
+
+def text_match(column, args):
+    """Условие поиска q по колонке или None, если q не передан"""
+    text = (args.get('q') or '').strip().lower()
+    if not text:
+        return None
+    if len(text) > SEARCH_MAX_LENGTH:
+        raise ListArgsError(f'q must be at most {SEARCH_MAX_LENGTH} characters')
+    mode = args.get('match') or 'contains'
+    if mode not in MATCH_MODES:
+        raise ListArgsError(f'match must be one of: {", ".join(MATCH_MODES)}')
+    if mode == 'prefix':
+        return func.lower(column).startswith(text, autoescape=True)
+    return func.lower(column).contains(text, autoescape=True)
+
+
+def _criteria(args, text_column, equality):
+    criteria = []
+    match = text_match(text_column, args)
+    if match is not None:
+        criteria.append(match)
+    for name, column in equality:
+        values = _values_arg(args, name)
+        if values is not None:
+            criteria.append(column == values[0] if len(values) == 1 else column.in_(values))
+    return criteria
+
+
+def product_criteria(args):
+    """Условия WHERE для списка товаров: q, category, min_price, max_price"""
+    criteria = _criteria(args, Product.product_name, [('category', Product.category)])
+    min_price, max_price = _int_arg(args, 'min_price'), _int_arg(args, 'max_price')
+    if min_price is not None and max_price is not None and min_price > max_price:
+        raise ListArgsError('min_price must not exceed max_price')
+    if min_price is not None:
+        criteria.append(Product.price >= min_price)
+    if max_price is not None:
+        criteria.append(Product.price <= max_price)
+    return criteria
+
+
+def task_criteria(args):
+    """Условия WHERE для доски заданий: q, category, difficulty"""
+    return _criteria(args, Task.title, [('category', Task.category), ('difficulty', Task.difficulty)])
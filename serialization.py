@@ -0,0 +1,172 @@
+"""
+Сериализация ответов API.
+
+FastJSONProvider заменяет JSON-провайдер Flask: jsonify и все места,
+которые пишут через app.json.dumps, кодируют компактно и без сортировки
+ключей, а при установленном orjson — через него (в разы быстрее
+стандартного encoder'а). Даты и прочие нестандартные типы по-прежнему
+превращает default Flask, поэтому вывод совпадает со стандартным бэкендом.
+
+Клиент с Accept: application/msgpack получает тело jsonify в MessagePack
+(если установлен msgpack). Ответы крупнее COMPRESS_MIN_BYTES сжимаются
+brotli (если установлен brotli) или gzip по Accept-Encoding.
+
+Настройки:
+  JSON_BACKEND          — auto (orjson, если есть), orjson или stdlib
+  MSGPACK_ENABLED       — отдавать MessagePack по Accept (по умолчанию вкл.)
+  COMPRESSION_ENABLED   — сжимать ответы (по умолчанию вкл.)
+  COMPRESS_MIN_BYTES    — минимальный размер тела для сжатия
+"""
+import gzip
+import os
+from operator import itemgetter
+
+from flask import current_app, has_request_context, request
+from flask.json.provider import DefaultJSONProvider
+
+from database import env_flag
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+JSON_BACKEND = os.getenv('JSON_BACKEND', 'auto')
+MSGPACK_ENABLED = env_flag('MSGPACK_ENABLED', True) and msgpack is not None
+COMPRESSION_ENABLED = env_flag('COMPRESSION_ENABLED', True)
+COMPRESS_MIN_BYTES = int(os.getenv('COMPRESS_MIN_BYTES', '1024'))
+
+MSGPACK_MIMETYPES = ('application/msgpack', 'application/x-msgpack')
+COMPRESSIBLE_MIMETYPES = frozenset(('application/json', 'text/plain', 'text/html') + MSGPACK_MIMETYPES)
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 4  # быстрое сжатие: ответы динамические
+
+if JSON_BACKEND == 'orjson' and orjson is None:
+    raise RuntimeError('JSON_BACKEND=orjson, but orjson is not installed')
+_use_orjson = orjson is not None and JSON_BACKEND != 'stdlib'
+
+# Даты отдаем через default Flask, как стандартный бэкенд
+_ORJSON_OPTIONS = (orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS) if orjson else 0
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """JSON-провайдер Flask на orjson с компактным выводом и MessagePack по Accept"""
+
+    compact = True
+    sort_keys = False
+
+    def dumps(self, obj, **kwargs):
+        # Отступы и прочие опции stdlib — через стандартный encoder
+        if not _use_orjson or kwargs.keys() - {'separators'}:
+            kwargs.setdefault('separators', (',', ':'))
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=self.default, option=_ORJSON_OPTIONS).decode()
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        if MSGPACK_ENABLED and has_request_context():
+            mimetype = wants_msgpack()
+            if mimetype is not None:
+                response = self._app.response_class(
+                    msgpack.packb(obj, default=self.default, use_bin_type=True), mimetype=mimetype)
+                response.vary.add('Accept')
+                return response
+        response = self._app.response_class(f'{self.dumps(obj)}\n', mimetype=self.mimetype)
+        if MSGPACK_ENABLED:
+            response.vary.add('Accept')
+        return response
+
+
+def msgpack_body(obj):
+    """obj в MessagePack — так же, как его кодирует FastJSONProvider"""
+    return msgpack.packb(obj, default=current_app.json.default, use_bin_type=True)
+
+
+def wants_msgpack(accept=None):
+    """
+    MIME-тип MessagePack, если клиент предпочитает его JSON, иначе None.
+    accept — разобранный Accept (по умолчанию текущего запроса Flask)
+    """
+    if accept is None:
+        accept = request.accept_mimetypes
+    best = accept.best_match(('application/json',) + MSGPACK_MIMETYPES)
+    return best if best in MSGPACK_MIMETYPES else None
+
+
+def row_projection(names, indexes):
+    """
+    Заранее собранное преобразование строки результата (кортежа) в dict:
+    names — поля ответа, indexes — позиции их значений в строке
+    """
+    names = tuple(names)
+    if len(indexes) == 1:
+        name, index = names[0], indexes[0]
+        return lambda row: {name: row[index]}
+    getter = itemgetter(*indexes)
+    return lambda row: dict(zip(names, getter(row)))
+
+
+def _accepted_encoding(accept=None):
+    offers = ('br', 'gzip') if brotli is not None else ('gzip',)
+    return (accept if accept is not None else request.accept_encodings).best_match(offers)
+
+
+def choose_encoding(body, accept=None):
+    """
+    Кодировка, которой стоит сжать тело body, или None. accept —
+    разобранный Accept-Encoding (по умолчанию текущего запроса Flask)
+    """
+    if not COMPRESSION_ENABLED or len(body) < COMPRESS_MIN_BYTES:
+        return None
+    return _accepted_encoding(accept)
+
+
+def compress_body(body, encoding):
+    """Тело body, сжатое кодировкой encoding ('br' или 'gzip')"""
+    if encoding == 'br':
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def compress_response(response):
+    """
+    after_request: сжимает крупные несжатые ответы по Accept-Encoding.
+    Ответы, уже сжатые view (каталог со сжатыми копиями в кеше), не трогает
+    """
+    if (response.direct_passthrough or response.is_streamed
+            or response.status_code < 200 or response.status_code in (204, 304)
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+        return response
+    response.vary.add('Accept-Encoding')
+
+    body = response.get_data()
+    encoding = choose_encoding(body)
+    if encoding is None:
+        return response
+
+    response.set_data(compress_body(body, encoding))
+    response.headers['Content-Encoding'] = encoding
+    # Сжатое представление побайтно отличается — строгий ETag ослабляем
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+
+def init_serialization(app):
+    """Подключает быстрый JSON-провайдер и сжатие ответов"""
+    app.json_provider_class = FastJSONProvider
+    app.json = FastJSONProvider(app)
+    if COMPRESSION_ENABLED:
+        app.after_request(compress_response)
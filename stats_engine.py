@@ -0,0 +1,183 @@
+"""
+Ленивая регенерация и бафы показателей пользователя.
+
+В users_stats хранятся значения health_points/mana на момент last_update.
+Действующие значения считаются при чтении: к сохраненным прибавляется
+регенерация за время с last_update (базовая скорость плюс бафы регенерации
+надетых предметов за время их действия), максимумы увеличиваются
+активными бафами. Фоновых пересчетов нет: строка перезаписывается, только
+когда меняются health или mana, поэтому неактивные пользователи не стоят
+ни одной записи.
+
+Баф товара действует, пока предмет надет, и buff_duration минут
+с момента получения предмета (acquire_date); без buff_duration — постоянно.
+Типы бафов: max_health, max_mana, health_regen, mana_regen (в минуту).
+
+Настройки:
+  HEALTH_REGEN_PER_MINUTE, MANA_REGEN_PER_MINUTE — базовая регенерация
+  EQUIPPED_CACHE_TTL — сколько секунд держать в кеше надетые предметы
+"""
+import os
+import threading
+from collections import namedtuple
+from datetime import timedelta
+
+from sqlalchemy import select
+
+from cache import TTLCache, MISSING
+from database import on_model_change
+from models import ProductBuff, UserInventory, UserStats
+from reads import read_all
+
+HEALTH_REGEN_PER_MINUTE = float(os.getenv('HEALTH_REGEN_PER_MINUTE', '1'))
+MANA_REGEN_PER_MINUTE = float(os.getenv('MANA_REGEN_PER_MINUTE', '0.5'))
+EQUIPPED_CACHE_TTL = float(os.getenv('EQUIPPED_CACHE_TTL', '30'))
+
+BUFF_MAX_HEALTH = 'max_health'
+BUFF_MAX_MANA = 'max_mana'
+BUFF_HEALTH_REGEN = 'health_regen'
+BUFF_MANA_REGEN = 'mana_regen'
+
+# Поле запроса PUT /stats -> колонка users_stats
+STATS_FIELDS = {'health': 'health_points', 'mana': 'mana', 'money': 'money'}
+
+# Колонки, из которых считаются действующие показатели
+STORED_COLUMNS = (
+    UserStats.health_points, UserStats.mana, UserStats.max_health_points,
+    UserStats.max_mana, UserStats.last_update
+)
+
+EffectiveStats = namedtuple('EffectiveStats', ['health', 'mana', 'max_health', 'max_mana'])
+
+# user_id -> ((product_id, acquire_date), ...) надетых предметов
+equipped_cache = TTLCache(maxsize=10000, ttl=EQUIPPED_CACHE_TTL)
+
+
+class BuffCache:
+    """
+    Определения бафов по товарам: product_id -> ((тип, значение, длительность), ...).
+    Меняются редко, поэтому хранятся без TTL и сбрасываются целиком
+    при изменении products_buffs
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buffs = {}
+
+    def missing(self, product_ids):
+        buffs = self._buffs
+        return [product_id for product_id in product_ids if product_id not in buffs]
+
+    def store(self, product_ids, rows):
+        """Запоминает бафы товаров product_ids по строкам buffs_statement"""
+        loaded = {product_id: [] for product_id in product_ids}
+        for row in rows:
+            loaded[row.product_id].append((row.buff_type, row.buff_value, row.buff_duration))
+        with self._lock:
+            for product_id, buffs in loaded.items():
+                self._buffs[product_id] = tuple(buffs)
+
+    def get_many(self, product_ids):
+        buffs = self._buffs
+        return {product_id: buffs.get(product_id, ()) for product_id in product_ids}
+
+    def invalidate(self, *args):
+        with self._lock:
+            self._buffs = {}
+
+
+product_buffs = BuffCache()
+
+
+def equipped_statement(user_id):
+    return select(UserInventory.product_id, UserInventory.acquire_date).where(
+        UserInventory.user_id == user_id, UserInventory.is_equipped.is_(True))
+
+
+def buffs_statement(product_ids):
+    return select(
+        ProductBuff.product_id, ProductBuff.buff_type, ProductBuff.buff_value, ProductBuff.buff_duration
+    ).where(ProductBuff.product_id.in_(product_ids))
+
+
+def store_equipped(user_id, rows):
+    equipped = tuple((row.product_id, row.acquire_date) for row in rows)
+    equipped_cache.set(user_id, equipped)
+    return equipped
+
+
+def load_modifiers(user_id):
+    """(надетые предметы, бафы их товаров) — из кешей или запросами"""
+    equipped = equipped_cache.get(user_id)
+    if equipped is MISSING:
+        equipped = store_equipped(user_id, read_all(equipped_statement(user_id)))
+    product_ids = [product_id for product_id, _ in equipped]
+    missing = product_buffs.missing(product_ids)
+    if missing:
+        product_buffs.store(missing, read_all(buffs_statement(missing)))
+    return equipped, product_buffs.get_many(product_ids)
+
+
+def _overlap_minutes(start, end, active_from, active_to):
+    start = max(start, active_from)
+    if active_to is not None:
+        end = min(end, active_to)
+    return max(0.0, (end - start).total_seconds() / 60)
+
+
+def effective_stats(stored, equipped, buffs, now):
+    """
+    Действующие показатели на момент now. stored — строка с health_points,
+    mana, max_health_points, max_mana, last_update; equipped и buffs —
+    результат load_modifiers. Максимумы берутся на момент now, значения
+    не выходят за них (в т.ч. после окончания бафа максимума)
+    """
+    max_health = stored.max_health_points or 0
+    max_mana = stored.max_mana or 0
+    last_update = stored.last_update or now
+    minutes = max(0.0, (now - last_update).total_seconds() / 60)
+    health_gain = HEALTH_REGEN_PER_MINUTE * minutes
+    mana_gain = MANA_REGEN_PER_MINUTE * minutes
+
+    for product_id, acquired_at in equipped:
+        for buff_type, value, duration in buffs.get(product_id, ()):
+            active_from = acquired_at or last_update
+            active_to = active_from + timedelta(minutes=duration) if duration else None
+            if buff_type == BUFF_HEALTH_REGEN:
+                health_gain += value * _overlap_minutes(last_update, now, active_from, active_to)
+            elif buff_type == BUFF_MANA_REGEN:
+                mana_gain += value * _overlap_minutes(last_update, now, active_from, active_to)
+            elif active_from <= now and (active_to is None or now < active_to):
+                if buff_type == BUFF_MAX_HEALTH:
+                    max_health += value
+                elif buff_type == BUFF_MAX_MANA:
+                    max_mana += value
+
+    return EffectiveStats(
+        health=min(max_health, (stored.health_points or 0) + int(health_gain)),
+        mana=min(max_mana, (stored.mana or 0) + int(mana_gain)),
+        max_health=max_health,
+        max_mana=max_mana
+    )
+
+
+def materialize(values, current, now):
+    """
+    Дополняет значения для UPDATE users_stats: если меняется health или
+    mana, второй показатель фиксируется на действующем значении current
+    и last_update сдвигается на now — регенерация дальше идет от записи
+    """
+    if 'health_points' in values or 'mana' in values:
+        values.setdefault('health_points', current.health)
+        values.setdefault('mana', current.mana)
+        values['last_update'] = now
+    return values
+
+
+def _invalidate_equipped(instances):
+    for instance in instances:
+        equipped_cache.invalidate(instance.user_id)
+
+
+on_model_change(UserInventory, _invalidate_equipped)
+on_model_change(ProductBuff, product_buffs.invalidate)
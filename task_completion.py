@@ -0,0 +1,227 @@
+import threading
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert, select, text, update
+
+from database import db
+from models import Task, TaskHistory, TaskCompletionRollup, UserStats
+from rollup import record_completions
+from guild_tasks import record_guild_progress
+from profiles import invalidate_profile
+from leaderboard import leaderboards
+from write_behind import write_behind
+
+# Локальные блокировки для СУБД без advisory locks (SQLite в разработке):
+# пара (user, task) попадает в одну из полос
+_LOCAL_LOCK_STRIPES = 64
+_local_locks = [threading.Lock() for _ in range(_LOCAL_LOCK_STRIPES)]
+
+
+class CompletionError(Exception):
+    """Выполнение задания отклонено; status_code — HTTP-код ответа"""
+
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def _lock_user_tasks(user_id, task_ids):
+    """
+    Сериализует выполнения заданий одним пользователем до конца
+    транзакции. В PostgreSQL — pg_advisory_xact_lock на каждую пару,
+    снимаются сами при commit/rollback; иначе возвращает захваченные
+    локальные блокировки, которые вызывающий освобождает после завершения
+    транзакции. Блокировки берутся в порядке возрастания — пакеты
+    с пересекающимися заданиями не взаимоблокируются.
+    """
+    task_ids = sorted(set(task_ids))
+    if db.session.get_bind().dialect.name == 'postgresql':
+        db.session.execute(text('SELECT pg_advisory_xact_lock(:user_id, task_id) FROM unnest(:task_ids) AS task_id'),
+                           {'user_id': user_id, 'task_ids': task_ids})
+        return []
+    stripes = sorted({hash((user_id, task_id)) % _LOCAL_LOCK_STRIPES for task_id in task_ids})
+    locks = [_local_locks[stripe] for stripe in stripes]
+    for lock in locks:
+        lock.acquire()
+    return locks
+
+
+def _release(locks):
+    for lock in reversed(locks):
+        lock.release()
+
+
+def task_rules_statement(user_id, task_ids):
+    """Правила заданий вместе с последним выполнением пользователем"""
+    # Последнее выполнение — из компактной сводки, а не из истории
+    last_completed_at = select(TaskCompletionRollup.last_completed_at).where(
+        TaskCompletionRollup.user_id == user_id,
+        TaskCompletionRollup.task_id == Task.task_id
+    ).correlate(Task).scalar_subquery()
+
+    return select(
+        Task.task_id,
+        Task.is_repeatable,
+        Task.cooldown_hours,
+        Task.base_reward,
+        last_completed_at.label('last_completed_at')
+    ).where(Task.task_id.in_(task_ids))
+
+
+def check_completion(task, last_completed, now):
+    """Бросает CompletionError, если задание сейчас выполнить нельзя"""
+    if task is None:
+        raise CompletionError('Task not found', 404)
+
+    # Проверка на повторное выполнение
+    if not task.is_repeatable and last_completed is not None:
+        raise CompletionError('Task already completed')
+
+    # Проверка cooldown для повторяемых заданий
+    if (task.is_repeatable and task.cooldown_hours and last_completed is not None
+            and now - last_completed < timedelta(hours=task.cooldown_hours)):
+        raise CompletionError('Task on cooldown. Try again later')
+
+
+def reward_statement(user_id, reward):
+    """Атомарное начисление награды с возвратом новых money и experience"""
+    return (
+        update(UserStats)
+        .where(UserStats.user_id == user_id)
+        .values(
+            money=UserStats.money + reward,
+            experience=UserStats.experience + reward * 10
+        )
+        .returning(UserStats.money, UserStats.experience)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def complete_task(user_id, task_id):
+    """
+    Завершение задания одной транзакцией с постоянным числом запросов:
+    блокировка (user, task), чтение правил задания вместе с последним
+    выполнением, вставка в историю со сводкой и атомарное начисление награды
+    UPDATE ... SET money = money + :reward RETURNING.
+    Двойное нажатие не может выдать награду дважды: второй запрос ждет
+    блокировку и уже видит первое выполнение.
+    С включенным write-behind событие ставится в очередь пакетной записи;
+    при ответе до записи (WRITE_BEHIND_ACK=enqueue) выполнение сначала
+    фиксируется в сводке, чтобы повтор в другом воркере его увидел.
+    Возвращает (money, experience) после начисления (None, если ответ
+    дается до записи), при отказе бросает CompletionError.
+    """
+    local_locks = _lock_user_tasks(user_id, [task_id])
+    try:
+        task = db.session.execute(task_rules_statement(user_id, [task_id])).first()
+
+        now = datetime.utcnow()
+        last_completed = task.last_completed_at if task is not None else None
+        if task is not None and write_behind.enabled:
+            # Выполнение могло еще не дойти до БД
+            pending = write_behind.pending_completion(user_id, task_id)
+            if pending is not None and (last_completed is None or pending > last_completed):
+                last_completed = pending
+
+        check_completion(task, last_completed, now)
+
+        if write_behind.enabled:
+            if not write_behind.ack_after_flush:
+                # Блокировка снимается до записи пакета — проверки повтора
+                # и cooldown в других процессах должны видеть выполнение
+                record_completions([(user_id, task_id, now)])
+                db.session.commit()
+                write_behind.enqueue(user_id, task_id, task.base_reward, now, claimed=True)
+                return None, None
+            event = write_behind.enqueue(user_id, task_id, task.base_reward, now)
+            if local_locks:
+                # SQLite: читающая транзакция не должна мешать коммиту флашера
+                db.session.rollback()
+            # В PostgreSQL advisory lock держится до записи пакета
+            money, experience = event.wait()
+            db.session.rollback()
+            return money, experience
+
+        db.session.execute(insert(TaskHistory).values(
+            task_id=task_id,
+            user_id=user_id,
+            reward_earned=task.base_reward,
+            completed_at=now
+        ))
+        record_completions([(user_id, task_id, now)])
+        record_guild_progress([(user_id, task_id, now)])
+
+        stats = db.session.execute(reward_statement(user_id, task.base_reward)).first()
+
+        if stats is None:
+            raise CompletionError('User not found', 404)
+
+        db.session.commit()
+        invalidate_profile(user_id)
+        leaderboards.record_stats(user_id, money=stats.money, experience=stats.experience)
+        return stats.money, stats.experience
+    except Exception:
+        db.session.rollback()
+        raise
+    finally:
+        _release(local_locks)
+
+
+def complete_tasks(user_id, task_ids):
+    """
+    Пакетное выполнение заданий (синхронизация офлайн-прогресса) одной
+    транзакцией: блокировки всех пар (user, task), одно чтение правил,
+    проверки в порядке пакета — как если бы запросы пришли по очереди
+    в один момент, — executemany в историю, upsert сводки и одно
+    начисление суммарной награды.
+    Возвращает (результаты по элементам, money, experience).
+    """
+    local_locks = _lock_user_tasks(user_id, task_ids)
+    try:
+        tasks = {task.task_id: task for task in db.session.execute(task_rules_statement(user_id, task_ids))}
+
+        now = datetime.utcnow()
+        last_completed = {}
+        for task_id, task in tasks.items():
+            last_completed[task_id] = task.last_completed_at
+            pending = write_behind.pending_completion(user_id, task_id) if write_behind.enabled else None
+            if pending is not None and (last_completed[task_id] is None or pending > last_completed[task_id]):
+                last_completed[task_id] = pending
+
+        results, history, reward = [], [], 0
+        for index, task_id in enumerate(task_ids):
+            task = tasks.get(task_id)
+            try:
+                check_completion(task, last_completed.get(task_id), now)
+            except CompletionError as e:
+                results.append({'index': index, 'task_id': task_id, 'status': e.status_code, 'error': str(e)})
+                continue
+            last_completed[task_id] = now
+            reward += task.base_reward
+            history.append({'task_id': task_id, 'user_id': user_id,
+                            'reward_earned': task.base_reward, 'completed_at': now})
+            results.append({'index': index, 'task_id': task_id, 'status': 200, 'reward': task.base_reward})
+
+        if history:
+            db.session.execute(insert(TaskHistory), history)
+            completions = [(user_id, row['task_id'], now) for row in history]
+            record_completions(completions)
+            record_guild_progress(completions)
+            stats = db.session.execute(reward_statement(user_id, reward)).first()
+        else:
+            stats = db.session.execute(
+                select(UserStats.money, UserStats.experience).where(UserStats.user_id == user_id)
+            ).first()
+        if stats is None:
+            raise CompletionError('User not found', 404)
+
+        db.session.commit()
+        if history:
+            invalidate_profile(user_id)
+            leaderboards.record_stats(user_id, money=stats.money, experience=stats.experience)
+        return results, stats.money, stats.experience
+    except Exception:
+        db.session.rollback()
+        raise
+    finally:
+        _release(local_locks)
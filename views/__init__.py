@@ -0,0 +1,11 @@
+"""
+Маршруты API по доменам: модуль — blueprint с префиксом /api.
+Регистрируются фабрикой create_app (app.py)
+"""
+
+
+def register_blueprints(app):
+    from views import admin, auth, guilds, leaderboards, shop, tasks, users
+
+    for module in (auth, users, shop, tasks, guilds, leaderboards, admin):
+        app.register_blueprint(module.bp)
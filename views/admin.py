@@ -0,0 +1,59 @@
+"""Администрирование"""
+from flask import Blueprint, request, jsonify
+
+from batches import batch_items, create_products, create_tasks
+from database import db, pool_status
+from guild_tasks import expire_due_tasks, recount_statement
+from permissions import admin_required
+from purchases import purge_idempotency_keys
+
+bp = Blueprint('admin', __name__, url_prefix='/api/admin')
+
+
+@bp.route('/pool', methods=['GET'])
+@admin_required
+def admin_pool():
+    """Статистика пула соединений с БД текущего воркера"""
+    return jsonify(pool_status())
+
+@bp.route('/guild-tasks/expire', methods=['POST'])
+@admin_required
+def admin_expire_guild_tasks():
+    """Выключить все просроченные гильдейские задания одним запросом"""
+    return jsonify({'expired': expire_due_tasks()})
+
+@bp.route('/guild-tasks/recount', methods=['POST'])
+@admin_required
+def admin_recount_guild_tasks():
+    """Пересчитать счетчики прогресса (guild_id — только для одной гильдии)"""
+    db.session.execute(recount_statement(request.args.get('guild_id', type=int)))
+    db.session.commit()
+    return jsonify({'message': 'Progress recounted'})
+
+@bp.route('/idempotency-keys/purge', methods=['POST'])
+@admin_required
+def admin_purge_idempotency_keys():
+    """Удалить ключи идемпотентности старше IDEMPOTENCY_KEY_TTL_HOURS"""
+    return jsonify({'purged': purge_idempotency_keys()})
+
+@bp.route('/products/batch', methods=['POST'])
+@admin_required
+def admin_products_batch():
+    """
+    Создание товаров пакетом: products — список объектов
+    name, price, category, image_url. При ошибке в любом элементе
+    ничего не записывается, ошибки возвращаются по элементам
+    """
+    results = create_products(batch_items(request.get_json(silent=True), 'products'))
+    return jsonify({'results': results}), 201
+
+@bp.route('/tasks/batch', methods=['POST'])
+@admin_required
+def admin_tasks_batch():
+    """
+    Создание системных заданий пакетом: tasks — список объектов
+    title, description, difficulty, category, reward, is_repeatable,
+    cooldown_hours. Всё или ничего, как у товаров
+    """
+    results = create_tasks(batch_items(request.get_json(silent=True), 'tasks'))
+    return jsonify({'results': results}), 201
@@ -0,0 +1,81 @@
+"""Регистрация и вход"""
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import create_access_token
+
+from database import db
+from leaderboard import leaderboards
+from models import User, UserStats, UserInventory
+from passwords import password_hasher
+from ratelimit import rate_limit
+
+bp = Blueprint('auth', __name__, url_prefix='/api')
+
+
+@bp.route('/register', methods=['POST'])
+@rate_limit('register', per='ip')
+def register():
+    data = request.get_json()
+    hashed_password = password_hasher.hash(data['password'])
+    
+    try:
+        # Создаем пользователя и связанные записи в одной транзакции
+        with db.session.begin_nested():
+            new_user = User(
+                name=data['name'],
+                sex=data.get('sex'),
+                password=hashed_password
+            )
+            db.session.add(new_user)
+            db.session.flush()  # Получаем user_id
+            
+            # Создаем статистику с дефолтными значениями
+            stats = UserStats(user_id=new_user.user_id)
+            db.session.add(stats)
+            
+            # Не создаем инвентарь, если не указан product_id
+            if 'product_id' in data:
+                inventory = UserInventory(
+                    user_id=new_user.user_id,
+                    product_id=data['product_id'],
+                    is_equipped=False
+                )
+                db.session.add(inventory)
+        
+        user_id = new_user.user_id
+        db.session.commit()
+        leaderboards.record_stats(user_id, experience=0, money=0)
+        
+        access_token = create_access_token(identity=user_id)
+        return jsonify({
+            'message': 'User created successfully',
+            'access_token': access_token
+        }), 201
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
+    
+
+@bp.route('/login', methods=['POST'])
+@rate_limit('login', per='ip')
+def login():
+    """
+    Аутентификация пользователя.
+    Принимает: name, password
+    Возвращает: access_token и user_id
+    При переполнении очереди хеширования — 429
+    """
+    data = request.get_json()
+    user = User.query.filter_by(name=data['name']).first()
+    
+    if user and password_hasher.verify(user.password, data['password']):
+        # Хеш со старыми параметрами пересчитываем, пока пароль известен
+        if password_hasher.needs_rehash(user.password):
+            user.password = password_hasher.hash(data['password'])
+            db.session.commit()
+        access_token = create_access_token(identity=user.user_id)
+        return jsonify({
+            'access_token': access_token,
+            'user_id': user.user_id
+        })
+    return jsonify({'error': 'Invalid credentials'}), 401
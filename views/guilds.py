@@ -0,0 +1,102 @@
+"""Гильдии и гильдейские задания"""
+from datetime import datetime
+
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import jwt_required
+
+from database import db
+from guild_tasks import GuildTaskError, assign_task, expire_due_tasks, expiry_throttle, guild_tasks_statement
+from leaderboard import leaderboards
+from models import Guild, GuildMembership
+from pagination import list_response
+from profiles import current_user_id
+
+bp = Blueprint('guilds', __name__, url_prefix='/api')
+
+
+@bp.route('/guilds', methods=['GET', 'POST'])
+@jwt_required()
+def guilds():
+    """
+    Управление гильдиями.
+    GET: Список всех гильдий (id, name, members_count),
+         поддерживает after/limit/fields/stream
+    POST: Создание новой гильдии (name, description)
+    """
+    if request.method == 'GET':
+        return list_response(Guild.query, Guild.guild_id, {
+            'id': (Guild.guild_id, None),
+            'name': (Guild.name, None),
+            'members_count': (Guild.members_count, None)
+        })
+    
+    elif request.method == 'POST':
+        user_id = current_user_id()
+        data = request.get_json()
+        
+        try:
+            new_guild = Guild(
+                name=data['name'],
+                description=data.get('description')
+            )
+            db.session.add(new_guild)
+            db.session.flush()
+            
+            # Создателя делаем лидером
+            guild_id = new_guild.guild_id
+            db.session.add(GuildMembership(
+                guild_id=guild_id,
+                user_id=user_id,
+                role='leader'
+            ))
+            
+            db.session.commit()
+            leaderboards.add_member(guild_id, user_id)
+            return jsonify({'guild_id': guild_id}), 201
+        except Exception as e:
+            db.session.rollback()
+            return jsonify({'error': str(e)}), 400
+
+@bp.route('/guilds/<int:guild_id>/tasks', methods=['GET', 'POST'])
+@jwt_required()
+def guild_tasks(guild_id):
+    """
+    Задания гильдии.
+    GET: Активные назначения (all=1 — включая истекшие): guild_task_id,
+         task_id, title, reward, assigned_at, due_date, is_active,
+         completed, members, progress (доля выполнивших участников)
+    POST: Назначение задания лидером или офицером (task_id, due_date в ISO 8601)
+    """
+    if request.method == 'GET':
+        if expiry_throttle.due():
+            expire_due_tasks()
+        include_inactive = request.args.get('all', '').lower() in ('1', 'true', 'yes')
+        rows = db.session.execute(guild_tasks_statement(guild_id, include_inactive)).all()
+        if not rows and db.session.get(Guild, guild_id) is None:
+            return jsonify({'error': 'Guild not found'}), 404
+        return jsonify([{
+            'guild_task_id': row.guild_task_id,
+            'task_id': row.task_id,
+            'title': row.title,
+            'reward': row.base_reward,
+            'assigned_at': row.assigned_at.isoformat(),
+            'due_date': row.due_date.isoformat() if row.due_date else None,
+            'is_active': row.is_active,
+            'completed': row.completed_count,
+            'members': row.members_count,
+            # Счетчик не уменьшается, когда выполнивший выходит из гильдии
+            # (до пересчета /api/admin/guild-tasks/recount) — доля не выше 1
+            'progress': round(min(1, row.completed_count / row.members_count), 4) if row.members_count else 0
+        } for row in rows])
+    
+    data = request.get_json()
+    try:
+        due_date = datetime.fromisoformat(data['due_date']) if data.get('due_date') else None
+        guild_task_id = assign_task(guild_id, current_user_id(), data['task_id'], due_date)
+        return jsonify({'guild_task_id': guild_task_id}), 201
+    except GuildTaskError as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), e.status_code
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
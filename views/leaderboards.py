@@ -0,0 +1,74 @@
+"""Глобальный рейтинг и рейтинги гильдий"""
+from flask import Blueprint, request, jsonify, abort
+from flask_jwt_extended import jwt_required
+
+from database import db
+from leaderboard import leaderboards, LEADERBOARD_METRICS
+from models import User
+from profiles import current_user_id
+
+bp = Blueprint('leaderboards', __name__, url_prefix='/api')
+
+
+def _leaderboard_metric():
+    metric = request.args.get('by', 'experience')
+    if metric not in LEADERBOARD_METRICS:
+        abort(400)
+    return metric
+
+
+def _leaderboard_top(guild_id=None):
+    metric = _leaderboard_metric()
+    limit = min(request.args.get('limit', 10, type=int), 100)
+    offset = max(request.args.get('offset', 0, type=int), 0)
+    top = leaderboards.top(metric, limit, offset, guild_id=guild_id)
+    
+    names = dict(db.session.query(User.user_id, User.name).filter(
+        User.user_id.in_([user_id for _, user_id, _ in top])
+    )) if top else {}
+    return jsonify([{
+        'rank': rank,
+        'user_id': user_id,
+        'name': names.get(user_id),
+        metric: score
+    } for rank, user_id, score in top])
+
+
+def _leaderboard_me(guild_id=None):
+    metric = _leaderboard_metric()
+    rank, score, total = leaderboards.rank(current_user_id(), metric, guild_id=guild_id)
+    if rank is None:
+        return jsonify({'error': 'Not ranked'}), 404
+    return jsonify({'rank': rank, metric: score, 'total': total})
+
+
+@bp.route('/leaderboard', methods=['GET'])
+@jwt_required()
+def leaderboard():
+    """
+    Глобальный рейтинг.
+    Параметры: by (experience|money), limit (до 100), offset
+    Возвращает: rank, user_id, name и значение показателя
+    """
+    return _leaderboard_top()
+
+
+@bp.route('/leaderboard/me', methods=['GET'])
+@jwt_required()
+def leaderboard_me():
+    """Место текущего пользователя в глобальном рейтинге: rank, значение, total"""
+    return _leaderboard_me()
+
+
+@bp.route('/guilds/<int:guild_id>/leaderboard', methods=['GET'])
+@jwt_required()
+def guild_leaderboard(guild_id):
+    """Рейтинг участников гильдии, параметры как у /api/leaderboard"""
+    return _leaderboard_top(guild_id)
+
+
+@bp.route('/guilds/<int:guild_id>/leaderboard/me', methods=['GET'])
+@jwt_required()
+def guild_leaderboard_me(guild_id):
+    """Место текущего пользователя в рейтинге гильдии"""
+    return _leaderboard_me(guild_id)
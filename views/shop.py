@@ -0,0 +1,116 @@
+"""Магазин: каталог, покупки и скидки дня"""
+from flask import Blueprint, request, jsonify, Response
+from flask_jwt_extended import jwt_required
+
+from batches import batch_ids
+from catalog import product_catalogue, CATALOGUE_MAX_AGE
+from database import db
+from discounts import daily_discounts, DISCOUNT_PERCENT
+from models import Product
+from pagination import has_list_args, list_response
+from profiles import current_user_id
+from purchases import purchase, purchase_many, PurchaseError
+from ratelimit import rate_limit
+from search import PRODUCT_SORTS, has_search_args, product_criteria
+from serialization import COMPRESSION_ENABLED, MSGPACK_ENABLED, choose_encoding, wants_msgpack
+
+bp = Blueprint('shop', __name__, url_prefix='/api')
+
+
+@bp.route('/products', methods=['GET'])
+def get_products():
+    """
+    Получение списка всех товаров.
+    Возвращает: id, name, price, category для каждого товара
+    Поддерживает ETag/If-None-Match: если каталог не менялся — 304 без тела.
+    MessagePack (по Accept) и сжатые копии тела берутся из кеша каталога
+    С параметрами after/limit/fields/stream/sort и фильтрами q, category,
+    min_price, max_price (search.py) — выдача из БД
+    """
+    if has_list_args() or has_search_args(request.args):
+        return list_response(Product.query.filter(*product_criteria(request.args)), Product.product_id, {
+            'id': (Product.product_id, None),
+            'name': (Product.product_name, None),
+            'price': (Product.price, None),
+            'category': (Product.category, None)
+        }, PRODUCT_SORTS)
+    
+    body, etag = product_catalogue.get()
+    mimetype = wants_msgpack() if MSGPACK_ENABLED else None
+    if mimetype is not None:
+        etag = f'{etag}-msgpack'
+    data = product_catalogue.variant(body, mimetype)
+    encoding = choose_encoding(data)
+    
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+    else:
+        if encoding is not None:
+            data = product_catalogue.variant(body, mimetype, encoding)
+        response = Response(data, mimetype=mimetype or 'application/json')
+        if encoding is not None:
+            response.headers['Content-Encoding'] = encoding
+    # Сжатое представление побайтно отличается — ETag слабый
+    response.set_etag(etag, weak=encoding is not None)
+    if MSGPACK_ENABLED:
+        response.vary.add('Accept')
+    if COMPRESSION_ENABLED:
+        response.vary.add('Accept-Encoding')
+    response.headers['Cache-Control'] = f'public, max-age={CATALOGUE_MAX_AGE}'
+    return response
+
+@bp.route('/products/<int:product_id>/buy', methods=['POST'])
+@jwt_required()
+@rate_limit('buy_product')
+def buy_product(product_id):
+    """
+    Покупка товара с учетом скидки.
+    Заголовок Idempotency-Key делает повтор запроса безопасным:
+    вернется ответ первой покупки без повторного списания
+    """
+    user_id = current_user_id()
+    
+    try:
+        result, status = purchase(user_id, product_id, request.headers.get('Idempotency-Key'))
+        return jsonify(result), status
+    except PurchaseError as e:
+        return jsonify({'error': str(e)}), e.status_code
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
+
+@bp.route('/products/buy/batch', methods=['POST'])
+@jwt_required()
+@rate_limit('buy_products_batch')
+def buy_products_batch():
+    """
+    Пакетная покупка одной транзакцией.
+    Принимает: product_ids; Idempotency-Key относится ко всему пакету
+    Возвращает: results по элементам и остаток money
+    """
+    user_id = current_user_id()
+    product_ids = batch_ids(request.get_json(silent=True), 'product_ids')
+    
+    try:
+        result, status = purchase_many(user_id, product_ids, request.headers.get('Idempotency-Key'))
+        return jsonify(result), status
+    except PurchaseError as e:
+        return jsonify({'error': str(e)}), e.status_code
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
+
+@bp.route('/daily-discounts', methods=['GET'])
+def get_daily_discounts():
+    """Получить 3 случайных товара со скидкой на сегодня"""
+    discounted_products = daily_discounts.products()
+    
+    return jsonify([{
+        'id': p.product_id,
+        'name': p.product_name,
+        'original_price': p.price,
+        'discounted_price': int(p.price * (100 - DISCOUNT_PERCENT) / 100),
+        'discount_percent': DISCOUNT_PERCENT,
+        'category': p.category,
+        'image_url': p.image_url
+    } for p in discounted_products])
@@ -0,0 +1,105 @@
+"""Доска заданий и их выполнение"""
+from datetime import datetime, timedelta
+
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import jwt_required
+from sqlalchemy import or_, and_
+from sqlalchemy.orm import with_expression
+
+from batches import batch_ids
+from models import Task, TaskCompletionRollup
+from pagination import list_response
+from profiles import current_user_id
+from ratelimit import rate_limit
+from search import TASK_SORTS, task_criteria
+from task_completion import complete_task as complete_user_task, complete_tasks, CompletionError
+
+bp = Blueprint('tasks', __name__, url_prefix='/api')
+
+
+@bp.route('/tasks', methods=['GET'])
+@jwt_required()
+def get_tasks():
+    """
+    Получение списка доступных заданий.
+    Возвращает: id, title, reward, difficulty, is_completed, can_repeat,
+    last_completed_at, cooldown_remaining (секунды)
+    Поддерживает after/limit/fields/stream/sort и фильтры q, category,
+    difficulty (search.py)
+    """
+    user_id = current_user_id()
+    now = datetime.utcnow()
+    
+    # Последнее выполнение каждого задания пользователем — один LEFT JOIN
+    # к сводке выполнений по ключу (user_id, task_id)
+    tasks = Task.query.outerjoin(
+        TaskCompletionRollup, and_(
+            TaskCompletionRollup.task_id == Task.task_id,
+            TaskCompletionRollup.user_id == user_id
+        )
+    ).filter(
+        or_(
+            Task.created_by == None,  # Системные задания
+            Task.created_by == user_id  # Созданные текущим пользователем
+        ),
+        *task_criteria(request.args)
+    ).options(with_expression(Task.last_completed_at, TaskCompletionRollup.last_completed_at))
+    
+    def cooldown_remaining(task):
+        if not (task.is_repeatable and task.cooldown_hours and task.last_completed_at):
+            return 0
+        ready_at = task.last_completed_at + timedelta(hours=task.cooldown_hours)
+        return max(0, int((ready_at - now).total_seconds()))
+    
+    return list_response(tasks, Task.task_id, {
+        'id': (Task.task_id, lambda t: t.task_id),
+        'title': (Task.title, lambda t: t.title),
+        'reward': (Task.base_reward, lambda t: t.base_reward),
+        'difficulty': (Task.difficulty, lambda t: t.difficulty),
+        'is_completed': (None, lambda t: t.last_completed_at is not None),
+        'can_repeat': (Task.is_repeatable,
+                       lambda t: t.is_repeatable and t.last_completed_at is None),
+        'last_completed_at': (None, lambda t: t.last_completed_at.isoformat()
+                              if t.last_completed_at else None),
+        'cooldown_remaining': ((Task.is_repeatable, Task.cooldown_hours), cooldown_remaining)
+    }, TASK_SORTS)
+
+@bp.route('/tasks/complete', methods=['POST'])
+@jwt_required()
+@rate_limit('complete_task')
+def complete_task():
+    """
+    Завершение задания пользователем.
+    Принимает: task_id
+    Возвращает: сообщение об успехе/ошибке
+    """
+    user_id = current_user_id()
+    data = request.get_json()
+    
+    try:
+        complete_user_task(user_id, data['task_id'])
+        return jsonify({'message': 'Task completed successfully'})
+    except CompletionError as e:
+        return jsonify({'error': str(e)}), e.status_code
+    except Exception as e:
+        return jsonify({'error': str(e)}), 400
+
+@bp.route('/tasks/complete/batch', methods=['POST'])
+@jwt_required()
+@rate_limit('complete_tasks_batch')
+def complete_tasks_batch():
+    """
+    Пакетное завершение заданий (офлайн-синхронизация).
+    Принимает: task_ids в порядке выполнения
+    Возвращает: results по элементам, money и experience после начисления
+    """
+    user_id = current_user_id()
+    task_ids = batch_ids(request.get_json(silent=True), 'task_ids')
+    
+    try:
+        results, money, experience = complete_tasks(user_id, task_ids)
+        return jsonify({'results': results, 'money': money, 'experience': experience})
+    except CompletionError as e:
+        return jsonify({'error': str(e)}), e.status_code
+    except Exception as e:
+        return jsonify({'error': str(e)}), 400
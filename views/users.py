@@ -0,0 +1,163 @@
+"""Пользователи, статистика и друзья"""
+from datetime import datetime
+
+from flask import Blueprint, request, jsonify, abort
+from flask_jwt_extended import jwt_required
+
+from batches import batch_items, update_stats
+from database import db
+from friends import FriendError, friend_graph, guild_member_ids, intersect_sorted, add_friend, remove_friend
+from leaderboard import leaderboards
+from models import User, UserStats
+from profiles import load_profile, current_user_id
+from stats_engine import STATS_FIELDS, effective_stats, load_modifiers, materialize
+
+bp = Blueprint('users', __name__, url_prefix='/api')
+
+
+@bp.route('/users/<int:user_id>', methods=['GET'])
+@jwt_required()
+def get_user(user_id):
+    """
+    Получение информации о пользователе.
+    Возвращает: user_id, name, level
+    Профиль читается из кеша горячих профилей
+    """
+    user = load_profile(user_id)
+    if user is None:
+        abort(404)
+    return jsonify({
+        'user_id': user.user_id,
+        'name': user.name,
+        'level': user.level if user.has_stats else 1
+    })
+
+@bp.route('/users/<int:user_id>/stats', methods=['GET', 'PUT'])
+@jwt_required()
+def user_stats(user_id):
+    """
+    Получение/обновление статистики пользователя.
+    GET: Возвращает health, mana (с регенерацией и бафами), max_health,
+         max_mana, level, money
+    PUT: Обновляет health, mana, money (только для текущего пользователя)
+    """
+    if request.method == 'GET':
+        stats = load_profile(user_id)
+        if stats is None or not stats.has_stats:
+            abort(404)
+        current = effective_stats(stats, *load_modifiers(user_id), datetime.utcnow())
+        return jsonify({
+            'health': current.health,
+            'mana': current.mana,
+            'max_health': current.max_health,
+            'max_mana': current.max_mana,
+            'level': stats.level,
+            'money': stats.money
+        })
+    
+    elif request.method == 'PUT':
+        if current_user_id() != user_id:
+            return jsonify({'error': 'Unauthorized'}), 403
+            
+        stats = UserStats.query.get_or_404(user_id)
+        data = request.get_json()
+        
+        values = {column: data[field] for field, column in STATS_FIELDS.items() if field in data}
+        if 'health_points' in values or 'mana' in values:
+            # Регенерация до этого момента фиксируется в записи
+            now = datetime.utcnow()
+            materialize(values, effective_stats(stats, *load_modifiers(user_id), now), now)
+        for column, value in values.items():
+            setattr(stats, column, value)
+        money = stats.money
+            
+        db.session.commit()
+        leaderboards.record_stats(user_id, money=money)
+        return jsonify({'message': 'Stats updated'})
+
+@bp.route('/users/<int:user_id>/stats/batch', methods=['PUT'])
+@jwt_required()
+def user_stats_batch(user_id):
+    """
+    Пакет обновлений статистики (офлайн-синхронизация).
+    Принимает: updates — список объектов с health, mana, money
+    Возвращает: results по элементам и итоговые health, mana, money
+    """
+    if current_user_id() != user_id:
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    results, stats = update_stats(user_id, batch_items(request.get_json(silent=True), 'updates'))
+    if stats is None:
+        abort(404)
+    return jsonify({'results': results, **stats})
+
+# ====================== Друзья ======================
+
+def _users_with_names(user_ids):
+    names = dict(db.session.query(User.user_id, User.name).filter(
+        User.user_id.in_(list(user_ids))
+    )) if user_ids else {}
+    return [{'user_id': user_id, 'name': names.get(user_id)} for user_id in user_ids]
+
+
+@bp.route('/friends', methods=['GET', 'POST'])
+@jwt_required()
+def friends():
+    """
+    Друзья текущего пользователя.
+    GET: Список друзей (user_id, name); guild_id — только участники гильдии
+    POST: Добавление друга (целый friend_id); 409, если уже друзья
+    """
+    user_id = current_user_id()
+    
+    if request.method == 'GET':
+        friend_ids = friend_graph.friends(user_id)
+        guild_id = request.args.get('guild_id', type=int)
+        if guild_id is not None:
+            friend_ids = intersect_sorted(friend_ids, guild_member_ids(guild_id))
+        return jsonify(_users_with_names(list(friend_ids)))
+    
+    data = request.get_json(silent=True)
+    friend_id = data.get('friend_id') if isinstance(data, dict) else None
+    if not isinstance(friend_id, int) or isinstance(friend_id, bool):
+        return jsonify({'error': 'friend_id must be an integer'}), 400
+    try:
+        add_friend(user_id, friend_id)
+        return jsonify({'message': 'Friend added'}), 201
+    except FriendError as e:
+        return jsonify({'error': str(e)}), e.status_code
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
+
+
+@bp.route('/friends/<int:friend_id>', methods=['DELETE'])
+@jwt_required()
+def delete_friend(friend_id):
+    """Удаление друга"""
+    if not remove_friend(current_user_id(), friend_id):
+        abort(404)
+    return jsonify({'message': 'Friend removed'})
+
+
+@bp.route('/friends/<int:other_id>/mutual', methods=['GET'])
+@jwt_required()
+def mutual_friends(other_id):
+    """Общие друзья текущего пользователя и other_id"""
+    return jsonify(_users_with_names(friend_graph.mutual(current_user_id(), other_id)))
+
+
+@bp.route('/friends/suggestions', methods=['GET'])
+@jwt_required()
+def friend_suggestions():
+    """
+    Друзья друзей, отсортированные по числу общих друзей.
+    Параметры: limit (до 100)
+    Возвращает: user_id, name, mutual
+    """
+    limit = min(max(request.args.get('limit', 20, type=int), 1), 100)
+    suggestions = friend_graph.suggestions(current_user_id(), limit)
+    users = _users_with_names([user_id for user_id, _ in suggestions])
+    for user, (_, mutual) in zip(users, suggestions):
+        user['mutual'] = mutual
+    return jsonify(users)
@@ -0,0 +1,280 @@
+"""
+Отложенная пакетная запись выполнений заданий (включается WRITE_BEHIND_ENABLED=1).
+
+Вместо отдельной транзакции на каждое выполнение события копятся в памяти
+и каждые WRITE_BEHIND_INTERVAL_MS сбрасываются одной транзакцией:
+executemany в tasks_history, upsert сводки выполнений и executemany UPDATE users_stats с суммарными
+по пользователю приращениями денег и опыта.
+
+WRITE_BEHIND_ACK задает момент ответа клиенту:
+  flush   — после коммита пакета (по умолчанию): ответ означает, что запись в БД;
+  enqueue — сразу после постановки в очередь. Выполнение до ответа
+            фиксируется в сводке tasks_history_rollup отдельной короткой
+            транзакцией — повтор задания или cooldown проверяются по ней
+            в любом воркере; в пакет уходят история, прогресс гильдий
+            и начисление. События дописываются в журнал
+            в WRITE_BEHIND_LOG_DIR и при перезапуске воркера досылаются
+            в БД; без журнала при падении процесса теряется начисление
+            (выполнение в сводке остается — дважды награда не выдается).
+"""
+import atexit
+import json
+import logging
+import os
+import threading
+from datetime import datetime
+
+from sqlalchemy import bindparam, insert, update
+
+from database import db, env_flag
+from models import TaskHistory, UserStats
+from rollup import record_completions
+from guild_tasks import record_guild_progress
+
+WRITE_BEHIND_ENABLED = env_flag('WRITE_BEHIND_ENABLED')
+WRITE_BEHIND_ACK = os.getenv('WRITE_BEHIND_ACK', 'flush')
+WRITE_BEHIND_INTERVAL_MS = float(os.getenv('WRITE_BEHIND_INTERVAL_MS', '5'))
+WRITE_BEHIND_MAX_BATCH = int(os.getenv('WRITE_BEHIND_MAX_BATCH', '1000'))
+WRITE_BEHIND_LOG_DIR = os.getenv('WRITE_BEHIND_LOG_DIR')
+WRITE_BEHIND_TIMEOUT = float(os.getenv('WRITE_BEHIND_TIMEOUT', '10'))
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBehindError(Exception):
+    """Пакет с событием не удалось записать"""
+
+
+class CompletionEvent:
+    """Выполнение задания, ожидающее записи в БД"""
+
+    __slots__ = ('user_id', 'task_id', 'reward', 'completed_at', 'claimed', 'done', 'result', 'error')
+
+    def __init__(self, user_id, task_id, reward, completed_at, claimed=False):
+        self.user_id = user_id
+        self.task_id = task_id
+        self.reward = reward
+        self.completed_at = completed_at
+        self.claimed = claimed  # сводка уже записана при постановке в очередь
+        self.done = threading.Event()
+        self.result = None  # (money, experience) после записи
+        self.error = None
+
+    def wait(self, timeout=WRITE_BEHIND_TIMEOUT):
+        if not self.done.wait(timeout):
+            raise WriteBehindError('Write-behind flush timed out')
+        if self.error is not None:
+            raise WriteBehindError(str(self.error))
+        return self.result
+
+    def to_json(self):
+        return json.dumps({'user_id': self.user_id, 'task_id': self.task_id, 'reward': self.reward,
+                           'completed_at': self.completed_at.isoformat(), 'claimed': self.claimed})
+
+    @classmethod
+    def from_json(cls, line):
+        data = json.loads(line)
+        return cls(data['user_id'], data['task_id'], data['reward'],
+                   datetime.fromisoformat(data['completed_at']), data.get('claimed', False))
+
+
+class CompletionLog:
+    """
+    Журнал событий, еще не записанных в БД, — отдельный файл на процесс.
+    Журналы завершившихся процессов при старте забираются и досылаются.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, f'completions-{os.getpid()}.log')
+        self._file = open(self.path, 'a', encoding='utf-8')
+
+    def append(self, event):
+        self._file.write(event.to_json() + '\n')
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def rewrite(self, events):
+        """Оставляет в журнале только еще не записанные события"""
+        self._file.close()
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            for event in events:
+                file.write(event.to_json() + '\n')
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_path, self.path)
+        self._file = open(self.path, 'a', encoding='utf-8')
+
+    def claim_orphans(self):
+        """События из журналов процессов, которых больше нет"""
+        events = []
+        for name in os.listdir(self.directory):
+            if not (name.startswith('completions-') and name.endswith('.log')):
+                continue
+            pid = int(name[len('completions-'):-len('.log')])
+            if pid == os.getpid() or _process_alive(pid):
+                continue
+            path = os.path.join(self.directory, name)
+            claimed = f'{path}.claimed-{os.getpid()}'
+            try:
+                os.rename(path, claimed)  # атомарно: журнал забирает один процесс
+            except FileNotFoundError:
+                continue
+            with open(claimed, encoding='utf-8') as file:
+                events.extend(CompletionEvent.from_json(line) for line in file if line.strip())
+            os.remove(claimed)
+        return events
+
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class WriteBehindPipeline:
+
+    def __init__(self, enabled=WRITE_BEHIND_ENABLED, ack=WRITE_BEHIND_ACK,
+                 interval_ms=WRITE_BEHIND_INTERVAL_MS, max_batch=WRITE_BEHIND_MAX_BATCH,
+                 log_dir=WRITE_BEHIND_LOG_DIR):
+        self.enabled = enabled
+        self.ack_after_flush = ack != 'enqueue'
+        self.interval = interval_ms / 1000
+        self.max_batch = max_batch
+        self.log_dir = log_dir
+        self.app = None
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._buffer = []
+        self._pending_last = {}  # (user_id, task_id) -> completed_at еще не записанного события
+        self._log = None
+        self._thread = None
+
+    def init_app(self, app):
+        if not self.enabled:
+            return
+        self.app = app
+        if self.log_dir and not self.ack_after_flush:
+            self._log = CompletionLog(self.log_dir)
+            for event in self._log.claim_orphans():
+                self._enqueue(event)
+        atexit.register(self._drain_on_exit)
+
+    def pending_completion(self, user_id, task_id):
+        """Время последнего выполнения, еще не записанного в БД"""
+        return self._pending_last.get((user_id, task_id))
+
+    def enqueue(self, user_id, task_id, reward, completed_at, claimed=False):
+        """claimed — выполнение уже учтено в сводке вызывающим"""
+        return self._enqueue(CompletionEvent(user_id, task_id, reward, completed_at, claimed))
+
+    def _enqueue(self, event):
+        with self._lock:
+            if self._log is not None:
+                self._log.append(event)
+            self._buffer.append(event)
+            self._pending_last[(event.user_id, event.task_id)] = event.completed_at
+            if self._thread is None or self._thread.ident is not None and not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='write-behind-flusher', daemon=True)
+                self._thread.start()
+            if len(self._buffer) >= self.max_batch:
+                self._wakeup.set()
+        return event
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            with self.app.app_context():
+                self.flush()
+
+    def drain(self):
+        """Синхронно записывает все накопленные события (нужен контекст приложения)"""
+        while self._buffer:
+            self.flush()
+
+    def _drain_on_exit(self):
+        with self.app.app_context():
+            self.drain()
+
+    def flush(self):
+        """Записывает накопленные события; вызывается потоком-флашером"""
+        with self._lock:
+            batch = self._buffer[:self.max_batch]
+            del self._buffer[:self.max_batch]
+        if not batch:
+            return
+
+        try:
+            results = self._write(batch)
+        except Exception:
+            db.session.rollback()
+            logger.exception('Write-behind batch of %d events failed, retrying one by one', len(batch))
+            results = {}
+            for event in batch:
+                try:
+                    results.update(self._write([event]))
+                except Exception as error:
+                    db.session.rollback()
+                    logger.exception('Dropping completion of task %s by user %s', event.task_id, event.user_id)
+                    event.error = error
+
+        from leaderboard import leaderboards
+        from profiles import invalidate_profile
+
+        with self._lock:
+            for event in batch:
+                key = (event.user_id, event.task_id)
+                if self._pending_last.get(key) == event.completed_at:
+                    del self._pending_last[key]
+            if self._log is not None:
+                self._log.rewrite(self._buffer)
+
+        for user_id, (money, experience) in results.items():
+            invalidate_profile(user_id)
+            leaderboards.record_stats(user_id, money=money, experience=experience)
+        for event in batch:
+            if event.error is None:
+                event.result = results.get(event.user_id)
+            event.done.set()
+
+    @staticmethod
+    def _write(batch):
+        db.session.execute(insert(TaskHistory), [{
+            'task_id': event.task_id,
+            'user_id': event.user_id,
+            'reward_earned': event.reward,
+            'completed_at': event.completed_at,
+        } for event in batch])
+        completions = [(event.user_id, event.task_id, event.completed_at) for event in batch]
+        record_completions((event.user_id, event.task_id, event.completed_at)
+                           for event in batch if not event.claimed)
+        record_guild_progress(completions)
+
+        deltas = {}
+        for event in batch:
+            deltas[event.user_id] = deltas.get(event.user_id, 0) + event.reward
+
+        stats = UserStats.__table__
+        db.session.execute(
+            update(stats)
+            .where(stats.c.user_id == bindparam('delta_user_id'))
+            .values(money=stats.c.money + bindparam('delta_money'),
+                    experience=stats.c.experience + bindparam('delta_experience')),
+            [{'delta_user_id': user_id, 'delta_money': reward, 'delta_experience': reward * 10}
+             for user_id, reward in deltas.items()]
+        )
+        rows = db.session.query(UserStats.user_id, UserStats.money, UserStats.experience).filter(
+            UserStats.user_id.in_(list(deltas))
+        ).all()
+        db.session.commit()
+        return {row.user_id: (row.money, row.experience) for row in rows}
+
+
+write_behind = WriteBehindPipeline()